@@ -2,49 +2,77 @@
 
 import tkinter as tk
 from tkinter import messagebox
-import subprocess
 import sys
 import customtkinter as ctk
 
+import breach
+import tasks
+
 # ---------- Logout and reopen Login window ----------
-def logout(window):
+def logout(app):
     """Logout and return to login window."""
-    window.destroy()  # close dashboard
-
-    # Import login function and reopen login UI
-    from sqrity_login import main as login_main
-    login_main()  # reopen login window
-
-
-
-# ---------- Get Logged-in Username ----------
-if len(sys.argv) < 2:
-    # If someone runs this file directly without going through login.py
-    root = tk.Tk()
-    root.withdraw()
-    messagebox.showerror("Error", "No username provided to Dashboard.\nOpen this window from the login page.")
-    sys.exit(1)
-
-current_user = sys.argv[1]
+    app.logout()  # hides the dashboard and every window of this user
 
 
 # ---------- Call Other Windows ----------
-def open_generator():
-    """Open generator.py and pass the current username."""
+def open_generator(app):
+    """Show the password generator for the current user."""
     try:
-        subprocess.Popen([sys.executable, "generator.py", current_user])
+        app.show("generator", app.current_user)
     except Exception as e:
         messagebox.showerror("Error", f"Could not open password generator.\n\n{e}")
 
 
-def open_view():
-    """Open view.py and pass the current username."""
+def open_view(app):
+    """Show the vault viewer for the current user."""
     try:
-        subprocess.Popen([sys.executable, "view.py", current_user])
+        app.show("view", app.current_user)
     except Exception as e:
         messagebox.showerror("Error", f"Could not open vault viewer.\n\n{e}")
 
 
+# ---------- Breach Audit ----------
+def audit_vault(app, button):
+    """Check every entry of the current user against the offline breach file."""
+    try:
+        breaches = breach.open_default()
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Error", f"Could not open the breach file.\n\n{e}")
+        return
+    if breaches is None:
+        messagebox.showinfo(
+            "Breach Audit",
+            f"No breach file found at {breach.BREACH_FILE}.\n\n"
+            "Convert the Pwned Passwords dump with:\npython breach.py convert <dump> breach.bin"
+        )
+        return
+    if app.session is None:
+        messagebox.showerror("Error", "The vault is locked. Please log in again.")
+        return
+
+    def done(future):
+        button.configure(state="normal", text="Breach Audit")
+        try:
+            found = future.result()
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not audit the vault.\n\n{e}")
+            return
+        if not found:
+            messagebox.showinfo("Breach Audit", "None of your passwords appear in known breaches.")
+            return
+        shown = "\n".join(f"{app_name}: seen {seen:,} times" for app_name, seen in found[:10])
+        if len(found) > 10:
+            shown += f"\n... and {len(found) - 10} more"
+        messagebox.showwarning(
+            "Breach Audit",
+            f"{len(found)} of your passwords appear in known breaches. Change them:\n\n{shown}"
+        )
+
+    # Decrypting the whole vault takes a moment, keep it off the Tk thread
+    button.configure(state="disabled", text="Checking...")
+    tasks.run_in_background(button, breach.audit_vault, app.session, breaches, on_done=done)
+
+
 def CenterWindowToDisplay(Screen: ctk.CTk, width: int, height: int, scale_factor: float = 1.0):
     """Centers the window to the main display/monitor"""
     screen_width = Screen.winfo_screenwidth()
@@ -55,101 +83,126 @@ def CenterWindowToDisplay(Screen: ctk.CTk, width: int, height: int, scale_factor
 
 
 # ---------- UI Setup with customtkinter ----------
-# ---------- UI Setup with customtkinter ----------
-ctk.set_appearance_mode("dark")
-ctk.set_default_color_theme("blue")
-
-root = ctk.CTk()
-root.title("SQRITY - PM Dashboard")
-root.geometry("650x350")
-root.resizable(False, False)
-
-# Main container frame
-main_frame = ctk.CTkFrame(
-    root,
-    fg_color="#2b2b2b",
-    corner_radius=10
-)
-main_frame.pack(expand=True, fill="both")
-
-# Center container for all content
-center_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
-center_frame.place(relx=0.5, rely=0.5, anchor="center")
-
-# Title
-title_label = ctk.CTkLabel(
-    center_frame,
-    text="SQRITY - PM Dashboard",
-    text_color="#ffffff",
-    font=("Segoe UI", 20, "bold")
-)
-title_label.pack(pady=(0, 10))
-
-# Logged-in username
-user_label = ctk.CTkLabel(
-    center_frame,
-    text=f"Welcome, {current_user}",
-    text_color="#ffffff",
-    font=("Segoe UI", 18)
-)
-user_label.pack(pady=(0, 30))
-
-# Buttons container
-buttons_frame = ctk.CTkFrame(center_frame, fg_color="transparent")
-buttons_frame.pack(pady=(0, 30))
-btn_frm = tk.Frame(center_frame, bg="#2b2b2b")
-btn_frm.pack(pady=(5, 10))
-
-# Password Generator button
-generator_btn = ctk.CTkButton(
-    buttons_frame,
-    text="Password Generator",
-    command=open_generator,
-    width=200,
-    height=80,
-    font=("Segoe UI", 18, "bold"),
-    fg_color="#1f59ab",
-
-)
-generator_btn.pack(side="left", padx=15)
-
-# View Vault button
-view_btn = ctk.CTkButton(
-    buttons_frame,
-    text="Open Vault",
-    command=open_view,
-    width=200,
-    height=80,
-    font=("Segoe UI", 18, "bold"),
-    fg_color="#1f59ab",
-
-)
-view_btn.pack(side="left", padx=15)
-
-logout_btn = ctk.CTkButton(
-    btn_frm,
-    text="Logout",
-    command=lambda: logout(root),
-    width=120,
-    height=40,
-    fg_color="#b91c1c",
-    hover_color="#991b1b",
-    font=("Segoe UI", 14, "bold")
-)
-logout_btn.grid(row=0, column=1, padx=15, pady=10)
-
-
-# Footer text
-footer = ctk.CTkLabel(
-    center_frame,
-    text="Manage your passwords securely.",
-    text_color="#ffffff",
-    font=("Segoe UI", 16)
-)
-footer.pack(pady=20)
-
-# CENTER THE WINDOW
-root.update_idletasks()
-root.geometry(CenterWindowToDisplay(root, 650, 350, root._get_window_scaling()))
-
-root.mainloop()
+def build_dashboard_window(root: ctk.CTkToplevel, app):
+    """Fill the dashboard window; built once by the app's window manager."""
+    root.title("SQRITY - PM Dashboard")
+    root.geometry("650x350")
+    root.resizable(False, False)
+
+    # Main container frame
+    main_frame = ctk.CTkFrame(
+        root,
+        fg_color="#2b2b2b",
+        corner_radius=10
+    )
+    main_frame.pack(expand=True, fill="both")
+
+    # Center container for all content
+    center_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+    center_frame.place(relx=0.5, rely=0.5, anchor="center")
+
+    # Title
+    title_label = ctk.CTkLabel(
+        center_frame,
+        text="SQRITY - PM Dashboard",
+        text_color="#ffffff",
+        font=("Segoe UI", 20, "bold")
+    )
+    title_label.pack(pady=(0, 10))
+
+    # Logged-in username
+    user_label = ctk.CTkLabel(
+        center_frame,
+        text="Welcome",
+        text_color="#ffffff",
+        font=("Segoe UI", 18)
+    )
+    user_label.pack(pady=(0, 30))
+
+    # Buttons container
+    buttons_frame = ctk.CTkFrame(center_frame, fg_color="transparent")
+    buttons_frame.pack(pady=(0, 30))
+    btn_frm = tk.Frame(center_frame, bg="#2b2b2b")
+    btn_frm.pack(pady=(5, 10))
+
+    # Password Generator button
+    generator_btn = ctk.CTkButton(
+        buttons_frame,
+        text="Password Generator",
+        command=lambda: open_generator(app),
+        width=200,
+        height=80,
+        font=("Segoe UI", 18, "bold"),
+        fg_color="#1f59ab",
+
+    )
+    generator_btn.pack(side="left", padx=15)
+
+    # View Vault button
+    view_btn = ctk.CTkButton(
+        buttons_frame,
+        text="Open Vault",
+        command=lambda: open_view(app),
+        width=200,
+        height=80,
+        font=("Segoe UI", 18, "bold"),
+        fg_color="#1f59ab",
+
+    )
+    view_btn.pack(side="left", padx=15)
+
+    logout_btn = ctk.CTkButton(
+        btn_frm,
+        text="Logout",
+        command=lambda: logout(app),
+        width=120,
+        height=40,
+        fg_color="#b91c1c",
+        hover_color="#991b1b",
+        font=("Segoe UI", 14, "bold")
+    )
+    logout_btn.grid(row=0, column=1, padx=15, pady=10)
+
+    audit_btn = ctk.CTkButton(
+        btn_frm,
+        text="Breach Audit",
+        command=lambda: audit_vault(app, audit_btn),
+        width=120,
+        height=40,
+        fg_color="#374151",
+        hover_color="#4B5563",
+        font=("Segoe UI", 14, "bold")
+    )
+    audit_btn.grid(row=0, column=0, padx=15, pady=10)
+
+
+    # Footer text
+    footer = ctk.CTkLabel(
+        center_frame,
+        text="Manage your passwords securely.",
+        text_color="#ffffff",
+        font=("Segoe UI", 16)
+    )
+    footer.pack(pady=20)
+
+    # CENTER THE WINDOW
+    root.update_idletasks()
+    root.geometry(CenterWindowToDisplay(root, 650, 350, root._get_window_scaling()))
+
+    def on_show(username=None):
+        user_label.configure(text=f"Welcome, {username}")
+
+    return on_show
+
+
+# ---------- Get Logged-in Username ----------
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        # If someone runs this file directly without going through login.py
+        root = tk.Tk()
+        root.withdraw()
+        messagebox.showerror("Error", "No username provided to Dashboard.\nOpen this window from the login page.")
+        sys.exit(1)
+
+    from app import main as app_main
+    app_main("dashboard", sys.argv[1])
@@ -0,0 +1,264 @@
+# admin.py
+"""Headless account administration for users.db.
+
+    python admin.py provision staff.csv > credentials.csv
+    python admin.py rehash known.csv
+    python admin.py status
+    python admin.py reuse [--user NAME]
+
+A user list is a CSV file with a `username` column and an optional
+`password` column. Password hashing runs in a process pool on every core;
+results are written in batched transactions.
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import hmac
+import os
+import sqlite3
+import sys
+import time
+
+import auth
+import db
+import kdf
+import passgen
+import schema
+import vault
+
+BATCH_SIZE = 500   # users written per transaction
+CHUNK_SIZE = 16    # users handed to a worker process at a time
+
+
+# ----------------------
+#   WORKERS
+# ----------------------
+# These run in the pool's processes, so they take and return plain tuples.
+def _provision_job(job):
+    username, password, algorithm, params = job
+    salt, pwd_hash = auth.hash_password(password, None, algorithm, params)
+    return username, salt, pwd_hash
+
+
+def _rehash_job(job):
+    """Return the new hash if password matches the stored one, else None."""
+    username, password, salt, old_hash, old_algorithm, old_params, algorithm, params = job
+    if not hmac.compare_digest(kdf.derive(password, salt, old_algorithm, old_params), old_hash):
+        return username, None
+    return username, kdf.derive(password, salt, algorithm, params)
+
+
+def _run_pool(fn, jobs, workers):
+    """Yield fn(job) for every job, in order, hashing on all workers."""
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(fn, jobs, chunksize=CHUNK_SIZE)
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ----------------------
+#   COMMANDS
+# ----------------------
+def read_user_list(path: str):
+    """Return [(username, password or None)] from a CSV user list.
+
+    A username listed twice is an error: which of its passwords should win
+    is a question for whoever wrote the list.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as fp:
+        reader = csv.DictReader(fp)
+        if reader.fieldnames is None or "username" not in reader.fieldnames:
+            raise ValueError(f"{path}: the first line must name a 'username' column")
+        users = []
+        seen = {}
+        for record in reader:
+            username = (record.get("username") or "").strip()
+            if not username:
+                continue
+            if username in seen:
+                raise ValueError(f"{path}: line {reader.line_num}: {username!r} "
+                                 f"is already listed on line {seen[username]}")
+            seen[username] = reader.line_num
+            users.append((username, record.get("password") or None))
+        return users
+
+
+def provision(users, workers=None, batch_size=BATCH_SIZE, progress=None):
+    """Create every (username, password) account that does not exist yet.
+
+    Returns the set of usernames that were created. Existing usernames are
+    left alone by the UNIQUE constraint instead of being looked up first.
+    Each username may appear once, as read_user_list ensures.
+    """
+    algorithm, params = auth.kdf_policy()
+    stored = kdf.dump_params(params)
+    jobs = [(username, password, algorithm, params) for username, password in users]
+    created = set()
+
+    conn = db.get_connection(auth.DB_PATH)
+    done = 0
+    for batch in _batches(_run_pool(_provision_job, jobs, workers), batch_size):
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO users (username, salt, password_hash, kdf, kdf_params)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(username, salt, pwd_hash, algorithm, stored) for username, salt, pwd_hash in batch],
+            )
+            # A fresh random salt only matches where our row went in
+            salts = {username: salt for username, salt, _ in batch}
+            placeholders = ",".join("?" * len(salts))
+            for username, salt in conn.execute(
+                f"SELECT username, salt FROM users WHERE username IN ({placeholders})", list(salts)
+            ):
+                if salt == salts[username]:
+                    created.add(username)
+        done += len(batch)
+        if progress is not None:
+            progress(done, len(jobs))
+    return created
+
+
+def rehash(users, workers=None, batch_size=BATCH_SIZE, progress=None):
+    """Move users whose password is known to the current hashing policy.
+
+    Vault keys are rewrapped by auth at each user's next login, and users
+    who are not in the list are rehashed there too.
+    """
+    algorithm, params = auth.kdf_policy()
+    stored = kdf.dump_params(params)
+    conn = db.get_connection(auth.DB_PATH)
+    passwords = dict((username, password) for username, password in users if password)
+    result = {"rehashed": 0, "current": 0, "wrong_password": 0, "unknown": len(users) - len(passwords)}
+
+    jobs = []
+    for username, salt, old_hash, old_algorithm, old_params in conn.execute(
+        "SELECT username, salt, password_hash, kdf, kdf_params FROM users"
+    ):
+        if username not in passwords:
+            continue
+        old_params = kdf.load_params(old_params)
+        if (old_algorithm, old_params) == (algorithm, params):
+            result["current"] += 1
+            continue
+        jobs.append((username, passwords[username], salt, old_hash,
+                     old_algorithm, old_params, algorithm, params))
+    result["unknown"] += len(passwords) - len(jobs) - result["current"]
+
+    done = 0
+    for batch in _batches(_run_pool(_rehash_job, jobs, workers), batch_size):
+        rows = [(new_hash, algorithm, stored, username) for username, new_hash in batch if new_hash]
+        with conn:
+            conn.executemany(
+                "UPDATE users SET password_hash = ?, kdf = ?, kdf_params = ? WHERE username = ?", rows)
+        result["rehashed"] += len(rows)
+        result["wrong_password"] += len(batch) - len(rows)
+        done += len(batch)
+        if progress is not None:
+            progress(done, len(jobs))
+    return result
+
+
+def status():
+    """Return [(algorithm, params, users, is_current)] for users.db."""
+    algorithm, params = auth.kdf_policy()
+    rows = db.get_connection(auth.DB_PATH).execute(
+        "SELECT kdf, kdf_params, count(*) FROM users GROUP BY kdf, kdf_params ORDER BY count(*) DESC"
+    ).fetchall()
+    return [(kdf_name, kdf.load_params(stored), count,
+             (kdf_name, kdf.load_params(stored)) == (algorithm, params))
+            for kdf_name, stored, count in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Administer SQRITY accounts without the GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("provision", help="create accounts from a user list")
+    cmd.add_argument("path")
+    cmd.add_argument("--workers", type=int, help="hashing processes (default: one per core)")
+    cmd.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    cmd.add_argument("--length", type=int, default=passgen.DEFAULT_LENGTH,
+                     help="length of generated passwords for users listed without one")
+
+    cmd = commands.add_parser("rehash", help="move listed users to the current hashing policy")
+    cmd.add_argument("path")
+    cmd.add_argument("--workers", type=int, help="hashing processes (default: one per core)")
+    cmd.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    commands.add_parser("status", help="count users per hashing algorithm and parameters")
+
+    cmd = commands.add_parser("reuse", help="list passwords stored for more than one app")
+    cmd.add_argument("--user", help="only this user (default: every user)")
+    args = parser.parse_args(argv)
+
+    def report(done, total):
+        print(f"\r{done:,}/{total:,} hashed", end="", file=sys.stderr, flush=True)
+
+    try:
+        schema.migrate_db(auth.DB_PATH, schema.USERS_MIGRATIONS)
+        if args.command == "status":
+            for algorithm, params, count, current in status():
+                flag = "" if current else "  (outdated, rehashed at next login)"
+                print(f"{count:>8,}  {algorithm} {kdf.dump_params(params)}{flag}")
+            return 0
+        if args.command == "reuse":
+            schema.migrate_db(db.VAULT_DB, schema.VAULT_MIGRATIONS)
+            groups = vault.reuse_groups(args.user)
+            for owner, apps in groups:
+                print(f"{owner}: one password for {len(apps)} apps: {', '.join(apps)}")
+            unchecked = vault.count_unchecked(args.user)
+            print(f"{len(groups):,} reused passwords", file=sys.stderr)
+            if unchecked:
+                print(f"{unchecked:,} entries not checked yet; they are checked at their owner's next login",
+                      file=sys.stderr)
+            return 0
+
+        users = read_user_list(args.path)
+        workers = args.workers or os.cpu_count() or 1
+        start = time.perf_counter()
+        if args.command == "provision":
+            listed, generated = [], {}
+            for username, password in users:
+                if password is None:
+                    password = generated[username] = passgen.generate_password(args.length)
+                listed.append((username, password))
+            created = provision(listed, workers, args.batch_size, report)
+            result = {"created": len(created), "existing": len(listed) - len(created)}
+            hashed = len(listed)
+
+            # Generated passwords of the new accounts, as CSV on stdout for handing out
+            writer = csv.writer(sys.stdout)
+            if created & generated.keys():
+                writer.writerow(("username", "password"))
+            for username, password in generated.items():
+                if username in created:
+                    writer.writerow((username, password))
+        else:
+            result = rehash(users, workers, args.batch_size, report)
+            hashed = result["rehashed"] + result["wrong_password"]
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"\n{args.command} failed: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+
+    rate = hashed / elapsed if elapsed else 0
+    print(file=sys.stderr)
+    print(", ".join(f"{count:,} {name.replace('_', ' ')}" for name, count in result.items()),
+          file=sys.stderr)
+    print(f"{hashed:,} passwords hashed in {elapsed:.2f}s on {workers} workers, {rate:,.1f} users/s",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
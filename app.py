@@ -0,0 +1,140 @@
+# app.py
+
+import importlib
+import os
+import sys
+import time
+
+import customtkinter as ctk
+
+import backup
+import writer
+
+
+# Every SQRITY window: name -> (module, builder).
+# A builder fills an empty CTkToplevel and may return an on_show(username)
+# hook that refreshes the window each time it is shown. Windows that keep
+# anything of the user's register a hook with app.on_logout to drop it.
+WINDOWS = {
+    "loading": ("sqrity_login", "build_loading_window"),
+    "login": ("sqrity_login", "build_login_window"),
+    "dashboard": ("Dashboard", "build_dashboard_window"),
+    "generator": ("generator", "build_generator_window"),
+    "view": ("view", "build_view_window"),
+}
+
+# Closing one of these ends the application, the others are only hidden.
+MAIN_WINDOWS = ("loading", "login", "dashboard")
+
+# Set by startup.py (wall clock at launch): report the time to the first
+# drawn frame on stderr and exit instead of entering the main loop
+STARTUP_T0 = os.environ.get("SQRITY_STARTUP_T0")
+FIRST_FRAME_TAG = "sqrity-first-frame-ms"
+
+
+class WindowManager:
+    """One long-lived Tk root that hosts every SQRITY window as a CTkToplevel.
+
+    Windows are built the first time they are shown and withdrawn instead of
+    destroyed when closed, so switching windows never starts a new interpreter.
+    """
+
+    def __init__(self):
+        ctk.set_appearance_mode("dark")
+        ctk.set_default_color_theme("blue")
+
+        self.root = ctk.CTk()
+        self.root.withdraw()  # only the toplevels are ever visible
+        self.current_user = None
+        self.session = None  # session.Session of the logged-in user
+        self._windows = {}
+        self._on_show = {}
+        self._on_logout = []
+
+    def show(self, name: str, username: str | None = None):
+        """Show a window, building it on first use."""
+        window = self._windows.get(name)
+        if window is None:
+            window = self._build(name)
+
+        on_show = self._on_show.get(name)
+        if on_show is not None:
+            on_show(username)
+
+        window.deiconify()
+        window.lift()
+        window.focus_force()
+        return window
+
+    def prepare(self, name: str):
+        """Build a window ahead of time without showing it."""
+        if name not in self._windows:
+            self._build(name)
+
+    def hide(self, name: str):
+        window = self._windows.get(name)
+        if window is not None:
+            window.withdraw()
+
+    def close(self, name: str):
+        if name in MAIN_WINDOWS:
+            self.quit()
+        else:
+            self.hide(name)
+
+    def login(self, username: str, session=None):
+        """Switch from the login window to the user's dashboard."""
+        self.current_user = username
+        self.session = session
+        self.hide("login")
+        self.show("dashboard", username)
+
+    def on_logout(self, hook):
+        """Call hook() at every logout, before the login window comes back."""
+        self._on_logout.append(hook)
+
+    def logout(self):
+        """Hide every window of the current user and go back to login."""
+        self.current_user = None
+        self.session = None  # drop the vault key
+        for hook in self._on_logout:
+            hook()  # and every window's copy of it
+        for name in self._windows:
+            self.hide(name)
+        self.show("login")
+
+    def quit(self):
+        writer.close_all()  # saves still queued are written before the process ends
+        self.root.destroy()
+
+    def run(self, name: str = "login", username: str | None = None):
+        self.current_user = username
+        self.show(name, username)
+        if STARTUP_T0:
+            self.root.update()  # draw the first frame
+            elapsed_ms = (time.time() - float(STARTUP_T0)) * 1000
+            print(f"{FIRST_FRAME_TAG} {elapsed_ms:.1f}", file=sys.stderr, flush=True)
+            self.quit()
+            return
+        backup.schedule(self.root)  # online backups on a worker thread
+        self.root.mainloop()
+
+    def _build(self, name: str):
+        module_name, builder_name = WINDOWS[name]
+        builder = getattr(importlib.import_module(module_name), builder_name)
+
+        window = ctk.CTkToplevel(self.root)
+        window.withdraw()  # stay hidden until fully built
+        window.protocol("WM_DELETE_WINDOW", lambda: self.close(name))
+
+        self._on_show[name] = builder(window, self)
+        self._windows[name] = window
+        return window
+
+
+def main(name: str = "login", username: str | None = None):
+    WindowManager().run(name, username)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:3])
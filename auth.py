@@ -0,0 +1,248 @@
+# auth.py
+"""Account checks with no Tk dependency, safe to run on a worker thread."""
+
+import getpass
+import hmac
+import json
+import os
+import time
+
+import crypto
+import db
+import kdf
+import schema
+import throttle
+from session import Session
+
+DB_PATH = db.USERS_DB
+
+# Appended to the user's salt for the key that wraps the vault data key, so
+# it is never equal to the password_hash stored in users.db
+VAULT_KEY_INFO = b"sqrity-vault-key"
+
+# settings row holding the hashing policy chosen with `python kdf.py --save`
+KDF_POLICY_KEY = "kdf"
+
+# Hashed against for unknown usernames, so they cost as much as a real check
+DUMMY_SALT = b"\0" * 16
+DUMMY_KDF_TTL_S = 300.0  # how long the settings most accounts use are cached
+
+THROTTLE = throttle.Throttle(DB_PATH if throttle.PERSIST else None)
+
+_dummy_kdf = (0.0, None)  # (expires, (algorithm, params))
+
+
+def hash_password(password: str, salt: bytes | None = None,
+                  algorithm: str = kdf.PBKDF2, params: dict | None = None):
+    """Return (salt, hash); see kdf.py for the algorithms and parameters."""
+    if salt is None:
+        salt = os.urandom(16)
+    return salt, kdf.derive(password, salt, algorithm, params)
+
+
+def derive_vault_key(password: str, salt: bytes) -> bytes:
+    """Return the data key of a vault sealed before data keys were wrapped.
+
+    It is the password hashed with the original PBKDF2 settings. Such a key
+    is wrapped like a random one at the user's next unlock, so their sealed
+    rows still open, and this is never needed for them again.
+    """
+    _, key = hash_password(password, salt + VAULT_KEY_INFO, *kdf.LEGACY)
+    return key
+
+
+def _wrapping_key(password: str, salt: bytes, algorithm: str, params: dict):
+    return crypto.new_cipher(kdf.derive(password, salt + VAULT_KEY_INFO, algorithm, params))
+
+
+def _has_sealed_rows(username: str) -> bool:
+    return db.get_connection(db.VAULT_DB).execute(
+        "SELECT 1 FROM vault WHERE owner_username = ? AND secret IS NOT NULL LIMIT 1", (username,)
+    ).fetchone() is not None
+
+
+def _vault_key(username: str, password: str, salt: bytes) -> bytes:
+    """Unwrap the user's data key, creating it on first use.
+
+    A key wrapped with settings older than the current policy is rewrapped
+    on the spot, the key itself does not change.
+    """
+    conn = db.get_connection(DB_PATH)
+    wrapped, algorithm, params = conn.execute(
+        "SELECT wrapped_key, wrap_kdf, wrap_kdf_params FROM users WHERE username = ?", (username,)
+    ).fetchone()
+    policy = kdf_policy()
+    aad = username.encode("utf-8")
+
+    if wrapped is not None:
+        params = kdf.load_params(params)
+        key = crypto.unseal(_wrapping_key(password, salt, algorithm, params), wrapped, aad)
+        if (algorithm, params) == policy:
+            return key
+    elif _has_sealed_rows(username):
+        key = derive_vault_key(password, salt)  # sealed before keys were wrapped
+    else:
+        key = os.urandom(crypto.KEY_SIZE)
+
+    rewrapped = crypto.seal(_wrapping_key(password, salt, *policy), key, aad)
+    with conn:
+        # Only if nobody changed it meanwhile; a login racing this one keeps its key
+        updated = conn.execute(
+            "UPDATE users SET wrapped_key = ?, wrap_kdf = ?, wrap_kdf_params = ?"
+            " WHERE username = ? AND wrapped_key IS ?",
+            (rewrapped, policy[0], kdf.dump_params(policy[1]), username, wrapped),
+        ).rowcount
+    if not updated:
+        return _vault_key(username, password, salt)
+    return key
+
+
+def kdf_policy() -> tuple[str, dict]:
+    """Return the (algorithm, params) new and upgraded hashes should use."""
+    row = db.get_connection(DB_PATH).execute(
+        "SELECT value FROM settings WHERE key = ?", (KDF_POLICY_KEY,)
+    ).fetchone()
+    if row is None:
+        return kdf.LEGACY
+    policy = json.loads(row[0])
+    return policy["algorithm"], policy["params"]
+
+
+def save_kdf_policy(algorithm: str, params: dict):
+    """Hash new users with these settings and rehash others as they log in."""
+    kdf.derive("check", b"\0" * 16, algorithm, params)  # reject bad settings now
+    value = json.dumps({"algorithm": algorithm, "params": params}, sort_keys=True)
+    conn = db.get_connection(DB_PATH)
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+            (KDF_POLICY_KEY, value),
+        )
+
+
+def dummy_kdf() -> tuple[str, dict]:
+    """Return the (algorithm, params) most accounts are hashed with.
+
+    Unknown usernames are hashed with these, so a failed login costs what
+    it costs for most real accounts, whether or not they were rehashed yet.
+    """
+    global _dummy_kdf
+    expires, settings = _dummy_kdf
+    if settings is None or time.monotonic() > expires:
+        row = db.get_connection(DB_PATH).execute(
+            "SELECT kdf, kdf_params FROM users GROUP BY kdf, kdf_params ORDER BY count(*) DESC LIMIT 1"
+        ).fetchone()
+        settings = (row[0], kdf.load_params(row[1])) if row else kdf_policy()
+        _dummy_kdf = (time.monotonic() + DUMMY_KDF_TTL_S, settings)
+    return settings
+
+
+def create_user(username: str, password: str) -> bool:
+    """Store a new user. Returns False if the username is already taken."""
+    conn = db.get_connection(DB_PATH)
+    with conn:
+        cur = conn.cursor()
+
+        # Check if username exists
+        cur.execute("SELECT id FROM users WHERE username = ?", (username,))
+        if cur.fetchone() is not None:
+            return False
+
+        algorithm, params = kdf_policy()
+        salt, pwd_hash = hash_password(password, None, algorithm, params)
+
+        cur.execute(
+            "INSERT INTO users (username, salt, password_hash, kdf, kdf_params)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (username, salt, pwd_hash, algorithm, kdf.dump_params(params)),
+        )
+    return True
+
+
+def _verified_salt(username: str, password: str) -> bytes | None:
+    """Return the user's salt if the password matches, else None.
+
+    Raises throttle.LoginThrottled, before any hashing, once the username or
+    the app as a whole has made too many attempts.
+    """
+    THROTTLE.acquire(username)
+    salt = _check_password(username, password)
+    THROTTLE.record(username, salt is not None)
+    return salt
+
+
+def _check_password(username: str, password: str) -> bytes | None:
+    """Compare against the stored hash; see _verified_salt.
+
+    A match hashed with settings older than the current policy is rehashed
+    on the spot. The vault key is wrapped separately, see _vault_key.
+    """
+    conn = db.get_connection(DB_PATH)
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT salt, password_hash, kdf, kdf_params FROM users WHERE username = ?",
+        (username,),
+    )
+    row = cur.fetchone()
+
+    if row is None:
+        # Same work as a wrong password, so timing does not reveal the name is free
+        hash_password(password, DUMMY_SALT, *dummy_kdf())
+        return None
+
+    db_salt, db_hash, algorithm, params = row
+    params = kdf.load_params(params)
+    _, entered_hash = hash_password(password, db_salt, algorithm, params)
+    if not hmac.compare_digest(entered_hash, db_hash):
+        return None
+
+    new_algorithm, new_params = kdf_policy()
+    if (new_algorithm, new_params) != (algorithm, params):
+        _, new_hash = hash_password(password, db_salt, new_algorithm, new_params)
+        with conn:
+            conn.execute(
+                "UPDATE users SET password_hash = ?, kdf = ?, kdf_params = ? WHERE username = ?",
+                (new_hash, new_algorithm, kdf.dump_params(new_params), username),
+            )
+    return db_salt
+
+
+def verify_login(username: str, password: str) -> bool:
+    """Return True if the username exists and the password matches."""
+    return _verified_salt(username, password) is not None
+
+
+def unlock(username: str, password: str) -> Session | None:
+    """Verify the login and unwrap the vault key; returns None if it is wrong.
+
+    Raises throttle.LoginThrottled when there have been too many attempts.
+
+    Rows the user stored before encryption existed are sealed on the way,
+    and rows without a reuse fingerprint get one.
+    """
+    salt = _verified_salt(username, password)
+    if salt is None:
+        return None
+
+    schema.migrate_db(db.VAULT_DB, schema.VAULT_MIGRATIONS)
+    session = Session(username, _vault_key(username, password, salt))
+    session.encrypt_plaintext_rows()
+    session.fingerprint_rows()
+    return session
+
+
+def unlock_for_cli(username: str, password_env: str | None = None) -> Session:
+    """Unlock for a command-line tool, reading the master password from
+    password_env or a prompt. Raises ValueError if it is wrong."""
+    if password_env:
+        password = os.environ.get(password_env, "")
+    else:
+        password = getpass.getpass(f"Master password for {username}: ")
+    schema.migrate_db(DB_PATH, schema.USERS_MIGRATIONS)
+    try:
+        session = unlock(username, password)
+    except throttle.LoginThrottled as e:
+        raise ValueError(f"{username}: {e}") from e
+    if session is None:
+        raise ValueError(f"invalid username or password for {username}")
+    return session
@@ -0,0 +1,416 @@
+# backup.py
+"""Online backups of users.db and vault.db, safe while windows are writing.
+
+    python backup.py run               # incremental when possible
+    python backup.py run --full
+    python backup.py list
+    python backup.py restore vault.db restored.db [--at 20260101T120000]
+
+A full backup copies the database with SQLite's online backup API, a few
+hundred pages per step, so writers are only held up for one step at a time.
+After that, triggers log the rowid of every row written (the changelog,
+schema migrations users 5 and vault 8), and a later backup stores only the
+rows the changelog names, as a small SQLite file (a delta). A backup of a
+database nothing was written to since the previous one stores nothing. So
+an hourly run costs time and I/O in proportion to what changed, not to the
+size of the database.
+
+A chain is one full snapshot and the deltas after it. A backup is full
+when asked to, after MAX_CHAIN deltas, and when the schema or the backup
+directory changed since the chain began. The newest KEEP_CHAINS chains are
+kept and older ones are deleted.
+
+Backups never run twice at once in one process; do not point two processes
+at the same backup directory. A database has one changelog, so backing it
+up into two directories makes every backup a full one.
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+
+import db
+
+BACKUP_DIR = os.environ.get("SQRITY_BACKUP_DIR", "backups")
+DATABASES = (db.USERS_DB, db.VAULT_DB)
+
+PAGES_PER_STEP = 256    # pages copied while holding the source's read lock
+STEP_SLEEP_S = 0.005    # pause between steps, lets writers in
+KEEP_CHAINS = 7         # full snapshots kept, each with its deltas
+MAX_CHAIN = 24          # deltas before the next backup is a full one again
+
+# Minutes between backups while the GUI runs; 0 turns them off
+INTERVAL_MIN = float(os.environ.get("SQRITY_BACKUP_INTERVAL_MIN", "60"))
+
+FULL_SUFFIX = ".full.db"
+DELTA_SUFFIX = ".delta.db"
+PENDING = ("", -1)  # backup_base while a full backup is being taken
+
+# A delta holds delta_info (the schema version), delta_ranges (tbl, lo, hi:
+# the rowids the changelog named) and, for each table in delta_ranges, a
+# table of that name with the rows of those ranges as they are now, each
+# with its rowid in backup_rowid. A rowid in the ranges without a row was
+# deleted.
+
+_running = threading.Lock()
+_executor = None  # the scheduler's own thread, so logins never queue behind a backup
+
+
+# ----------------------
+#   TAKING BACKUPS
+# ----------------------
+def _stamp_of(name: str) -> str:
+    for suffix in (FULL_SUFFIX, DELTA_SUFFIX):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def _chains(directory: str):
+    """Return [[full, delta, ...]] file names in directory, oldest chain first."""
+    chains = []
+    names = sorted(os.listdir(directory), key=_stamp_of) if os.path.isdir(directory) else []
+    for name in names:
+        if name.endswith(FULL_SUFFIX):
+            chains.append([name])
+        elif name.endswith(DELTA_SUFFIX) and chains:
+            chains[-1].append(name)
+    return chains
+
+
+def _stamp(directory: str) -> str:
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    taken = set(os.listdir(directory))
+    name, n = stamp, 1
+    while name + FULL_SUFFIX in taken or name + DELTA_SUFFIX in taken:
+        n += 1
+        name = f"{stamp}.{n:03d}"  # sorts after the plain stamp
+    return name
+
+
+def copy_online(path: str, dest: str, pages: int = PAGES_PER_STEP, progress=None) -> int:
+    """Copy the live database at path to dest in steps; returns its page size."""
+    src = db.connect(path)
+    dst = sqlite3.connect(dest)
+    try:
+        def step(status, remaining, total):
+            if progress is not None:
+                progress(total - remaining, total)
+
+        src.backup(dst, pages=pages, progress=step, sleep=STEP_SLEEP_S)
+        # Keep the copy a single self-contained file
+        dst.execute("PRAGMA journal_mode = DELETE")
+        return dst.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
+
+
+def _tracked(conn: sqlite3.Connection) -> bool:
+    """Whether the database has the changelog (schema migrations users 5, vault 8)."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'backup_base'"
+    ).fetchone() is not None
+
+
+def _base(directory: str, full_name: str) -> str:
+    """What backup_base.chain names while the changelog continues the chain
+    that starts with full_name in directory."""
+    return os.path.join(os.path.abspath(directory), full_name)
+
+
+def _ranges(rows):
+    """Merge (table, lo, hi) rows sorted by table and lo into {table: [(lo, hi)]}."""
+    merged = {}
+    for table, lo, hi in rows:
+        spans = merged.setdefault(table, [])
+        if spans and lo <= spans[-1][1] + 1:
+            spans[-1] = (spans[-1][0], max(hi, spans[-1][1]))
+        else:
+            spans.append((lo, hi))
+    return merged
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str):
+    return [name for _, name, *_ in conn.execute(f'PRAGMA {schema}.table_info("{table}")')]
+
+
+def _backup_changes(conn: sqlite3.Connection, directory: str, name: str):
+    """Store the rows the changelog names as a delta continuing the newest chain.
+
+    Returns (delta written, rows stored), (None, 0) when nothing changed,
+    or None when the changelog does not continue that chain and the backup
+    has to be full.
+    """
+    chains = _chains(directory)
+    target = os.path.join(directory, name + DELTA_SUFFIX)
+    partial = target + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)  # left by a run that crashed
+
+    written = False
+    conn.execute("ATTACH DATABASE ? AS delta", (partial,))
+    try:
+        # One read transaction: the changelog and the rows come from the
+        # same snapshot, whatever is committed meanwhile
+        conn.execute("BEGIN")
+        try:
+            version = conn.execute("PRAGMA main.user_version").fetchone()[0]
+            base = conn.execute("SELECT chain, version FROM main.backup_base").fetchone()
+            if (not chains or len(chains[-1]) > MAX_CHAIN
+                    or base != (_base(directory, chains[-1][0]), version)):
+                conn.rollback()
+                return None
+            last = conn.execute("SELECT coalesce(max(seq), 0) FROM main.backup_changes").fetchone()[0]
+            if not last:
+                conn.rollback()
+                return None, 0
+
+            ranges = _ranges(conn.execute(
+                "SELECT tbl, lo, hi FROM main.backup_changes WHERE seq <= ? ORDER BY tbl, lo", (last,)))
+            conn.execute("CREATE TABLE delta.delta_info (version INTEGER NOT NULL)")
+            conn.execute("INSERT INTO delta.delta_info VALUES (?)", (version,))
+            conn.execute(
+                "CREATE TABLE delta.delta_ranges (tbl TEXT NOT NULL, lo INTEGER NOT NULL, hi INTEGER NOT NULL)")
+            stored = 0
+            for table, spans in ranges.items():
+                conn.executemany("INSERT INTO delta.delta_ranges VALUES (?, ?, ?)",
+                                 [(table, lo, hi) for lo, hi in spans])
+                columns = ", ".join(f'"{column}"' for column in _columns(conn, "main", table))
+                conn.execute(f'CREATE TABLE delta."{table}" AS'
+                             f' SELECT rowid AS backup_rowid, {columns} FROM main."{table}" WHERE 0')
+                for lo, hi in spans:
+                    stored += conn.execute(
+                        f'INSERT INTO delta."{table}"'
+                        f' SELECT rowid, {columns} FROM main."{table}" WHERE rowid BETWEEN ? AND ?',
+                        (lo, hi),
+                    ).rowcount
+            conn.commit()
+            written = True
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute("DETACH DATABASE delta")
+        if not written and os.path.exists(partial):
+            os.remove(partial)
+    os.replace(partial, target)
+
+    # Dropped only once the delta is in place: a crash in between stores
+    # the same rows again next time
+    with conn:
+        conn.execute("DELETE FROM backup_changes WHERE seq <= ?", (last,))
+    return target, stored
+
+
+def _backup_full(conn: sqlite3.Connection, path: str, directory: str, name: str, progress=None):
+    """Store a full snapshot and start a new chain; returns (file written, pages stored)."""
+    tracked = _tracked(conn)
+    if tracked:
+        # Log from now on, so writes made while the copy runs are not lost
+        # to the next delta
+        with conn:
+            conn.execute("DELETE FROM backup_base")
+            conn.execute("INSERT INTO backup_base (chain, version) VALUES (?, ?)", PENDING)
+
+    staging = os.path.join(directory, "staging.partial")
+    page_size = copy_online(path, staging, progress=progress)
+    last = version = None
+    if tracked:
+        copy = sqlite3.connect(staging)
+        try:
+            last = copy.execute("SELECT coalesce(max(seq), 0) FROM backup_changes").fetchone()[0]
+            version = copy.execute("PRAGMA user_version").fetchone()[0]
+            # A database restored from this snapshot starts without a chain
+            copy.execute("DELETE FROM backup_changes")
+            copy.execute("DELETE FROM backup_base")
+            copy.commit()
+        finally:
+            copy.close()
+
+    target = os.path.join(directory, name + FULL_SUFFIX)
+    os.replace(staging, target)
+    if tracked:
+        with conn:
+            conn.execute("DELETE FROM backup_changes WHERE seq <= ?", (last,))
+            conn.execute("UPDATE backup_base SET chain = ?, version = ?",
+                         (_base(directory, name + FULL_SUFFIX), version))
+    return target, os.path.getsize(target) // page_size
+
+
+def backup_database(path: str, backup_dir: str = BACKUP_DIR, full: bool = False, progress=None):
+    """Back up one database; returns (file written, rows or pages stored).
+
+    The file is None when nothing changed since the previous backup.
+    """
+    directory = os.path.join(backup_dir, os.path.splitext(os.path.basename(path))[0])
+    os.makedirs(directory, exist_ok=True)
+    name = _stamp(directory)
+
+    conn = db.connect(path)
+    try:
+        result = None
+        if not full and _tracked(conn):
+            result = _backup_changes(conn, directory, name)
+        if result is None:
+            result = _backup_full(conn, path, directory, name, progress)
+    finally:
+        conn.close()
+
+    rotate(directory)
+    return result
+
+
+def rotate(directory: str, keep: int = KEEP_CHAINS):
+    """Delete every chain but the newest keep."""
+    for chain in _chains(directory)[:-keep]:
+        for name in chain:
+            os.remove(os.path.join(directory, name))
+
+
+def run(backup_dir: str = BACKUP_DIR, full: bool = False, databases=DATABASES, progress=None):
+    """Back up every database; returns [(database, file written, rows or pages stored)].
+
+    Returns None without doing anything if a backup is already running.
+    """
+    if not _running.acquire(blocking=False):
+        return None
+    try:
+        return [(path, *backup_database(path, backup_dir, full, progress))
+                for path in databases if os.path.exists(path)]
+    finally:
+        _running.release()
+
+
+def schedule(widget, interval_min: float = INTERVAL_MIN, backup_dir: str = BACKUP_DIR):
+    """Back up every interval_min minutes on a thread of its own while
+    widget's Tk loop runs. The first backup happens one interval after the call.
+    """
+    if interval_min <= 0:
+        return
+    global _executor
+    from concurrent.futures import ThreadPoolExecutor
+
+    import tasks
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqrity-backup")
+
+    def done(future):
+        try:
+            future.result()
+        except Exception as e:  # whatever went wrong, keep the schedule going
+            print(f"Backup failed: {e!r}", file=sys.stderr)
+        widget.after(int(interval_min * 60_000), start)
+
+    def start():
+        tasks.when_done(widget, _executor.submit(run, backup_dir), done)
+
+    widget.after(int(interval_min * 60_000), start)
+
+
+# ----------------------
+#   RESTORING
+# ----------------------
+def _apply_delta(conn: sqlite3.Connection, path: str):
+    """Bring the database open in conn up to the delta at path."""
+    conn.execute("ATTACH DATABASE ? AS delta", (path,))
+    try:
+        try:
+            ranges = conn.execute("SELECT tbl, lo, hi FROM delta.delta_ranges").fetchall()
+        except sqlite3.DatabaseError as e:
+            raise ValueError(f"{os.path.basename(path)} is not a backup delta") from e
+        with conn:
+            # Deleted first, so the vault_fts triggers see every old row go
+            for table, lo, hi in ranges:
+                conn.execute(f'DELETE FROM main."{table}" WHERE rowid BETWEEN ? AND ?', (lo, hi))
+            for table in dict.fromkeys(table for table, _, _ in ranges):
+                columns = ", ".join(f'"{column}"' for column in _columns(conn, "delta", table)[1:])
+                # OR REPLACE: a row rewritten by INSERT OR REPLACE came back
+                # under a new rowid, the old one has to make way
+                conn.execute(f'INSERT OR REPLACE INTO main."{table}" (rowid, {columns})'
+                             f' SELECT backup_rowid, {columns} FROM delta."{table}"')
+    finally:
+        conn.execute("DETACH DATABASE delta")
+
+
+def restore(directory: str, out: str, at: str | None = None) -> str:
+    """Rebuild the database backed up in directory as of the backup named at
+    (its time stamp; default the newest) into out. Returns the stamp used.
+    """
+    chain = None
+    for candidate in _chains(directory):
+        if at is None or _stamp_of(candidate[0]) <= at:
+            chain = candidate
+    if chain is None:
+        raise ValueError(f"no backup in {directory}" + (f" at or before {at}" if at else ""))
+    if at is not None:
+        chain = [name for name in chain if _stamp_of(name) <= at]
+
+    partial = out + ".partial"
+    shutil.copyfile(os.path.join(directory, chain[0]), partial)
+    conn = sqlite3.connect(partial)
+    try:
+        for name in chain[1:]:
+            _apply_delta(conn, os.path.join(directory, name))
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        conn.close()
+    if result != "ok":
+        os.remove(partial)
+        raise ValueError(f"restored database failed its integrity check: {result}")
+    os.replace(partial, out)
+    return _stamp_of(chain[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Back up and restore SQRITY databases.")
+    parser.add_argument("--dir", default=BACKUP_DIR, help=f"backup directory (default: {BACKUP_DIR})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("run", help="back up users.db and vault.db now")
+    cmd.add_argument("--full", action="store_true", help="store full snapshots, not deltas")
+
+    commands.add_parser("list", help="list the stored backups")
+
+    cmd = commands.add_parser("restore", help="rebuild a database from its backups")
+    cmd.add_argument("database", help="which database, e.g. vault.db")
+    cmd.add_argument("out", help="file to write; never the live database while it is in use")
+    cmd.add_argument("--at", metavar="STAMP", help="time stamp of the backup to restore (default: newest)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "run":
+            def report(done, total):
+                print(f"\r{done:,}/{total:,} pages copied", end="", file=sys.stderr, flush=True)
+
+            start = time.perf_counter()
+            for path, target, stored in run(args.dir, args.full, progress=report) or ():
+                if target is None:
+                    print(f"\n{path}: unchanged, nothing stored", file=sys.stderr)
+                else:
+                    unit = "rows" if target.endswith(DELTA_SUFFIX) else "pages"
+                    print(f"\n{target}: {stored:,} {unit} stored", file=sys.stderr)
+            print(f"Backed up in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+        elif args.command == "list":
+            for path in DATABASES:
+                directory = os.path.join(args.dir, os.path.splitext(path)[0])
+                for chain in _chains(directory):
+                    sizes = [os.path.getsize(os.path.join(directory, name)) for name in chain]
+                    print(f"{path}: {chain[0]}, {len(chain) - 1} deltas, {sum(sizes):,} bytes")
+        else:
+            directory = os.path.join(args.dir, os.path.splitext(os.path.basename(args.database))[0])
+            stamp = restore(directory, args.out, args.at)
+            print(f"Restored {args.database} as of {stamp} to {args.out}", file=sys.stderr)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"\n{args.command} failed: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+# bench.py
+"""Headless benchmarks for the hot paths, on seeded synthetic vaults.
+
+    python bench.py --out results.json
+    python bench.py --sizes 1000,100000 --compare results.json
+
+Datasets (users.db + vault.db) are generated from a fixed seed into
+--data-dir and reused by later runs. Results are JSON: one entry per metric
+with its value, unit and whether higher or lower is better, so two runs can
+be compared and a slowdown fails the run.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+import auth
+import cache
+import db
+import kdf
+import passgen
+import schema
+import vault
+import writer
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+KDF_ITERATIONS = (10_000, 100_000, 300_000)
+SEED = 215
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench-password"
+OTHER_USERS = 9             # owners of the extra rows that share the vault
+OTHER_ROWS_RATIO = 0.1      # extra rows per bench row
+SEED_BATCH = 50_000
+
+APP_WORDS = (
+    "google", "github", "amazon", "bank", "mail", "shop", "cloud", "portal",
+    "admin", "test", "stream", "news", "game", "music", "photo", "travel",
+)
+
+
+# ----------------------
+#   TIMING
+# ----------------------
+def timed(fn, repeat: int = 5):
+    """Run fn repeat times and return the median wall time in seconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def metric(value, unit, better="lower"):
+    return {"value": round(value, 4), "unit": unit, "better": better}
+
+
+# ----------------------
+#   DATASETS
+# ----------------------
+@contextlib.contextmanager
+def working_dir(path: str):
+    """Run the block inside path, so the modules' relative users.db and
+    vault.db paths point at that dataset."""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        db.close_thread_connections()
+        os.chdir(previous)
+
+
+def dataset_dir(base: str, rows: int, seed: int = SEED) -> str:
+    return os.path.join(base, f"vault-{rows}-seed{seed}")
+
+
+def seed_dataset(path: str, rows: int, seed: int = SEED):
+    """Fill path/users.db and path/vault.db with a reproducible vault.
+
+    BENCH_USER owns `rows` sealed entries; OTHER_USERS share another 10% so
+    per-user queries have to skip foreign rows. Skipped if already present.
+    """
+    done_marker = os.path.join(path, ".complete")
+    if os.path.exists(done_marker):
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in (db.USERS_DB, db.VAULT_DB):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(os.path.join(path, name + suffix)):
+                os.remove(os.path.join(path, name + suffix))
+
+    rng = random.Random(seed)
+    with working_dir(path):
+        schema.migrate_db(db.USERS_DB, schema.USERS_MIGRATIONS)
+        schema.migrate_db(db.VAULT_DB, schema.VAULT_MIGRATIONS)
+        users = [BENCH_USER] + [f"user{i}" for i in range(OTHER_USERS)]
+        for username in users:
+            auth.create_user(username, BENCH_PASSWORD)
+        session = auth.unlock(BENCH_USER, BENCH_PASSWORD)
+
+        conn = db.get_connection(db.VAULT_DB)
+        alphabet = string.ascii_letters + string.digits
+
+        def fake_row(owner):
+            app_name = f"{rng.choice(APP_WORDS)}-{''.join(rng.choices(string.ascii_lowercase, k=6))}"
+            pwd = "".join(rng.choices(alphabet, k=16))
+            if owner == BENCH_USER:
+                return owner, app_name, "", session.seal(app_name, pwd), session.fingerprint(pwd)
+            return owner, app_name, pwd, None, None
+
+        total = rows + int(rows * OTHER_ROWS_RATIO)
+        owners = [BENCH_USER] * rows + [rng.choice(users[1:]) for _ in range(total - rows)]
+        rng.shuffle(owners)
+        for start in range(0, total, SEED_BATCH):
+            batch = [fake_row(owner) for owner in owners[start:start + SEED_BATCH]]
+            with conn:
+                last_id = conn.execute("SELECT coalesce(max(id), 0) FROM vault").fetchone()[0]
+                conn.execute("INSERT INTO vault_fts_pause (active) VALUES (1)")
+                conn.executemany(
+                    "INSERT INTO vault (owner_username, app_name, password, secret, fingerprint)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    batch,
+                )
+                conn.execute("DELETE FROM vault_fts_pause")
+                conn.execute(
+                    "INSERT INTO vault_fts (rowid, owner_key, app_name)"
+                    " SELECT id, owner_key, app_name FROM vault_fts_source WHERE id > ?",
+                    (last_id,),
+                )
+                conn.execute(schema.LOG_BULK_INSERT, (last_id + 1, last_id + 1))
+        conn.execute("PRAGMA optimize")
+        db.close_thread_connections()
+
+    with open(done_marker, "w") as fp:
+        fp.write(str(rows))
+
+
+# ----------------------
+#   BENCHMARKS
+# ----------------------
+def bench_kdf(results):
+    salt = b"\0" * 16
+    for iterations in KDF_ITERATIONS:
+        seconds = timed(lambda: kdf.derive("benchmark", salt, kdf.PBKDF2, {"iterations": iterations}), 3)
+        results[f"kdf.pbkdf2_sha256.{iterations}.ms"] = metric(seconds * 1000, "ms")
+    seconds = timed(lambda: kdf.derive("benchmark", salt, kdf.SCRYPT), 3)
+    results["kdf.scrypt.default.ms"] = metric(seconds * 1000, "ms")
+    seconds = timed(lambda: auth.hash_password("benchmark", salt), 3)
+    results["kdf.hash_password.ms"] = metric(seconds * 1000, "ms")
+
+
+def bench_generation(results):
+    count = 10_000
+    seconds = timed(lambda: passgen.generate_passwords(count, 16), 3)
+    results["generate.batch_16.per_s"] = metric(count / seconds, "passwords/s", "higher")
+    seconds = timed(lambda: passgen.generate_password(16), 50)
+    results["generate.single_16.us"] = metric(seconds * 1e6, "us")
+
+
+def bench_inserts(results, scratch: str):
+    path = os.path.join(scratch, "inserts")
+    os.makedirs(path, exist_ok=True)
+    with working_dir(path):
+        schema.migrate_db(db.USERS_DB, schema.USERS_MIGRATIONS)
+        schema.migrate_db(db.VAULT_DB, schema.VAULT_MIGRATIONS)
+        auth.create_user(BENCH_USER, BENCH_PASSWORD)
+        session = auth.unlock(BENCH_USER, BENCH_PASSWORD)
+
+        # One transaction per entry, the way the generator window saves
+        count = 500
+        start = time.perf_counter()
+        for i in range(count):
+            vault.add_entry(session, f"single-{i}", "pw")
+        results["insert.single.rows_per_s"] = metric(
+            count / (time.perf_counter() - start), "rows/s", "higher")
+
+        # Several windows saving at once, group-committed by the writer thread
+        count = 2_000
+        start = time.perf_counter()
+        futures = [vault.add_entry_async(session, f"queued-{i}", "pw") for i in range(count)]
+        for future in futures:
+            future.result()
+        results["insert.writer.rows_per_s"] = metric(
+            count / (time.perf_counter() - start), "rows/s", "higher")
+        writer.get(db.VAULT_DB).close()
+
+        # One executemany in one transaction, the way the importer writes
+        count = 50_000
+        rows = [(BENCH_USER, f"batch-{i}", "", session.seal(f"batch-{i}", "pw"), session.fingerprint("pw"))
+                for i in range(count)]
+        conn = db.get_connection(db.VAULT_DB)
+        start = time.perf_counter()
+        with conn:
+            conn.executemany(
+                "INSERT INTO vault (owner_username, app_name, password, secret, fingerprint)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        results["insert.batched.rows_per_s"] = metric(
+            count / (time.perf_counter() - start), "rows/s", "higher")
+
+
+def bench_reads(results, base: str, rows: int):
+    path = dataset_dir(base, rows)
+    seed_dataset(path, rows)
+    with working_dir(path):
+        session = auth.unlock(BENCH_USER, BENCH_PASSWORD)
+
+        seconds = timed(lambda: vault.fetch_passwords_for_user(BENCH_USER, session), 3)
+        results[f"fetch.all.{rows}.ms"] = metric(seconds * 1000, "ms")
+        seconds = timed(lambda: vault.fetch_page_after(BENCH_USER), 20)
+        results[f"fetch.first_page.{rows}.ms"] = metric(seconds * 1000, "ms")
+        # Copying one password: one primary key read and one decryption
+        entry_id = vault.fetch_page_after(BENCH_USER)[0][0]
+        seconds = timed(lambda: vault.reveal_entry(BENCH_USER, entry_id, session), 20)
+        results[f"fetch.one_secret.{rows}.us"] = metric(seconds * 1e6, "us")
+        # Showing the viewer again with vault.db unchanged
+        listings = cache.ListingCache(db.VAULT_DB)
+        seconds = timed(lambda: listings.get(
+            BENCH_USER, ("after", None), lambda: vault.fetch_page_after(BENCH_USER)), 20)
+        results[f"fetch.first_page_cached.{rows}.us"] = metric(seconds * 1e6, "us")
+        listings.close()
+        seconds = timed(lambda: vault.search_vault(BENCH_USER, "mail-a"), 20)
+        results[f"search.substring.{rows}.ms"] = metric(seconds * 1000, "ms")
+        seconds = timed(lambda: vault.search_vault(BENCH_USER, "ail"), 20)  # every mail-* entry, 1 in 16
+        results[f"search.broad.{rows}.ms"] = metric(seconds * 1000, "ms")
+        seconds = timed(lambda: vault.search_vault(BENCH_USER, "g"), 20)
+        results[f"search.prefix.{rows}.ms"] = metric(seconds * 1000, "ms")
+
+        seconds = timed(lambda: auth.unlock(BENCH_USER, BENCH_PASSWORD), 5)
+        results[f"login.round_trip.{rows}.ms"] = metric(seconds * 1000, "ms")
+
+
+# ----------------------
+#   REPORTING
+# ----------------------
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float):
+    """Print current vs baseline and return the names of regressed metrics."""
+    regressions = []
+    for name, now in sorted(current["metrics"].items()):
+        before = baseline.get("metrics", {}).get(name)
+        if before is None or not before["value"]:
+            continue
+        change = (now["value"] - before["value"]) / before["value"]
+        worse = change > tolerance if now["better"] == "lower" else change < -tolerance
+        flag = "  REGRESSION" if worse else ""
+        print(f"{name:40} {before['value']:>12,.3f} -> {now['value']:>12,.3f} {now['unit']:12}"
+              f" {change:+7.1%}{flag}", file=sys.stderr)
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the SQRITY benchmarks without a display.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma separated vault sizes for the read benchmarks")
+    parser.add_argument("--data-dir", default=".bench", help="where seeded datasets are kept")
+    parser.add_argument("--out", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON results of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative slowdown that counts as a regression (default 0.2)")
+    parser.add_argument("--only", help="comma separated groups: kdf,generate,insert,read")
+    args = parser.parse_args(argv)
+
+    groups = set(args.only.split(",")) if args.only else {"kdf", "generate", "insert", "read"}
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    base = os.path.abspath(args.data_dir)
+
+    # Benchmarks log in far more often than a person would
+    auth.THROTTLE.enabled = False
+
+    metrics = {}
+    if "kdf" in groups:
+        bench_kdf(metrics)
+    if "generate" in groups:
+        bench_generation(metrics)
+    if "insert" in groups:
+        with tempfile.TemporaryDirectory() as scratch:
+            bench_inserts(metrics, scratch)
+    if "read" in groups:
+        for rows in sizes:
+            bench_reads(metrics, base, rows)
+
+    result = {"environment": environment(), "metrics": metrics}
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as fp:
+            fp.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        if compare(result, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
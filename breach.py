@@ -0,0 +1,303 @@
+# breach.py
+"""Offline check of passwords against the Pwned Passwords SHA-1 dump.
+
+The text dump (one ``HASH:COUNT`` line per password, or a directory of
+range files ``PREFIX.txt`` holding ``SUFFIX:COUNT`` lines) is converted
+once into a sorted file of fixed-width records:
+
+    python breach.py convert pwned-passwords-sha1.txt breach.bin
+    python breach.py check            # password from a prompt
+    python breach.py audit --user alice
+
+Lookups binary-search the file through mmap, so they touch O(log n) pages
+and nothing is loaded up front, however large the dump is.
+"""
+
+import argparse
+import getpass
+import hashlib
+import heapq
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import tempfile
+
+import crypto
+import db
+
+MAGIC = b"SQRBRCH1"
+HEADER = struct.Struct(">8sII")        # magic, hash size, count size
+HASH_SIZE = 20                         # SHA-1
+COUNT = struct.Struct(">I")            # times seen, capped at 2**32 - 1
+RECORD_SIZE = HASH_SIZE + COUNT.size
+MAX_COUNT = 2 ** 32 - 1
+
+# Where the converted file is looked for, like users.db and vault.db
+BREACH_FILE = os.environ.get("SQRITY_BREACH_FILE", "breach.bin")
+CHUNK_RECORDS = 4_000_000  # records sorted in memory per run while converting
+AUDIT_FETCH = 1_000
+
+
+class BreachList:
+    """A converted breach file, memory-mapped read-only."""
+
+    def __init__(self, path: str):
+        """Raises ValueError unless path is a whole converted breach file."""
+        self.path = path
+        with open(path, "rb") as fp:
+            header = fp.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError(f"{path} is not a converted breach file (see breach.py convert)")
+            magic, hash_size, count_size = HEADER.unpack(header)
+            if magic != MAGIC or (hash_size, count_size) != (HASH_SIZE, COUNT.size):
+                raise ValueError(f"{path} is not a converted breach file (see breach.py convert)")
+            body = os.fstat(fp.fileno()).st_size - HEADER.size
+            if body % RECORD_SIZE:
+                raise ValueError(f"{path} is truncated or corrupt: {body:,} bytes of records"
+                                 f" is not a whole number of {RECORD_SIZE}-byte records")
+            self._mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        self.records = body // RECORD_SIZE
+
+    def _hash_at(self, index: int) -> bytes:
+        offset = HEADER.size + index * RECORD_SIZE
+        return self._mm[offset:offset + HASH_SIZE]
+
+    def _count_at(self, index: int) -> int:
+        offset = HEADER.size + index * RECORD_SIZE + HASH_SIZE
+        return COUNT.unpack_from(self._mm, offset)[0]
+
+    def _search(self, digest: bytes, lo: int = 0) -> int:
+        """First index at or after lo whose hash is >= digest.
+
+        Gallops forward from lo before bisecting, so a sorted batch of
+        lookups walks the file once instead of starting over each time.
+        """
+        hi, step = self.records, 1
+        while lo + step < hi and self._hash_at(lo + step) < digest:
+            lo += step
+            step *= 2
+        hi = min(lo + step + 1, hi)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._hash_at(mid) < digest:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, digest: bytes) -> int:
+        """How often a SHA-1 digest was seen in breaches; 0 if never."""
+        index = self._search(digest)
+        if index < self.records and self._hash_at(index) == digest:
+            return self._count_at(index)
+        return 0
+
+    def lookup_sorted(self, digests) -> list:
+        """lookup() for each of an ascending sequence of digests, in one pass."""
+        counts = []
+        index = 0
+        for digest in digests:
+            index = self._search(digest, index)
+            found = index < self.records and self._hash_at(index) == digest
+            counts.append(self._count_at(index) if found else 0)
+        return counts
+
+    def count(self, password: str) -> int:
+        return self.lookup(sha1(password))
+
+    def close(self):
+        self._mm.close()
+
+
+def sha1(password: str) -> bytes:
+    return hashlib.sha1(password.encode("utf-8")).digest()
+
+
+_default = None
+
+
+def open_default():
+    """The BreachList at BREACH_FILE, opened once; None if there is none."""
+    global _default
+    if _default is None and os.path.exists(BREACH_FILE):
+        _default = BreachList(BREACH_FILE)
+    return _default
+
+
+# ----------------------
+#   VAULT AUDIT
+# ----------------------
+def audit_vault(session, breaches: BreachList, db_path: str = db.VAULT_DB):
+    """Return [(app_name, times seen)] for the session user's breached entries,
+    most seen first.
+
+    Every entry is decrypted and hashed, the hashes are sorted, and the breach
+    file is walked once for the whole vault.
+    """
+    cur = db.get_connection(db_path).cursor()
+    cur.execute(
+        "SELECT app_name, password, secret FROM vault WHERE owner_username = ?",
+        (session.username,),
+    )
+    hashed = []
+    while True:
+        rows = cur.fetchmany(AUDIT_FETCH)
+        if not rows:
+            break
+        for app_name, password, secret in rows:
+            try:
+                hashed.append((sha1(session.reveal(app_name, password, secret)), app_name))
+            except crypto.DecryptionError:
+                continue
+    hashed.sort()
+
+    counts = breaches.lookup_sorted(digest for digest, _ in hashed)
+    found = [(app_name, seen) for (_, app_name), seen in zip(hashed, counts) if seen]
+    found.sort(key=lambda item: (-item[1], item[0]))
+    return found
+
+
+# ----------------------
+#   CONVERSION
+# ----------------------
+def _parse(line: str, prefix: str = ""):
+    text, _, seen = line.strip().partition(":")
+    digest = bytes.fromhex(prefix + text)
+    if len(digest) != HASH_SIZE:
+        raise ValueError(f"not a SHA-1 hash: {prefix + text!r}")
+    return digest + COUNT.pack(min(int(seen or 1), MAX_COUNT))
+
+
+def iter_records(source: str):
+    """Yield packed records from a dump file or a directory of range files."""
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            prefix = os.path.splitext(name)[0].upper()
+            if len(prefix) != 5:
+                continue
+            with open(os.path.join(source, name), encoding="ascii") as fp:
+                for line in fp:
+                    if line.strip():
+                        yield _parse(line, prefix)
+    else:
+        with open(source, encoding="ascii") as fp:
+            for line in fp:
+                if line.strip():
+                    yield _parse(line)
+
+
+def _write_run(records, directory: str) -> str:
+    records.sort()
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".run")
+    with os.fdopen(fd, "wb") as fp:
+        fp.write(b"".join(records))
+    return path
+
+
+def _read_run(path: str):
+    with open(path, "rb") as fp:
+        while True:
+            block = fp.read(RECORD_SIZE * 65_536)
+            if not block:
+                return
+            for offset in range(0, len(block), RECORD_SIZE):
+                yield block[offset:offset + RECORD_SIZE]
+
+
+def convert(source: str, out: str, chunk_records: int = CHUNK_RECORDS, progress=None) -> int:
+    """Convert a text dump to the sorted binary format; returns the record count.
+
+    Runs of chunk_records are sorted in memory and merged, so the dump does
+    not need to be sorted or to fit in RAM. A hash listed twice keeps its
+    highest count.
+    """
+    out_dir = os.path.dirname(os.path.abspath(out))
+    written = 0
+    with tempfile.TemporaryDirectory(dir=out_dir) as scratch:
+        runs, chunk, read = [], [], 0
+        for record in iter_records(source):
+            chunk.append(record)
+            read += 1
+            if len(chunk) >= chunk_records:
+                runs.append(_write_run(chunk, scratch))
+                chunk = []
+                if progress is not None:
+                    progress("sorted", read)
+        if chunk:
+            runs.append(_write_run(chunk, scratch))
+        del chunk
+
+        partial = out + ".partial"
+        with open(partial, "wb") as fp:
+            fp.write(HEADER.pack(MAGIC, HASH_SIZE, COUNT.size))
+            # Equal hashes arrive in ascending count order; write the last
+            pending = None
+            for record in heapq.merge(*(_read_run(path) for path in runs)):
+                if pending is not None and record[:HASH_SIZE] != pending[:HASH_SIZE]:
+                    fp.write(pending)
+                    written += 1
+                    if progress is not None and written % 10_000_000 == 0:
+                        progress("written", written)
+                pending = record
+            if pending is not None:
+                fp.write(pending)
+                written += 1
+        os.replace(partial, out)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline breached-password checks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("convert", help="build the binary file from the text dump")
+    cmd.add_argument("source", help="HASH:COUNT text file, or a directory of range files")
+    cmd.add_argument("out", nargs="?", default=BREACH_FILE)
+    cmd.add_argument("--chunk-records", type=int, default=CHUNK_RECORDS,
+                     help="records sorted in memory at a time (about 80 bytes of RAM each)")
+
+    commands.add_parser("check", help="look up one password, read from a prompt")
+
+    cmd = commands.add_parser("audit", help="check every entry in a user's vault")
+    cmd.add_argument("--user", required=True)
+    cmd.add_argument("--password-env", metavar="VAR",
+                     help="read the master password from this environment variable")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "convert":
+            def report(stage, count):
+                print(f"\r{count:,} records {stage}", end="", file=sys.stderr, flush=True)
+
+            written = convert(args.source, args.out, args.chunk_records, report)
+            print(f"\nWrote {written:,} hashes to {args.out}", file=sys.stderr)
+            return 0
+
+        breaches = open_default()
+        if breaches is None:
+            print(f"No breach file at {BREACH_FILE}; run 'breach.py convert' first", file=sys.stderr)
+            return 1
+
+        if args.command == "check":
+            seen = breaches.count(getpass.getpass("Password to check: "))
+            print(f"Seen {seen:,} times in breaches" if seen else "Not found in breaches")
+            return 1 if seen else 0
+
+        import auth  # only the audit needs an unlocked vault
+
+        session = auth.unlock_for_cli(args.user, args.password_env)
+        found = audit_vault(session, breaches)
+    except (OSError, EOFError, ValueError, RuntimeError, sqlite3.Error) as e:
+        print(f"\n{args.command} failed: {e}", file=sys.stderr)
+        return 1
+
+    for app_name, seen in found:
+        print(f"{seen:>12,}  {app_name}")
+    print(f"{len(found):,} breached passwords in {args.user}'s vault", file=sys.stderr)
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# cache.py
+"""In-memory LRU cache of vault listings, dropped as soon as vault.db changes.
+
+Validity is checked with PRAGMA data_version on a connection the cache
+keeps for itself and never writes on: its value moves whenever any other
+connection, in this process or another, commits to the database. A check
+is one pragma (a few microseconds), so showing the viewer again or paging
+back over rows already seen costs no query when nothing changed.
+
+Entries hold rows as the database returns them, secrets still sealed.
+Callers share the cached lists, so they must not modify them.
+"""
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import db
+
+MAX_USERS = 8              # users whose listings are kept
+MAX_ROWS_PER_USER = 2_000  # rows kept per user, over all their cached queries
+
+
+class ListingCache:
+    """Per-user LRU of query results; get() loads and stores on a miss."""
+
+    def __init__(self, path: str = db.VAULT_DB, max_users: int = MAX_USERS,
+                 max_rows: int = MAX_ROWS_PER_USER):
+        self.path = path
+        self.max_users = max_users
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._users = OrderedDict()  # username -> [OrderedDict(key -> rows), rows held]
+        self._lock = threading.Lock()
+        self._probe = None
+        self._version = None
+
+    def _current_version(self):
+        """Check data_version, clearing everything if it moved; call with the lock held."""
+        if self._probe is None:
+            # Only ever runs the pragma, under the lock, so sharing it across threads is safe
+            self._probe = sqlite3.connect(self.path, check_same_thread=False)
+        version = self._probe.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._version:
+            if self._users:
+                self.invalidations += 1
+            self._users.clear()
+            self._version = version
+        return version
+
+    def get(self, username: str, key, load):
+        """Cached result of the query key for username, or load() on a miss."""
+        with self._lock:
+            version = self._current_version()
+            entry = self._users.get(username)
+            if entry is not None and key in entry[0]:
+                self._users.move_to_end(username)
+                entry[0].move_to_end(key)
+                self.hits += 1
+                return entry[0][key]
+            self.misses += 1
+
+        rows = load()  # outside the lock, other users' lookups carry on
+
+        with self._lock:
+            # A commit while loading may have changed the result, do not keep it
+            if self._current_version() == version and len(rows) <= self.max_rows:
+                self._store(username, key, rows)
+        return rows
+
+    def _store(self, username, key, rows):
+        entry = self._users.get(username)
+        if entry is None:
+            entry = self._users[username] = [OrderedDict(), 0]
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        self._users.move_to_end(username)
+        queries, _ = entry
+        old = queries.pop(key, None)
+        queries[key] = rows
+        entry[1] += len(rows) - (len(old) if old is not None else 0)
+        while entry[1] > self.max_rows:
+            _, evicted = queries.popitem(last=False)
+            entry[1] -= len(evicted)
+
+    def invalidate(self, username: str | None = None):
+        """Drop one user's listings, or everything; for changes data_version cannot see."""
+        with self._lock:
+            if username is None:
+                self._users.clear()
+            else:
+                self._users.pop(username, None)
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "users": len(self._users),
+                "rows": sum(rows for _, rows in self._users.values()),
+            }
+
+    def close(self):
+        with self._lock:
+            self._users.clear()
+            if self._probe is not None:
+                self._probe.close()
+                self._probe = None
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def listings(path: str = db.VAULT_DB) -> ListingCache:
+    """The process's shared listing cache for the database at path."""
+    key = os.path.abspath(path)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ListingCache(path)
+        return cache
@@ -0,0 +1,55 @@
+# crypto.py
+"""Authenticated encryption (AES-256-GCM) for vault data.
+
+AES-GCM comes from the optional 'cryptography' package. It is imported on
+first use, so the rest of the app keeps working without it.
+"""
+
+import os
+
+KEY_SIZE = 32    # bytes, AES-256
+NONCE_SIZE = 12  # bytes, a fresh random nonce per sealed message
+
+
+class DecryptionError(Exception):
+    """Wrong key, or the data was modified or truncated."""
+
+
+def new_cipher(key: bytes):
+    """Return an AES-GCM cipher for key; build it once and reuse it for many rows."""
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    except ImportError as e:
+        raise RuntimeError(
+            "Encryption requires the 'cryptography' package.\n\n"
+            "Please install it using:\n"
+            "pip install cryptography"
+        ) from e
+    return AESGCM(key)
+
+
+def seal(cipher, plaintext: bytes, aad: bytes | None = None) -> bytes:
+    """Encrypt and authenticate plaintext; returns nonce + ciphertext + tag."""
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + cipher.encrypt(nonce, plaintext, aad)
+
+
+def seal_many(cipher, items) -> list:
+    """seal() each (plaintext, aad) pair, drawing all the nonces at once."""
+    nonces = os.urandom(NONCE_SIZE * len(items))
+    encrypt = cipher.encrypt
+    sealed = []
+    for i, (plaintext, aad) in enumerate(items):
+        nonce = nonces[i * NONCE_SIZE:(i + 1) * NONCE_SIZE]
+        sealed.append(nonce + encrypt(nonce, plaintext, aad))
+    return sealed
+
+
+def unseal(cipher, sealed: bytes, aad: bytes | None = None) -> bytes:
+    """Reverse seal(), raising DecryptionError if authentication fails."""
+    from cryptography.exceptions import InvalidTag
+
+    try:
+        return cipher.decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], aad)
+    except InvalidTag as e:
+        raise DecryptionError("could not decrypt: wrong key or corrupted data") from e
@@ -0,0 +1,76 @@
+# db.py
+"""Shared, tuned SQLite connections for users.db and vault.db.
+
+Each thread gets one connection per database file, opened on first use and
+kept for the life of the process. Use ``with conn:`` around writes; it
+commits or rolls back but leaves the connection open.
+"""
+
+import os
+import sqlite3
+import threading
+
+USERS_DB = "users.db"
+VAULT_DB = "vault.db"
+
+# How long a writer waits for another connection's lock before "database is locked"
+BUSY_TIMEOUT_MS = int(os.environ.get("SQRITY_BUSY_TIMEOUT_MS", "5000"))
+STATEMENT_CACHE = 256  # prepared statements kept per connection
+
+PRAGMAS = (
+    # Readers never block the writer and the writer never blocks readers
+    "PRAGMA journal_mode = WAL",
+    # With WAL, NORMAL can lose the last commit on power loss but never corrupts
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",     # in KiB, about 16 MB of page cache
+    "PRAGMA mmap_size = 268435456",   # read through a 256 MB memory map
+    "PRAGMA temp_store = MEMORY",
+    # Overwrite deleted and replaced content with zeros, so a password that
+    # was sealed or deleted does not linger in free space of the file
+    "PRAGMA secure_delete = ON",
+)
+
+_local = threading.local()
+
+
+def connect(path: str, busy_timeout_ms: int | None = None) -> sqlite3.Connection:
+    """Open a new tuned connection. Prefer get_connection() unless you own its lifetime."""
+    if busy_timeout_ms is None:
+        busy_timeout_ms = BUSY_TIMEOUT_MS
+    conn = sqlite3.connect(
+        path,
+        timeout=busy_timeout_ms / 1000,
+        cached_statements=STATEMENT_CACHE,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection(path: str) -> sqlite3.Connection:
+    """Return this thread's long-lived connection to the database at path."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    key = os.path.abspath(path)
+    conn = connections.get(key)
+    if conn is None:
+        conn = connections[key] = connect(path)
+    return conn
+
+
+def set_busy_timeout(ms: int):
+    """Change the busy timeout for new connections and this thread's open ones."""
+    global BUSY_TIMEOUT_MS
+    BUSY_TIMEOUT_MS = ms
+    for conn in getattr(_local, "connections", {}).values():
+        conn.execute(f"PRAGMA busy_timeout = {int(ms)}")
+
+
+def close_thread_connections():
+    """Close every connection opened by the calling thread."""
+    connections = getattr(_local, "connections", None) or {}
+    while connections:
+        _, conn = connections.popitem()
+        conn.close()
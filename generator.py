@@ -1,13 +1,25 @@
 # generator.py
+import sys
+
+# Headless bulk mode (python generator.py --batch N --length L) exits here,
+# before Tk and customtkinter are loaded
+if __name__ == "__main__" and "--batch" in sys.argv[1:]:
+    import passgen
+
+    sys.exit(passgen.main(sys.argv[1:]))
 
 import tkinter as tk
 from tkinter import messagebox
-import random
-import string
-import sqlite3
-import sys
 import customtkinter as ctk
 
+import breach
+import db
+import passgen
+import schema
+import strength
+import tasks
+import vault
+
 
 def CenterWindowToDisplay(Screen: ctk.CTk, width: int, height: int, scale_factor: float = 1.0):
     """Centers the window to the main display/monitor"""
@@ -18,21 +30,23 @@ def CenterWindowToDisplay(Screen: ctk.CTk, width: int, height: int, scale_factor
     return f"{width}x{height}+{x}+{y}"
 
 
+# Owner of the entries saved from this window and their unlocked vault
+# (session.Session), both set each time the window is shown
+username = None
+session = None
+strength_job = None
+breaches = None  # breach.BreachList, or None when no breach file is installed
+
+# ---------- Strength meter settings ----------
+STRENGTH_DEBOUNCE_MS = 75  # score once typing pauses, not on every key
+STRENGTH_COLORS = ("#dc2626", "#ea580c", "#ca8a04", "#16a34a", "#15803d")  # by score 0-4
+
+
 # ----------------------
 #   INIT DATABASE
 # ----------------------
 def init_vault_db():
-    with sqlite3.connect("vault.db") as conn:
-        cur = conn.cursor()
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS vault (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                owner_username TEXT NOT NULL,
-                app_name TEXT NOT NULL,
-                password TEXT NOT NULL
-            )
-        """)
-        conn.commit()
+    schema.migrate_db(db.VAULT_DB, schema.VAULT_MIGRATIONS)
 
 
 # ----------------------
@@ -54,30 +68,17 @@ def generate_password():
         entry_length.delete(0, tk.END)
         entry_length.insert(0, "12")
 
-    # Get character type preferences from checkboxes
-    uppercase = var_uppercase.get()
-    lowercase = var_lowercase.get()
-    numbers = var_numbers.get()
-    symbols = var_symbols.get()
-
-    # Build character set based on user preferences
-    characters = ""
-    if uppercase:
-        characters += string.ascii_uppercase
-    if lowercase:
-        characters += string.ascii_lowercase
-    if numbers:
-        characters += string.digits
-    if symbols:
-        characters += "!@#$%^&*()_+-={}[]|:;<>,.?/"
+    # Get character type preferences from checkboxes, in passgen.CHARSETS order
+    selected = (var_uppercase.get(), var_lowercase.get(), var_numbers.get(), var_symbols.get())
+    classes = tuple(name for name, on in zip(passgen.CHARSETS, selected) if on)
 
     # Validate that at least one character type is selected
-    if characters == "":
+    if not classes:
         messagebox.showerror("Error", "Select at least one character type!")
         return
 
     # Generate password
-    password = "".join(random.choice(characters) for _ in range(length))
+    password = passgen.generate_password(length, classes)
 
     # Display password in entry field
     entry_password.configure(state="normal")
@@ -87,6 +88,7 @@ def generate_password():
     entry_password.configure(show="•", state="normal")
     # Store the actual password for viewing later
     entry_password.actual_password = password
+    update_strength()
 
 
 # ----------------------
@@ -121,6 +123,42 @@ def clear_password():
     entry_password.configure(show="•", state="normal")
     if hasattr(entry_password, 'actual_password'):
         delattr(entry_password, 'actual_password')
+    update_strength()
+
+
+# ----------------------
+#   STRENGTH METER
+# ----------------------
+def schedule_strength_update(event=None):
+    # Debounce: restart the timer on every keystroke
+    global strength_job
+    if strength_job is not None:
+        entry_password.after_cancel(strength_job)
+    strength_job = entry_password.after(STRENGTH_DEBOUNCE_MS, update_strength)
+
+
+def update_strength():
+    global strength_job
+    strength_job = None
+    pwd = entry_password.get()
+    if not pwd:
+        strength_bar.set(0)
+        lbl_strength.configure(text="")
+        return
+
+    # The estimator only re-matches what changed since the last call
+    result = estimator.estimate(pwd)
+    seen = breaches.count(pwd) if breaches is not None else 0
+    score = 0 if seen else result.score
+    strength_bar.configure(progress_color=STRENGTH_COLORS[score])
+    strength_bar.set((score + 1) / len(STRENGTH_COLORS))
+    if seen:
+        text = f"Strength: Very weak - found in {seen:,} data breaches"
+    else:
+        text = f"Strength: {result.label}"
+        if result.warning:
+            text += f" - {result.warning}"
+    lbl_strength.configure(text=text)
 
 
 # ----------------------
@@ -138,57 +176,88 @@ def save_password():
         messagebox.showerror("Error", "Please enter or generate a password.")
         return
 
-    # Optional: Add password strength validation
-    if len(pwd) < 8:
+    # A breached password is in every attacker's wordlist, however it scores
+    seen = breaches.count(pwd) if breaches is not None else 0
+    if seen:
+        response = messagebox.askyesno(
+            "Breached Password",
+            f"This password has appeared {seen:,} times in known data breaches.\n\n"
+            "Do you want to save it anyway?"
+        )
+        if not response:
+            return
+
+    # Password strength validation
+    result = estimator.estimate(pwd)
+    if not seen and result.score < 2:
+        reason = f"\n\n{result.warning}." if result.warning else ""
         response = messagebox.askyesno(
             "Weak Password",
-            "The password is less than 8 characters. This may be insecure.\n\nDo you want to save it anyway?"
+            f"This password is {result.label.lower()} and may be insecure.{reason}\n\n"
+            "Do you want to save it anyway?"
         )
         if not response:
             return
 
+    if session is None:
+        messagebox.showerror("Error", "The vault is locked. Please log in again to store passwords.")
+        return
+
     try:
-        with sqlite3.connect("vault.db") as conn:
-            cur = conn.cursor()
-            cur.execute(
-                "INSERT INTO vault (owner_username, app_name, password) VALUES (?, ?, ?)",
-                (username, app_name, pwd)
+        # Indexed lookup of the password's fingerprint, no scan of the vault
+        reused = vault.find_reuse(session, pwd)
+        if reused:
+            shown = ", ".join(reused[:5])
+            if len(reused) > 5:
+                shown += f" and {len(reused) - 5} more"
+            response = messagebox.askyesno(
+                "Password Reused",
+                f"You already use this password for {shown}.\n\n"
+                "If one of those accounts leaks, this one is exposed too.\n\n"
+                "Do you want to save it anyway?"
             )
-            conn.commit()
-
-        messagebox.showinfo("Success", f"Password saved for {app_name}!")
+            if not response:
+                return
 
-        # Clear fields after successful save
-        entry_app.delete(0, tk.END)
-        clear_password()
+        future = vault.add_entry_async(session, app_name, pwd)
 
     except Exception as e:
         messagebox.showerror("Database Error", f"Could not save password:\n\n{e}")
+        return
+
+    # Optimistic: clear the form now, the writer thread commits in the
+    # background and a failure puts the entry back
+    entry_app.delete(0, tk.END)
+    clear_password()
+    lbl_strength.configure(text=f"Saved password for {app_name}")
+
+    def saved(future):
+        try:
+            future.result()
+        except Exception as e:
+            lbl_strength.configure(text="")
+            if not entry_app.get() and not entry_password.get():
+                entry_app.insert(0, app_name)
+                entry_password.insert(0, pwd)
+                update_strength()
+            messagebox.showerror("Database Error", f"Could not save password for {app_name}:\n\n{e}")
+
+    tasks.when_done(entry_app, future, saved)
 
 
 # ----------------------
 #            MAIN
 # ----------------------
-def main():
-    global username, entry_app, entry_length, var_uppercase, var_lowercase, var_numbers, var_symbols
+def build_generator_window(root: ctk.CTkToplevel, app):
+    """Fill the generator window; built once by the app's window manager."""
+    global entry_app, entry_length, var_uppercase, var_lowercase, var_numbers, var_symbols
     global entry_password, btn_toggle_visibility
-
-    # Get username sent from Dashboard
-    if len(sys.argv) < 2:
-        messagebox.showerror("Error", "No username provided to generator.py")
-        return
-
-    username = sys.argv[1]
+    global strength_bar, lbl_strength, estimator, breaches
 
     init_vault_db()
 
-    # Configure customtkinter
-    ctk.set_appearance_mode("dark")
-    ctk.set_default_color_theme("blue")
-
-    root = ctk.CTk()
     root.title("SQRITY - Password Generator")
-    root.geometry("650x700")  # Increased height to accommodate new options
+    root.geometry("650x740")  # Increased height to accommodate new options
     root.resizable(False, False)
 
     # Main container
@@ -198,7 +267,7 @@ def main():
     # Title
     lbl_title = ctk.CTkLabel(
         main_frame,
-        text=f"Password Generator ({username})",
+        text="Password Generator",
         font=("Segoe UI", 22, "bold"),
         text_color="#ffffff"
     )
@@ -342,6 +411,28 @@ def main():
     )
     btn_toggle_visibility.pack(side="right", padx=(5, 0))
 
+    # Strength meter, updated as the password is typed
+    estimator = strength.Estimator()
+    try:
+        breaches = breach.open_default()  # mmap only, nothing is read yet
+    except (OSError, ValueError):
+        breaches = None  # an unreadable breach file only turns the check off
+    strength_bar = ctk.CTkProgressBar(frame, height=8)
+    strength_bar.grid(row=5, column=0, sticky="ew", pady=(0, 5))
+    strength_bar.set(0)
+
+    lbl_strength = ctk.CTkLabel(
+        frame,
+        text="",
+        font=("Segoe UI", 12),
+        text_color="#ffffff",
+        anchor="w",
+        wraplength=520,
+        justify="left"
+    )
+    lbl_strength.grid(row=6, column=0, sticky="w", pady=(0, 5))
+    entry_password.bind("<KeyRelease>", schedule_strength_update)
+
     # Password info label
     lbl_password_info = ctk.CTkLabel(
         frame,
@@ -350,7 +441,7 @@ def main():
         text_color="#ffffff",
         anchor="w"
     )
-    lbl_password_info.grid(row=5, column=0, sticky="w", pady=(0, 20))
+    lbl_password_info.grid(row=7, column=0, sticky="w", pady=(0, 20))
 
     # Buttons frame
     buttons_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
@@ -393,10 +484,38 @@ def main():
 
     # Center the window
     root.update_idletasks()
-    root.geometry('650x680')
+    root.geometry('650x740')
+
+    def on_show(user=None):
+        global username, session
+        session = app.session
+        if user != username:
+            # The window is reused across logins, drop the last user's input
+            entry_app.delete(0, tk.END)
+            clear_password()
+        username = user
+        lbl_title.configure(text=f"Password Generator ({username})")
+
+    def on_logout():
+        global username, session
+        session = None
+        username = None  # so the next user starts with empty fields
+        entry_app.delete(0, tk.END)
+        clear_password()
+    app.on_logout(on_logout)
+
+    return on_show
+
+
+def main():
+    # Get username sent from Dashboard
+    if len(sys.argv) < 2:
+        messagebox.showerror("Error", "No username provided to generator.py")
+        return
 
-    root.mainloop()
+    from app import main as app_main
+    app_main("generator", sys.argv[1])
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# kdf.py
+"""Password hashing algorithms and their tunable cost parameters.
+
+Every user row stores the algorithm and its parameters next to the hash, so
+the cost can be raised later (see calibrate()) without breaking old logins.
+
+    python kdf.py --target-ms 250
+    python kdf.py --algorithm scrypt --target-ms 400 --save
+"""
+
+import hashlib
+import json
+import sys
+import time
+
+PBKDF2 = "pbkdf2_sha256"
+SCRYPT = "scrypt"           # memory-hard, from hashlib (OpenSSL 1.1+)
+HASH_SIZE = 32              # bytes
+
+DEFAULT_PARAMS = {
+    PBKDF2: {"iterations": 100_000},
+    SCRYPT: {"n": 2 ** 14, "r": 8, "p": 1},
+}
+
+# What every account used before parameters were stored per user
+LEGACY = (PBKDF2, DEFAULT_PARAMS[PBKDF2])
+
+TARGET_MS = 250                          # verify latency calibrate() aims for
+MIN_PBKDF2_ITERATIONS = 100_000          # never calibrate below the old default
+MIN_SCRYPT_N = 2 ** 14
+MAX_SCRYPT_MEMORY = 64 * 1024 * 1024     # bytes of RAM one scrypt call may use
+
+
+def _pbkdf2(password: bytes, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password, salt, iterations, HASH_SIZE)
+
+
+def _scrypt(password: bytes, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # hashlib refuses anything over maxmem; leave room above the 128*n*r*p needed
+    return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p,
+                          maxmem=2 * 128 * n * r * p, dklen=HASH_SIZE)
+
+
+ALGORITHMS = {PBKDF2: _pbkdf2, SCRYPT: _scrypt}
+
+
+def derive(password: str, salt: bytes, algorithm: str = PBKDF2, params: dict | None = None) -> bytes:
+    """Hash password with algorithm; params default to DEFAULT_PARAMS."""
+    try:
+        fn = ALGORITHMS[algorithm]
+    except KeyError:
+        raise ValueError(f"unknown password hashing algorithm {algorithm!r}") from None
+    if params is None:
+        params = DEFAULT_PARAMS[algorithm]
+    return fn(password.encode("utf-8"), salt, **params)
+
+
+def dump_params(params: dict) -> str:
+    """Canonical JSON for the kdf_params column, so equal settings compare equal."""
+    return json.dumps(params, sort_keys=True)
+
+
+def load_params(text: str) -> dict:
+    return json.loads(text)
+
+
+# ----------------------
+#   CALIBRATION
+# ----------------------
+def _time_ms(algorithm: str, params: dict, repeat: int = 3) -> float:
+    """Fastest of repeat runs, in milliseconds; the minimum is the least noisy."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        derive("calibration", b"\0" * 16, algorithm, params)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def calibrate(algorithm: str = PBKDF2, target_ms: float = TARGET_MS) -> dict:
+    """Return parameters for algorithm whose verify takes about target_ms here.
+
+    PBKDF2 cost is linear in iterations, so one probe is scaled. scrypt's n
+    must be a power of two, so it doubles until the target or the memory cap.
+    """
+    if algorithm == PBKDF2:
+        probe = 20_000
+        per_iteration = _time_ms(PBKDF2, {"iterations": probe}) / probe
+        iterations = int(target_ms / per_iteration) // 10_000 * 10_000
+        return {"iterations": max(iterations, MIN_PBKDF2_ITERATIONS)}
+
+    if algorithm == SCRYPT:
+        params = dict(DEFAULT_PARAMS[SCRYPT], n=MIN_SCRYPT_N)
+        while 128 * params["n"] * 2 * params["r"] <= MAX_SCRYPT_MEMORY:
+            if _time_ms(SCRYPT, params, repeat=1) * 2 > target_ms:
+                break  # doubling n would overshoot the target
+            params["n"] *= 2
+        return params
+
+    raise ValueError(f"unknown password hashing algorithm {algorithm!r}")
+
+
+def main(argv=None):
+    import argparse  # auth imports this module on every login, the CLI is rare
+
+    parser = argparse.ArgumentParser(description="Pick password hashing parameters for this machine.")
+    parser.add_argument("--algorithm", choices=sorted(ALGORITHMS), default=PBKDF2)
+    parser.add_argument("--target-ms", type=float, default=TARGET_MS,
+                        help=f"verify latency to aim for (default {TARGET_MS})")
+    parser.add_argument("--save", action="store_true",
+                        help="use these parameters for new and upgraded logins in users.db")
+    args = parser.parse_args(argv)
+
+    params = calibrate(args.algorithm, args.target_ms)
+    measured = _time_ms(args.algorithm, params)
+    print(f"{args.algorithm} {dump_params(params)}: {measured:.0f} ms per verify")
+
+    if args.save:
+        import auth  # only needed here; keeps kdf.py free of database code
+        auth.save_kdf_policy(args.algorithm, params)
+        print("Saved. Users are rehashed with these parameters at their next login.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# passgen.py
+"""Password generation engine, independent of the GUI.
+
+Random bytes come from os.urandom in bulk and are mapped to characters with
+bytes.translate. Bytes that would bias the result (the ones at or above the
+largest multiple of the alphabet size) are deleted instead of wrapped, which
+is rejection sampling done in C rather than one Python call per character.
+"""
+
+import argparse
+import os
+import string
+import sys
+
+SYMBOLS = "!@#$%^&*()_+-={}[]|:;<>,.?/"
+
+# Character classes in the order the generator window lists them
+CHARSETS = {
+    "uppercase": string.ascii_uppercase,
+    "lowercase": string.ascii_lowercase,
+    "numbers": string.digits,
+    "symbols": SYMBOLS,
+}
+
+DEFAULT_LENGTH = 14
+CLI_CHUNK = 10_000  # passwords generated and written per round in batch mode
+
+_tables = {}
+
+
+def character_table(classes):
+    """Return (alphabet, table, delete, class_sets) for a tuple of class names.
+
+    table/delete are the bytes.translate arguments that turn random bytes
+    into unbiased alphabet characters. Results are cached per combination.
+    """
+    classes = tuple(classes)
+    cached = _tables.get(classes)
+    if cached is not None:
+        return cached
+
+    if not classes:
+        raise ValueError("Select at least one character type!")
+    alphabet = "".join(CHARSETS[name] for name in classes)
+    size = len(alphabet)
+    limit = 256 - 256 % size
+    table = bytes(ord(alphabet[b % size]) if b < limit else 0 for b in range(256))
+    delete = bytes(range(limit, 256))
+    class_sets = tuple(frozenset(CHARSETS[name]) for name in classes)
+
+    cached = _tables[classes] = (alphabet, table, delete, class_sets)
+    return cached
+
+
+def generate_passwords(count: int, length: int = DEFAULT_LENGTH,
+                       classes=tuple(CHARSETS), require_each: bool = True):
+    """Return a list of count random passwords of the given length.
+
+    With require_each, every password contains at least one character of
+    each selected class. Passwords that miss a class are redrawn rather than
+    patched, so the result stays uniform over all passwords meeting the policy.
+    """
+    if count < 0:
+        raise ValueError("count must not be negative")
+    if length < 1:
+        raise ValueError("length must be at least 1")
+    alphabet, table, delete, class_sets = character_table(classes)
+    if require_each and length < len(class_sets):
+        raise ValueError("length is too short to include every selected character type")
+
+    accept_rate = (256 - len(delete)) / 256
+    passwords = []
+    while len(passwords) < count:
+        missing = count - len(passwords)
+        # Overdraw a little so one round is almost always enough
+        nbytes = int(missing * length / accept_rate * 1.1) + 64
+        chars = os.urandom(nbytes).translate(table, delete).decode("ascii")
+
+        for start in range(0, len(chars) - length + 1, length):
+            pwd = chars[start:start + length]
+            if require_each and any(s.isdisjoint(pwd) for s in class_sets):
+                continue
+            passwords.append(pwd)
+            if len(passwords) == count:
+                break
+    return passwords
+
+
+def generate_password(length: int = DEFAULT_LENGTH, classes=tuple(CHARSETS),
+                      require_each: bool = True) -> str:
+    """Return a single random password, see generate_passwords."""
+    return generate_passwords(1, length, classes, require_each)[0]
+
+
+# ----------------------
+#   HEADLESS CLI
+# ----------------------
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Generate passwords without opening a window."
+    )
+    parser.add_argument("--batch", type=int, required=True, metavar="N",
+                        help="number of passwords to print, one per line")
+    parser.add_argument("--length", type=int, default=DEFAULT_LENGTH, metavar="L")
+    parser.add_argument("--no-uppercase", action="store_true")
+    parser.add_argument("--no-lowercase", action="store_true")
+    parser.add_argument("--no-numbers", action="store_true")
+    parser.add_argument("--no-symbols", action="store_true")
+    parser.add_argument("--any-mix", action="store_true",
+                        help="do not require one character of each selected type")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    classes = tuple(
+        name for name in CHARSETS if not getattr(args, f"no_{name}")
+    )
+
+    out = sys.stdout
+    remaining = args.batch
+    try:
+        while remaining > 0:
+            chunk = min(remaining, CLI_CHUNK)
+            batch = generate_passwords(chunk, args.length, classes, not args.any_mix)
+            out.write("\n".join(batch))
+            out.write("\n")
+            remaining -= chunk
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+# schema.py
+"""Versioned schema migrations shared by users.db and vault.db.
+
+PRAGMA user_version holds how many migrations a database has applied.
+Pending migrations run once, together, inside a single transaction.
+"""
+
+import sqlite3
+
+import db
+
+# The trigram tokenizer (SQLite 3.34+) matches any substring of three or more
+# characters; older SQLite falls back to whole-word matching
+FTS_TOKENIZER = "trigram" if sqlite3.sqlite_version_info >= (3, 34, 0) else "unicode61"
+
+
+def _change_log(tables, paused=()):
+    """Statements of the backup changelog (see backup.py): backup_changes
+    gets the rowid of every row written to tables once backup_base names the
+    backup chain it continues. Inserts into the paused tables are not logged
+    while vault_fts_pause has a row; the bulk writer logs them with
+    LOG_BULK_INSERT instead.
+    """
+    statements = [
+        """
+        CREATE TABLE backup_changes (
+            seq INTEGER PRIMARY KEY,
+            tbl TEXT NOT NULL,
+            lo INTEGER NOT NULL,
+            hi INTEGER NOT NULL
+        )
+        """,
+        "CREATE TABLE backup_base (chain TEXT NOT NULL, version INTEGER NOT NULL)",
+    ]
+    for table in tables:
+        when = "EXISTS (SELECT 1 FROM backup_base)"
+        insert_when = when
+        if table in paused:
+            insert_when += " AND NOT EXISTS (SELECT 1 FROM vault_fts_pause)"
+        statements += [
+            f"""
+            CREATE TRIGGER {table}_backup_insert AFTER INSERT ON {table}
+            WHEN {insert_when} BEGIN
+                INSERT INTO backup_changes (tbl, lo, hi) VALUES ('{table}', new.rowid, new.rowid);
+            END
+            """,
+            f"""
+            CREATE TRIGGER {table}_backup_update AFTER UPDATE ON {table}
+            WHEN {when} BEGIN
+                INSERT INTO backup_changes (tbl, lo, hi) VALUES ('{table}', old.rowid, old.rowid);
+                INSERT INTO backup_changes (tbl, lo, hi)
+                SELECT '{table}', new.rowid, new.rowid WHERE new.rowid <> old.rowid;
+            END
+            """,
+            f"""
+            CREATE TRIGGER {table}_backup_delete AFTER DELETE ON {table}
+            WHEN {when} BEGIN
+                INSERT INTO backup_changes (tbl, lo, hi) VALUES ('{table}', old.rowid, old.rowid);
+            END
+            """,
+        ]
+    return tuple(statements)
+
+
+# Run by bulk writers after their paused insert into vault (see migration 5),
+# with the first new id twice, so backups pick up the new rows
+LOG_BULK_INSERT = """
+    INSERT INTO backup_changes (tbl, lo, hi)
+    SELECT 'vault', ?, hi FROM (SELECT max(id) AS hi FROM vault)
+    WHERE hi >= ? AND EXISTS (SELECT 1 FROM backup_base)
+"""
+
+# Each migration is a tuple of statements. Never edit one that has shipped,
+# append a new one instead.
+USERS_MIGRATIONS = [
+    # 1: IF NOT EXISTS adopts databases created before migrations existed
+    (
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            salt BLOB NOT NULL,
+            password_hash BLOB NOT NULL
+        )
+        """,
+    ),
+    # 2: per-user hashing algorithm and parameters (see kdf.py); existing rows
+    # get what hash_password used to hard-code. settings holds the policy
+    # new and upgraded hashes use.
+    (
+        "ALTER TABLE users ADD COLUMN kdf TEXT NOT NULL DEFAULT 'pbkdf2_sha256'",
+        """ALTER TABLE users ADD COLUMN kdf_params TEXT NOT NULL DEFAULT '{"iterations": 100000}'""",
+        """
+        CREATE TABLE settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+        """,
+    ),
+    # 3: login throttle state, used when SQRITY_THROTTLE_PERSIST=1 (see throttle.py)
+    (
+        """
+        CREATE TABLE login_attempts (
+            username TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated REAL NOT NULL,
+            failures INTEGER NOT NULL,
+            blocked_until REAL NOT NULL
+        )
+        """,
+    ),
+    # 4: the random vault data key, sealed under a key derived from the
+    # password with wrap_kdf and wrap_kdf_params (see auth.unlock). NULL
+    # until the user's first unlock creates it.
+    (
+        "ALTER TABLE users ADD COLUMN wrapped_key BLOB",
+        "ALTER TABLE users ADD COLUMN wrap_kdf TEXT",
+        "ALTER TABLE users ADD COLUMN wrap_kdf_params TEXT",
+    ),
+    # 5: changelog for incremental backups. A table added later needs its
+    # triggers too, or backups of it are only correct when they are full.
+    _change_log(("users", "settings", "login_attempts")),
+]
+
+VAULT_MIGRATIONS = [
+    # 1
+    (
+        """
+        CREATE TABLE IF NOT EXISTS vault (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_username TEXT NOT NULL,
+            app_name TEXT NOT NULL,
+            password TEXT NOT NULL
+        )
+        """,
+    ),
+    # 2: per-user listings filter on owner and sort by app name
+    (
+        "CREATE INDEX IF NOT EXISTS idx_vault_owner_app ON vault (owner_username, app_name)",
+    ),
+    # 3: resume points for vault_import, one row per source file
+    (
+        """
+        CREATE TABLE import_progress (
+            source TEXT PRIMARY KEY,
+            rows_done INTEGER NOT NULL,
+            finished INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+    ),
+    # 4: AES-GCM sealed password (see session.py); password is '' once sealed
+    (
+        "ALTER TABLE vault ADD COLUMN secret BLOB",
+    ),
+    # 5: full-text search over app_name, kept in sync by triggers. Add future
+    # metadata columns to both the table and these triggers.
+    # Bulk writers put a row in vault_fts_pause inside their own transaction
+    # and index the new rows with one INSERT ... SELECT before committing,
+    # which is several times faster than the per-row trigger.
+    (
+        "CREATE TABLE vault_fts_pause (active INTEGER)",
+        f"""
+        CREATE VIRTUAL TABLE vault_fts USING fts5(
+            app_name, content='vault', content_rowid='id', tokenize='{FTS_TOKENIZER}'
+        )
+        """,
+        "INSERT INTO vault_fts (vault_fts) VALUES ('rebuild')",
+        """
+        CREATE TRIGGER vault_fts_insert AFTER INSERT ON vault
+        WHEN NOT EXISTS (SELECT 1 FROM vault_fts_pause) BEGIN
+            INSERT INTO vault_fts (rowid, app_name) VALUES (new.id, new.app_name);
+        END
+        """,
+        """
+        CREATE TRIGGER vault_fts_delete AFTER DELETE ON vault BEGIN
+            INSERT INTO vault_fts (vault_fts, rowid, app_name) VALUES ('delete', old.id, old.app_name);
+        END
+        """,
+        """
+        CREATE TRIGGER vault_fts_update AFTER UPDATE OF app_name ON vault BEGIN
+            INSERT INTO vault_fts (vault_fts, rowid, app_name) VALUES ('delete', old.id, old.app_name);
+            INSERT INTO vault_fts (rowid, app_name) VALUES (new.id, new.app_name);
+        END
+        """,
+    ),
+    # 6: keyed fingerprint of the password for reuse checks (see
+    # Session.fingerprint); NULL until the owner's next unlock computes it
+    (
+        "ALTER TABLE vault ADD COLUMN fingerprint BLOB",
+        "CREATE INDEX idx_vault_owner_fingerprint ON vault (owner_username, fingerprint)",
+    ),
+    # 7: vault_fts indexes the owner too, so a search can visit only the
+    # searcher's rows. The owner is indexed as ^HEX$ (see vault.owner_key):
+    # hex is matched exactly although the index ignores case, and the anchors
+    # keep one owner from matching inside another.
+    (
+        "DROP TRIGGER vault_fts_insert",
+        "DROP TRIGGER vault_fts_delete",
+        "DROP TRIGGER vault_fts_update",
+        "DROP TABLE vault_fts",
+        """
+        CREATE VIEW vault_fts_source AS
+        SELECT id, '^' || hex(owner_username) || '$' AS owner_key, app_name FROM vault
+        """,
+        f"""
+        CREATE VIRTUAL TABLE vault_fts USING fts5(
+            owner_key, app_name, content='vault_fts_source', content_rowid='id',
+            tokenize='{FTS_TOKENIZER}'
+        )
+        """,
+        "INSERT INTO vault_fts (vault_fts) VALUES ('rebuild')",
+        """
+        CREATE TRIGGER vault_fts_insert AFTER INSERT ON vault
+        WHEN NOT EXISTS (SELECT 1 FROM vault_fts_pause) BEGIN
+            INSERT INTO vault_fts (rowid, owner_key, app_name)
+            VALUES (new.id, '^' || hex(new.owner_username) || '$', new.app_name);
+        END
+        """,
+        """
+        CREATE TRIGGER vault_fts_delete AFTER DELETE ON vault BEGIN
+            INSERT INTO vault_fts (vault_fts, rowid, owner_key, app_name)
+            VALUES ('delete', old.id, '^' || hex(old.owner_username) || '$', old.app_name);
+        END
+        """,
+        """
+        CREATE TRIGGER vault_fts_update AFTER UPDATE OF owner_username, app_name ON vault BEGIN
+            INSERT INTO vault_fts (vault_fts, rowid, owner_key, app_name)
+            VALUES ('delete', old.id, '^' || hex(old.owner_username) || '$', old.app_name);
+            INSERT INTO vault_fts (rowid, owner_key, app_name)
+            VALUES (new.id, '^' || hex(new.owner_username) || '$', new.app_name);
+        END
+        """,
+    ),
+    # 8: changelog for incremental backups, as users.db migration 5
+    _change_log(("vault", "import_progress"), paused=("vault",)),
+]
+
+
+def migrate(conn: sqlite3.Connection, migrations) -> int:
+    """Apply pending migrations to conn and return the new schema version."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= len(migrations):
+        return version  # up to date, the common case on every launch
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Re-read under the write lock, another process may have migrated
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for statements in migrations[version:]:
+            for sql in statements:
+                conn.execute(sql)
+        # PRAGMA does not accept parameters; the value is always our own int
+        conn.execute(f"PRAGMA user_version = {len(migrations)}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return len(migrations)
+
+
+def migrate_db(path: str, migrations) -> int:
+    """Migrate the database at path using this thread's shared connection."""
+    return migrate(db.get_connection(path), migrations)
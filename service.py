@@ -0,0 +1,403 @@
+# service.py
+"""Optional local vault service: one warm process that scripts query.
+
+    python service.py serve                   # owns users.db, vault.db and the sessions
+    python service.py login --user alice      # unlock once, keep the token
+    python service.py list --user alice       # thin client, e.g. for scripts
+    python service.py logout --user alice
+
+Only the client commands of this module go through the service. The GUI
+and the other command-line tools (vault_import, vault_export, admin,
+breach) still open the databases themselves.
+
+The server listens on a Unix domain socket (SOCKET_PATH, mode 0600). Each
+message in either direction is a 4-byte big-endian length followed by that
+many bytes of UTF-8 JSON. A request is {"op": ..., "args": {...}} and the
+reply is {"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+
+Ops: login(username, password) -> token, logout(token),
+list(token, after=None, limit) -> [[id, app_name]], search(token, text) ->
+[[id, app_name]], get(token, id) -> [id, app_name, password],
+save(token, app_name, password) -> id, stats() -> listing cache counters.
+Listings carry no passwords; get decrypts the one entry asked for. A list
+returns at most MAX_LIMIT rows.
+
+A token stands for a session unlocked once on the server. The client
+commands keep it in a file next to the socket (token_path(), mode 0600), so
+a run of list/search/get/save calls pays the key derivation at the first
+one only, until logout or SESSION_IDLE_S without use. Database and KDF work
+runs on worker threads and saves go through the vault's writer thread, so
+one slow request never stalls the others.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import signal
+import socket
+import sqlite3
+import struct
+import sys
+import time
+
+import auth
+import cache
+import crypto
+import db
+import schema
+import throttle
+import vault
+import writer
+
+SOCKET_PATH = os.environ.get(
+    "SQRITY_SOCKET", os.path.join(os.path.expanduser("~"), ".cache", "sqrity", "vault.sock"))
+FRAME = struct.Struct(">I")
+MAX_FRAME = 1 << 20           # largest message accepted, in bytes
+SESSION_IDLE_S = 15 * 60      # unused sessions are locked again after this
+CLIENT_TIMEOUT_S = 30
+MAX_LIMIT = 1_000             # most rows one list request returns
+
+
+class ServiceError(Exception):
+    """An error reply from the vault service."""
+
+
+def token_path(socket_path: str, username: str) -> str:
+    """Where the client commands keep username's session token."""
+    return os.path.join(os.path.dirname(socket_path) or ".",
+                        f"{username.encode('utf-8').hex()}.token")
+
+
+def encode(message: dict) -> bytes:
+    body = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    return FRAME.pack(len(body)) + body
+
+
+# ----------------------
+#   SERVER
+# ----------------------
+class VaultService:
+    """Request handlers and the sessions they share."""
+
+    def __init__(self):
+        self.sessions = {}  # token -> [Session, last used]
+        self.clients = set()  # open connections, closed on shutdown
+        self.listings = cache.listings()  # shared by every client
+
+    @staticmethod
+    def _text(value, name):
+        if not isinstance(value, str):
+            raise ValueError(f"{name} must be a string")
+        return value
+
+    def _session(self, token):
+        entry = self.sessions.get(token)
+        if entry is None or time.monotonic() - entry[1] > SESSION_IDLE_S:
+            self.sessions.pop(token, None)
+            raise ValueError("not logged in")
+        entry[1] = time.monotonic()
+        return entry[0]
+
+    async def op_login(self, username, password):
+        try:
+            session = await asyncio.to_thread(auth.unlock, username, password)
+        except throttle.LoginThrottled as e:
+            raise ValueError(str(e)) from e
+        if session is None:
+            raise ValueError("invalid username or password")
+        now = time.monotonic()
+        for stale in [t for t, (_, used) in self.sessions.items() if now - used > SESSION_IDLE_S]:
+            del self.sessions[stale]
+        token = secrets.token_hex(16)
+        self.sessions[token] = [session, now]
+        return token
+
+    async def op_logout(self, token):
+        self.sessions.pop(token, None)
+
+    async def op_list(self, token, after=None, limit=vault.PAGE_SIZE):
+        session = self._session(token)
+        key = None
+        if after is not None:
+            if (not isinstance(after, list) or len(after) != 2 or not isinstance(after[0], str)
+                    or not isinstance(after[1], int) or isinstance(after[1], bool)):
+                raise ValueError("after must be an [app_name, id] pair")
+            key = (after[0], after[1])
+        limit = min(max(int(limit), 1), MAX_LIMIT)
+        rows = await asyncio.to_thread(
+            self.listings.get, session.username, ("after", key, limit),
+            lambda: vault.fetch_page_after(session.username, key, limit))
+        return rows
+
+    async def op_search(self, token, text):
+        session = self._session(token)
+        text = self._text(text, "text")
+        rows = await asyncio.to_thread(
+            self.listings.get, session.username, ("search", text),
+            lambda: vault.search_vault(session.username, text))
+        return rows
+
+    async def op_get(self, token, id):
+        session = self._session(token)
+        row = await asyncio.to_thread(vault.get_entry, session.username, int(id))
+        if row is None:
+            raise ValueError(f"no entry {id}")
+        return session.reveal_rows([row])[0]
+
+    async def op_stats(self):
+        return self.listings.stats()
+
+    async def op_save(self, token, app_name, password):
+        session = self._session(token)
+        self._text(app_name, "app_name")
+        self._text(password, "password")
+        return await asyncio.wrap_future(vault.add_entry_async(session, app_name, password))
+
+    async def dispatch(self, request) -> dict:
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "a request must be a JSON object"}
+        args = request.get("args", {})
+        if not isinstance(args, dict):
+            return {"ok": False, "error": "args must be a JSON object"}
+        handler = getattr(self, f"op_{request.get('op')}", None)
+        if handler is None:
+            return {"ok": False, "error": f"unknown op {request.get('op')!r}"}
+        try:
+            result = await handler(**args)
+        except (TypeError, ValueError, sqlite3.Error, crypto.DecryptionError) as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            print(f"{request.get('op')} failed: {e!r}", file=sys.stderr)
+            return {"ok": False, "error": "internal error"}
+        return {"ok": True, "result": result}
+
+    async def handle(self, reader: asyncio.StreamReader, stream: asyncio.StreamWriter):
+        """Serve one client connection, a request at a time, until it closes."""
+        self.clients.add(stream)
+        try:
+            while True:
+                try:
+                    (size,) = FRAME.unpack(await reader.readexactly(FRAME.size))
+                except asyncio.IncompleteReadError:
+                    return
+                if size > MAX_FRAME:
+                    stream.write(encode({"ok": False, "error": "message too large"}))
+                    return
+                try:
+                    request = json.loads(await reader.readexactly(size))
+                except ValueError:
+                    stream.write(encode({"ok": False, "error": "malformed message"}))
+                    return
+                stream.write(encode(await self.dispatch(request)))
+                await stream.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.discard(stream)
+            stream.close()
+
+
+async def serve(path: str = SOCKET_PATH):
+    schema.migrate_db(db.USERS_DB, schema.USERS_MIGRATIONS)
+    schema.migrate_db(db.VAULT_DB, schema.VAULT_MIGRATIONS)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if os.path.exists(path):
+        try:
+            Client(path).close()
+        except OSError:
+            os.remove(path)  # left behind by a server that is gone
+        else:
+            raise OSError(f"a vault service is already listening on {path}")
+
+    service = VaultService()
+    old_umask = os.umask(0o177)  # socket only usable by this user
+    try:
+        server = await asyncio.start_unix_server(service.handle, path)
+    finally:
+        os.umask(old_umask)
+    print(f"Vault service listening on {path}", file=sys.stderr)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    try:
+        async with server:
+            await stop.wait()
+            for stream in list(service.clients):
+                stream.close()  # their handlers see end of file and return
+            await asyncio.sleep(0.1)
+    finally:
+        os.remove(path)
+        writer.get(db.VAULT_DB).close()
+
+
+# ----------------------
+#   CLIENT
+# ----------------------
+class Client:
+    """Blocking client for the vault service; one connection, one request at a time."""
+
+    def __init__(self, path: str = SOCKET_PATH, timeout: float = CLIENT_TIMEOUT_S, token=None):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(path)
+        except OSError:
+            self._sock.close()
+            raise
+        self.token = token
+
+    def _read(self, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            chunk = self._sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("vault service closed the connection")
+            data += chunk
+        return bytes(data)
+
+    def call(self, op: str, **args):
+        """Send one request and return its result; raises ServiceError on an error reply."""
+        self._sock.sendall(encode({"op": op, "args": args}))
+        (size,) = FRAME.unpack(self._read(FRAME.size))
+        reply = json.loads(self._read(size))
+        if not reply["ok"]:
+            raise ServiceError(reply["error"])
+        return reply["result"]
+
+    def login(self, username: str, password: str):
+        self.token = self.call("login", username=username, password=password)
+
+    def logout(self):
+        self.call("logout", token=self.token)
+        self.token = None
+
+    def list(self, after=None, limit: int = vault.PAGE_SIZE):
+        return self.call("list", token=self.token, after=after, limit=limit)
+
+    def search(self, text: str):
+        return self.call("search", token=self.token, text=text)
+
+    def get(self, entry_id: int):
+        return self.call("get", token=self.token, id=entry_id)
+
+    def save(self, app_name: str, password: str) -> int:
+        return self.call("save", token=self.token, app_name=app_name, password=password)
+
+    def stats(self) -> dict:
+        return self.call("stats")
+
+    def close(self):
+        self._sock.close()
+
+
+def load_token(path: str):
+    """The token saved at path, or None."""
+    try:
+        with open(path, encoding="ascii") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def save_token(path: str, token: str):
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="ascii") as f:
+        f.write(token)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local SQRITY vault service and client.")
+    parser.add_argument("--socket", default=SOCKET_PATH, help=f"socket path (default: {SOCKET_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("serve", help="run the service in the foreground")
+    for name, help_text in (("login", "unlock the vault and keep the session for later commands"),
+                            ("logout", "lock the vault and forget the kept session"),
+                            ("list", "print every entry's id and name"),
+                            ("search", "print matching entries' ids and names"),
+                            ("get", "print one entry with its password"),
+                            ("save", "store a password read from a prompt")):
+        cmd = commands.add_parser(name, help=help_text)
+        cmd.add_argument("--user", required=True)
+        if name != "logout":
+            cmd.add_argument("--password-env", metavar="VAR",
+                             help="read the master password from this environment variable")
+        if name == "search":
+            cmd.add_argument("text")
+        elif name == "get":
+            cmd.add_argument("id", type=int)
+        elif name == "save":
+            cmd.add_argument("app_name")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args.socket))
+        except OSError as e:
+            print(f"serve failed: {e}", file=sys.stderr)
+            return 1
+        return 0
+
+    import getpass
+
+    def login():
+        if args.password_env:
+            password = os.environ.get(args.password_env, "")
+        else:
+            password = getpass.getpass(f"Master password for {args.user}: ")
+        client.login(args.user, password)
+        save_token(saved, client.token)
+
+    def run():
+        if args.command == "list":
+            rows, after = [], None
+            while True:
+                page = client.list(after)
+                rows += page
+                if len(page) < vault.PAGE_SIZE:
+                    return rows
+                after = [page[-1][1], page[-1][0]]
+        if args.command == "search":
+            return client.search(args.text)
+        if args.command == "get":
+            return [client.get(args.id)]
+        entry_id = client.save(args.app_name, getpass.getpass(f"Password for {args.app_name}: "))
+        print(f"Saved {args.app_name} as entry {entry_id}", file=sys.stderr)
+        return []
+
+    saved = token_path(args.socket, args.user)
+    rows = []
+    try:
+        client = Client(args.socket, token=load_token(saved))
+        if args.command == "logout":
+            if client.token is not None:
+                client.logout()
+            if os.path.exists(saved):
+                os.remove(saved)
+        elif args.command == "login" or client.token is None:
+            if client.token is not None:
+                client.logout()  # replaced, so do not leave it unlocked on the server
+            login()
+        if args.command not in ("login", "logout"):
+            try:
+                rows = run()
+            except ServiceError as e:
+                if str(e) != "not logged in":
+                    raise
+                login()  # the kept session expired or the service restarted
+                rows = run()
+        client.close()
+    except (OSError, EOFError, ServiceError) as e:
+        print(f"{args.command} failed: {e}", file=sys.stderr)
+        return 1
+
+    for row in rows:
+        print("\t".join(str(value) for value in row))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
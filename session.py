@@ -0,0 +1,126 @@
+# session.py
+"""The unlocked vault of a logged-in user.
+
+The data key is unwrapped once per login (see auth.unlock) and kept here
+for the session. Each password is sealed with AES-GCM under a fresh nonce and
+stored in vault.secret. The owner and application name are bound in as
+associated data, so a secret copied onto another row fails to decrypt.
+
+vault.fingerprint is an HMAC of the password under a key derived from the
+data key: equal passwords of one user match, and without the master
+password it says nothing about the password itself.
+"""
+
+import hashlib
+import hmac
+
+import crypto
+import db
+
+LEGACY_BATCH = 1_000  # plaintext rows encrypted per transaction on unlock
+FINGERPRINT_INFO = b"sqrity-fingerprint"
+FINGERPRINT_SIZE = 16  # bytes kept of the HMAC-SHA256
+
+
+class Session:
+    """A logged-in user and their vault data key, held in memory until logout."""
+
+    def __init__(self, username: str, key: bytes):
+        self.username = username
+        self._cipher = crypto.new_cipher(key)
+        fingerprint_key = hmac.new(key, FINGERPRINT_INFO, hashlib.sha256).digest()
+        # Keyed once; copying it is cheaper than hmac.new for every password
+        self._fingerprint_hmac = hmac.new(fingerprint_key, digestmod=hashlib.sha256)
+
+    def _aad(self, app_name: str) -> bytes:
+        return f"{self.username}\0{app_name}".encode("utf-8")
+
+    def seal(self, app_name: str, password: str) -> bytes:
+        """Encrypt a password for storage in vault.secret."""
+        return crypto.seal(self._cipher, password.encode("utf-8"), self._aad(app_name))
+
+    def open(self, app_name: str, secret: bytes) -> str:
+        """Decrypt a vault.secret value; raises crypto.DecryptionError on tampering."""
+        return crypto.unseal(self._cipher, secret, self._aad(app_name)).decode("utf-8")
+
+    def fingerprint(self, password: str) -> bytes:
+        """Value for vault.fingerprint; equal for equal passwords of this user."""
+        mac = self._fingerprint_hmac.copy()
+        mac.update(password.encode("utf-8"))
+        return mac.digest()[:FINGERPRINT_SIZE]
+
+    def seal_rows(self, rows):
+        """Seal and fingerprint a batch of (app_name, password) pairs; returns
+        [(secret, fingerprint)], as seal() and fingerprint() would."""
+        prefix = f"{self.username}\0"
+        sealed = crypto.seal_many(
+            self._cipher, [(password.encode("utf-8"), (prefix + app_name).encode("utf-8"))
+                           for app_name, password in rows])
+        return [(secret, self.fingerprint(password))
+                for secret, (_, password) in zip(sealed, rows)]
+
+    def reveal(self, app_name: str, password: str, secret: bytes | None) -> str:
+        """Plaintext of a vault row, whether it is encrypted yet or not."""
+        if secret is None:
+            return password  # written before encryption, sealed on next unlock
+        return self.open(app_name, secret)
+
+    def reveal_rows(self, rows):
+        """Decrypt a batch of (id, app_name, password, secret) rows to (id, app_name, plaintext)."""
+        return [
+            (row_id, app_name, self.reveal(app_name, password, secret))
+            for row_id, app_name, password, secret in rows
+        ]
+
+    def encrypt_plaintext_rows(self, db_path: str = db.VAULT_DB) -> int:
+        """Seal this user's rows that still hold a plaintext password; returns how many.
+
+        secure_delete (see db.PRAGMAS) zeroes the old values in the database
+        file, and a final checkpoint empties the WAL that still holds them.
+        The checkpoint cannot finish past a reader that is still open, which
+        leaves the WAL to the next checkpoint.
+        """
+        conn = db.get_connection(db_path)
+        total = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, app_name, password FROM vault "
+                "WHERE owner_username = ? AND secret IS NULL LIMIT ?",
+                (self.username, LEGACY_BATCH),
+            ).fetchall()
+            if not rows:
+                if total:
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                return total
+            with conn:
+                conn.executemany(
+                    "UPDATE vault SET secret = ?, password = '', fingerprint = ? WHERE id = ?",
+                    [(self.seal(app_name, pwd), self.fingerprint(pwd), row_id)
+                     for row_id, app_name, pwd in rows],
+                )
+            total += len(rows)
+
+    def fingerprint_rows(self, db_path: str = db.VAULT_DB) -> int:
+        """Fill in vault.fingerprint for this user's rows that lack one, e.g.
+        rows restored from an export; returns how many."""
+        conn = db.get_connection(db_path)
+        total = 0
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, app_name, password, secret FROM vault "
+                "WHERE owner_username = ? AND fingerprint IS NULL AND id > ? ORDER BY id LIMIT ?",
+                (self.username, last_id, LEGACY_BATCH),
+            ).fetchall()
+            if not rows:
+                return total
+            last_id = rows[-1][0]
+            updates = []
+            for row_id, app_name, pwd, secret in rows:
+                try:
+                    updates.append((self.fingerprint(self.reveal(app_name, pwd, secret)), row_id))
+                except crypto.DecryptionError:
+                    continue  # left for the viewer to report, never matches anything
+            with conn:
+                conn.executemany("UPDATE vault SET fingerprint = ? WHERE id = ?", updates)
+            total += len(updates)
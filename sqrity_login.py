@@ -1,179 +1,228 @@
 # sqrity_login.py
+from __future__ import annotations  # ctk annotations without importing it up front
 
 import tkinter as tk
 from tkinter import messagebox
-import sqlite3
-import hashlib
+import importlib.util
+import itertools
+import json
+import math
 import os
+import sqlite3
 import sys
-import subprocess
+from typing import TYPE_CHECKING
 
+import auth
+import crypto
+import db
+import schema
+import tasks
+import throttle
+from auth import DB_PATH, create_user, unlock
 
-# Issam added this
-def check_and_install_ctk():
+if TYPE_CHECKING:
+    import customtkinter as ctk
+
+
+# Where found packages are remembered, per Python interpreter, so later
+# launches skip the lookup
+DEPS_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "sqrity", "deps.json")
+
+
+def _load_deps_cache() -> dict:
+    try:
+        with open(DEPS_CACHE) as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_deps_cache(cache: dict):
     try:
-        import customtkinter
-        print("customtkinter is already installed!")
+        os.makedirs(os.path.dirname(DEPS_CACHE), exist_ok=True)
+        with open(DEPS_CACHE, "w") as fp:
+            json.dump(cache, fp, indent=2)
+    except OSError:
+        pass  # only a speed-up, probe again next time
+
+
+# Issam added this
+def check_and_install_package(module_name: str, package_name: str):
+    """Make sure module_name can be imported, offering to pip install package_name.
+
+    The module is located, not imported, and where it was found is cached,
+    so a normal launch costs one stat() per package.
+    """
+    cache = _load_deps_cache()
+    found = cache.setdefault(sys.executable, {})
+    origin = found.get(module_name)
+    if origin and os.path.exists(origin):
+        return True
+
+    spec = importlib.util.find_spec(module_name)
+    if spec is not None:
+        print(f"{package_name} is already installed!")
+        found[module_name] = spec.origin
+        _save_deps_cache(cache)
         return True
-    except ImportError:
-        print("customtkinter not found.")
+    else:
+        print(f"{package_name} not found.")
         # Ask user for confirmation
         root = tk.Tk()
         root.withdraw()  # Hide the main window
         response = messagebox.askyesno(
             "Install Required Package",
-            "customtkinter is required but not installed.\n\n"
+            f"{package_name} is required but not installed.\n\n"
             "Do you want to install it now?\n\n"
-            "This will run: pip install customtkinter"
+            f"This will run: pip install {package_name}"
         )
         root.destroy()
 
         if response:
-            print("Installing customtkinter...")
+            print(f"Installing {package_name}...")
+            import subprocess  # only needed on this rare path
+
             try:
-                subprocess.check_call([sys.executable, "-m", "pip", "install", "customtkinter"])
-                print("customtkinter installed successfully!")
+                subprocess.check_call([sys.executable, "-m", "pip", "install", package_name])
+                print(f"{package_name} installed successfully!")
+                importlib.invalidate_caches()
                 return True
             except subprocess.CalledProcessError:
                 messagebox.showerror(
                     "Installation Failed",
-                    "Failed to install customtkinter.\n\n"
+                    f"Failed to install {package_name}.\n\n"
                     "Please install it manually using:\n"
-                    "pip install customtkinter"
+                    f"pip install {package_name}"
                 )
                 return False
         else:
             messagebox.showinfo(
                 "Installation Cancelled",
-                "customtkinter is required to run this application.\n\n"
+                f"{package_name} is required to run this application.\n\n"
                 "Please install it manually using:\n"
-                "pip install customtkinter"
+                f"pip install {package_name}"
             )
             return False
 
 
-import customtkinter as ctk
-
-DB_PATH = "users.db"  # same database file you already use
+def check_and_install_ctk():
+    return check_and_install_package("customtkinter", "customtkinter")
 
 
 # ---------- DB HELPERS ----------
 
 def init_db():
-    """Create users table if it does not exist."""
-    try:
-        with sqlite3.connect(DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS users
-                (
-                    id
-                    INTEGER
-                    PRIMARY
-                    KEY
-                    AUTOINCREMENT,
-                    username
-                    TEXT
-                    NOT
-                    NULL
-                    UNIQUE,
-                    salt
-                    BLOB
-                    NOT
-                    NULL,
-                    password_hash
-                    BLOB
-                    NOT
-                    NULL
-                )
-                """
-            )
-            conn.commit()
-    except sqlite3.Error as e:
-        messagebox.showerror("Database Error", f"Error initializing DB: {e}")
-
-
-def hash_password(password: str, salt: bytes | None = None):
-    """Return (salt, hash) using PBKDF2-HMAC-SHA256."""
-    if salt is None:
-        salt = os.urandom(16)
-    pwd_hash = hashlib.pbkdf2_hmac(
-        "sha256",
-        password.encode("utf-8"),
-        salt,
-        100_000
-    )
-    return salt, pwd_hash
+    """Create or upgrade the users and vault schemas."""
+    schema.migrate_db(DB_PATH, schema.USERS_MIGRATIONS)
+    schema.migrate_db(db.VAULT_DB, schema.VAULT_MIGRATIONS)
 
 
-def register_user(username: str, password: str):
-    if not username or not password:
-        messagebox.showerror("Error", "Please enter both username and password.")
-        return
+# ---------- STARTUP WORK ----------
+# Run on a worker thread (see tasks.run_steps) while the splash is shown.
+# Logins run on the same worker pool, so they find these already done.
 
+def warm_connections():
+    """Open this thread's database connections and read what a login needs."""
+    auth.kdf_policy()
+    db.get_connection(db.VAULT_DB).execute("SELECT id FROM vault LIMIT 1").fetchall()
+
+
+def load_encryption():
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            cur = conn.cursor()
+        crypto.new_cipher(bytes(crypto.KEY_SIZE))
+    except RuntimeError:
+        pass  # the login reports the missing package
 
-            # Check if username exists
-            cur.execute("SELECT id FROM users WHERE username = ?", (username,))
-            if cur.fetchone() is not None:
-                messagebox.showerror("Error", "Username already taken.")
-                return
 
-            salt, pwd_hash = hash_password(password)
+def prepare_generator():
+    """Build the character table for every set of character types and load
+    the strength meter's word lists."""
+    import passgen  # pulls in argparse for its CLI, so only on this worker
+    import strength
 
-            cur.execute(
-                "INSERT INTO users (username, salt, password_hash) VALUES (?, ?, ?)",
-                (username, salt, pwd_hash),
-            )
-            conn.commit()
+    strength.load_dictionaries()
+    for count in range(1, len(passgen.CHARSETS) + 1):
+        for classes in itertools.combinations(passgen.CHARSETS, count):
+            passgen.character_table(classes)
+
+
+def load_windows():
+    """Import every window module, so opening one later is only building it."""
+    from app import WINDOWS
 
-        messagebox.showinfo("Success", "Registration successful! You can now login.")
-    except sqlite3.Error as e:
-        messagebox.showerror("Database Error", f"Error during registration: {e}")
+    for module_name, _ in WINDOWS.values():
+        importlib.import_module(module_name)
 
 
-def login_user(username: str, password: str, root: tk.Tk):
+STARTUP_STEPS = (
+    ("Setting up database...", init_db),
+    ("Opening database connections...", warm_connections),
+    ("Loading encryption modules...", load_encryption),
+    ("Preparing password generator...", prepare_generator),
+    ("Loading interface...", load_windows),
+)
+
+
+def register_user(username: str, password: str, app, on_done=None):
+    """Register in the background; on_done() runs on the Tk thread when finished."""
     if not username or not password:
         messagebox.showerror("Error", "Please enter both username and password.")
-        return
+        return None
+
+    def finished(future):
+        if on_done is not None:
+            on_done()
+        try:
+            created = future.result()
+        except sqlite3.Error as e:
+            messagebox.showerror("Database Error", f"Error during registration: {e}")
+            return
 
-    try:
-        with sqlite3.connect(DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT salt, password_hash FROM users WHERE username = ?",
-                (username,),
-            )
-            row = cur.fetchone()
+        if created:
+            messagebox.showinfo("Success", "Registration successful! You can now login.")
+        else:
+            messagebox.showerror("Error", "Username already taken.")
+
+    return tasks.run_in_background(app.root, create_user, username, password, on_done=finished)
 
-        if row is None:
-            messagebox.showerror("Error", "Invalid username or password.")
-            return
 
-        db_salt, db_hash = row
-        _, entered_hash = hash_password(password, db_salt)
+def login_user(username: str, password: str, app, on_done=None):
+    """Check credentials in the background; on_done() runs on the Tk thread when finished."""
+    if not username or not password:
+        messagebox.showerror("Error", "Please enter both username and password.")
+        return None
+
+    def finished(future):
+        if on_done is not None:
+            on_done()
+        try:
+            session = future.result()
+        except sqlite3.Error as e:
+            messagebox.showerror("Database Error", f"Error during login: {e}")
+            return
+        except RuntimeError as e:  # encryption support missing
+            messagebox.showerror("Error", str(e))
+            return
+        except throttle.LoginThrottled as e:
+            messagebox.showerror(
+                "Error",
+                f"Too many login attempts. Try again in {math.ceil(e.retry_after)} seconds.",
+            )
+            return
 
-        if entered_hash == db_hash:
+        if session is not None:
             messagebox.showinfo("Login", "Login successful!")
-            open_dashboard(username)
-            root.destroy()  # close login window
+            open_dashboard(username, app, session)  # also hides the login window
         else:
             messagebox.showerror("Error", "Invalid username or password.")
 
-    except sqlite3.Error as e:
-        messagebox.showerror("Database Error", f"Error during login: {e}")
+    return tasks.run_in_background(app.root, unlock, username, password, on_done=finished)
 
 
-def open_dashboard(username: str):
-    """
-    Open Dashboard.py and pass the username as a command-line argument.
-    Dashboard.py must read sys.argv[1] to know who is logged in.
-    """
+def open_dashboard(username: str, app, session=None):
+    """Switch the running app from the login window to the user's dashboard."""
     try:
-        subprocess.Popen([sys.executable, "Dashboard.py", username])
+        app.login(username, session)
     except Exception as e:
         messagebox.showerror("Error", f"Could not open dashboard: {e}")
 
@@ -188,68 +237,66 @@ def CenterWindowToDisplay(Screen: ctk.CTk, width: int, height: int, scale_factor
     return f"{width}x{height}+{x}+{y}"
 
 
-def show_loading_screen():
-    """Show a loading screen for 5 seconds"""
-    loading = ctk.CTk()
-    loading.title("SQRITY - Loading")
-    loading.geometry("400x200")
-    loading.resizable(False, False)
+def build_loading_window(root: ctk.CTkToplevel, app):
+    """Splash shown while STARTUP_STEPS run; opens the login window when they finish."""
+    import customtkinter as ctk
 
-    # Center the loading screen
-    loading.update_idletasks()
-    loading.eval('tk::PlaceWindow . center')
+    root.title("SQRITY - Loading")
+    root.geometry("400x200")
+    root.resizable(False, False)
 
     # Loading content
     loading_label = ctk.CTkLabel(
-        loading,
+        root,
         text="SQRITY - Password Manager",
         font=("Segoe UI", 20, "bold")
     )
     loading_label.pack(pady=30)
 
-    progress_bar = ctk.CTkProgressBar(loading, width=300, height=20)
+    progress_bar = ctk.CTkProgressBar(root, width=300, height=20)
     progress_bar.pack(pady=20)
     progress_bar.set(0)
 
     status_label = ctk.CTkLabel(
-        loading,
-        text="Initializing secure environment...",
+        root,
+        text=STARTUP_STEPS[0][0],
         font=("Segoe UI", 12)
     )
     status_label.pack(pady=10)
 
-    loading.update()
-
-    # Animate progress bar over 5 seconds
-    for i in range(101):
-        progress_bar.set(i / 100)
-        if i < 25:
-            status_label.configure(text="Initializing secure environment...")
-        elif i < 50:
-            status_label.configure(text="Loading encryption modules...")
-        elif i < 75:
-            status_label.configure(text="Setting up database...")
-        else:
-            status_label.configure(text="Almost ready...")
-        loading.update()
-        loading.after(50)  # 50ms * 100 steps = 5 seconds
+    # Center the loading screen
+    root.update_idletasks()
+    root.geometry(CenterWindowToDisplay(root, 400, 200, root._get_window_scaling()))
 
-    loading.destroy()
+    def on_progress(done, total):
+        progress_bar.set(done / total)
+        if done < total:
+            status_label.configure(text=STARTUP_STEPS[done][0])
 
+    def on_done(future):
+        try:
+            future.result()
+        except sqlite3.Error as e:
+            messagebox.showerror("Database Error", f"Error initializing DB: {e}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Error during startup: {e}")
+        app.hide("loading")
+        app.show("login")
 
-# ---------- UI ----------
+    def on_show(username=None):
+        tasks.run_steps(root, STARTUP_STEPS, on_progress, on_done)
+        # Meanwhile build the login window here on the Tk thread, hidden
+        root.after_idle(app.prepare, "login")
 
-def main():
-    check_and_install_ctk()
-    # Show loading screen first
-    # show_loading_screen()
-    init_db()
+    return on_show
 
-    # Configure customtkinter theme
-    ctk.set_appearance_mode("dark")
-    ctk.set_default_color_theme("blue")
 
-    root = ctk.CTk()
+# ---------- UI ----------
+
+def build_login_window(root: ctk.CTkToplevel, app):
+    """Fill the login window; built once by the app's window manager."""
+    import customtkinter as ctk  # after main() has checked it is installed
+
     root.title("SQRITY - PM Login")
     root.geometry("450x260")
     root.resizable(False, False)
@@ -329,15 +376,38 @@ def main():
     buttons_frame = ctk.CTkFrame(root, fg_color="transparent")
     buttons_frame.pack(pady=(10, 5))
 
+    # Busy indicator, shown while a login/registration runs in the background
+    busy_bar = ctk.CTkProgressBar(root, width=300, height=8, mode="indeterminate")
+    busy = False
+
+    def set_busy(value: bool):
+        nonlocal busy
+        busy = value
+        state = "disabled" if value else "normal"
+        register_btn.configure(state=state)
+        login_btn.configure(state=state)
+        if value:
+            busy_bar.pack(pady=(5, 0))
+            busy_bar.start()
+        else:
+            busy_bar.stop()
+            busy_bar.pack_forget()
+
     def on_register():
+        if busy:  # ignore double clicks while the KDF is running
+            return
         username = username_entry.get().strip()
         password = password_entry.get()
-        register_user(username, password)
+        if register_user(username, password, app, on_done=lambda: set_busy(False)):
+            set_busy(True)
 
     def on_login():
+        if busy:
+            return
         username = username_entry.get().strip()
         password = password_entry.get()
-        login_user(username, password, root)
+        if login_user(username, password, app, on_done=lambda: set_busy(False)):
+            set_busy(True)
 
     register_btn = ctk.CTkButton(
         buttons_frame,
@@ -366,7 +436,21 @@ def main():
 
     root.geometry(CenterWindowToDisplay(root, 650, 350, root._get_window_scaling()))
 
-    root.mainloop()
+    def on_show(username=None):
+        # Never leave the previous user's password behind after a logout
+        password_entry.delete(0, tk.END)
+        username_entry.focus_set()
+
+    return on_show
+
+
+def main():
+    check_and_install_ctk()
+    check_and_install_package("cryptography", "cryptography")  # vault encryption
+
+    # The splash does the startup work, then opens the login window
+    from app import main as app_main
+    app_main("loading")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,151 @@
+# startup.py
+"""Cold-start profiling and budgets for every SQRITY entry point.
+
+    python startup.py                  # time every entry point, with import breakdown
+    python startup.py login --top 20
+    python startup.py --check          # exit 1 if any start is over its budget
+
+Each entry point runs in a fresh interpreter under ``-X importtime``. GUI
+entry points report the wall clock to their first drawn frame (see app.py)
+and exit at once; headless ones are timed until the process exits.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROFILE_USER = "startup-profile"  # username passed to windows that need one
+
+# name -> script and arguments
+ENTRY_POINTS = {
+    "login": ["sqrity_login.py"],
+    "dashboard": ["Dashboard.py", PROFILE_USER],
+    "generator": ["generator.py", PROFILE_USER],
+    "view": ["view.py", PROFILE_USER],
+    "batch": ["generator.py", "--batch", "1000"],
+}
+
+# Wall clock budget for a cold start, in milliseconds
+BUDGET_MS = {
+    "login": 1500,
+    "dashboard": 1500,
+    "generator": 1500,
+    "view": 1500,
+    "batch": 300,
+}
+
+TIMEOUT_S = 60
+
+# Printed by app.WindowManager.run when SQRITY_STARTUP_T0 is set; app itself
+# is not imported here, since that would load customtkinter
+FIRST_FRAME_TAG = "sqrity-first-frame-ms"
+
+
+def parse_importtime(stderr: str):
+    """Return [(module, self_us, cumulative_us, depth)] from -X importtime output."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def profile(name: str, python: str = sys.executable):
+    """Start one entry point and return its timings and import breakdown."""
+    script, *args = ENTRY_POINTS[name]
+    env = dict(os.environ, SQRITY_STARTUP_T0=repr(time.time()))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [python, "-X", "importtime", os.path.join(HERE, script), *args],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=TIMEOUT_S,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    first_frame_ms = None
+    for line in proc.stderr.splitlines():
+        if line.startswith(FIRST_FRAME_TAG):
+            first_frame_ms = float(line.split()[1])
+
+    imports = parse_importtime(proc.stderr)
+    errors = [line for line in proc.stderr.splitlines()
+              if not line.startswith(("import time:", FIRST_FRAME_TAG))]
+    return {
+        "entry": name,
+        "returncode": proc.returncode,
+        # GUI entries: time to the first frame; headless ones: until exit
+        "startup_ms": first_frame_ms if first_frame_ms is not None else wall_ms,
+        "first_frame_ms": first_frame_ms,
+        "exit_ms": wall_ms,
+        "import_ms": sum(us for _, us, _, _ in imports) / 1000,
+        "imports": imports,
+        "error": errors[-1] if proc.returncode and errors else None,
+    }
+
+
+def print_report(result: dict, top: int):
+    label = "first frame" if result["first_frame_ms"] is not None else "exit"
+    print(f"{result['entry']}: {result['startup_ms']:.0f} ms to {label}, "
+          f"{result['import_ms']:.0f} ms importing")
+    if result["returncode"]:
+        print(f"  exited with {result['returncode']}: {result['error']}")
+
+    top_level = sorted((i for i in result["imports"] if i[3] == 0), key=lambda i: -i[2])
+    print("  slowest top-level imports (cumulative ms):")
+    for module, _, cumulative_us, _ in top_level[:top]:
+        print(f"    {cumulative_us / 1000:8.1f}  {module}")
+    heaviest = sorted(result["imports"], key=lambda i: -i[1])
+    print("  slowest modules (self ms):")
+    for module, self_us, _, _ in heaviest[:top]:
+        print(f"    {self_us / 1000:8.1f}  {module}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile SQRITY cold start.")
+    parser.add_argument("entries", nargs="*", metavar="ENTRY",
+                        help=f"entry points to profile (default: all of {', '.join(ENTRY_POINTS)})")
+    parser.add_argument("--top", type=int, default=10, help="imports listed per entry point")
+    parser.add_argument("--check", action="store_true",
+                        help="exit 1 if a start takes longer than its budget")
+    parser.add_argument("--budget-ms", type=float, help="one budget for every entry point")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.entries if name not in ENTRY_POINTS]
+    if unknown:
+        parser.error(f"unknown entry point: {', '.join(unknown)}")
+
+    over = []
+    results = []
+    for name in args.entries or ENTRY_POINTS:
+        try:
+            result = profile(name)
+        except subprocess.TimeoutExpired:
+            print(f"{name}: no first frame after {TIMEOUT_S}s", file=sys.stderr)
+            over.append(name)
+            continue
+        results.append(result)
+        budget = args.budget_ms or BUDGET_MS[name]
+        verdict = ("FAILED" if result["returncode"]
+                   else "OVER" if result["startup_ms"] > budget else "ok")
+        if verdict != "ok":
+            over.append(name)
+        if not args.json:
+            print_report(result, args.top)
+            print(f"  budget {budget:.0f} ms: {verdict}\n")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    if args.check and over:
+        print(f"Over budget or failed: {', '.join(over)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,388 @@
+# strength.py
+"""Password strength estimation in the style of zxcvbn, cheap enough to run
+on every keystroke.
+
+A password is split into the cheapest run of guessable pieces: dictionary
+words (also reversed or with l33t substitutions), keyboard walks, sequences
+like abc or 9753, repeated characters and years. Whatever is left is guessed
+one character at a time. The total number of guesses gives a score from
+0 (too guessable) to 4 (very unguessable).
+
+An Estimator keeps its work for the last text it scored, so typing one more
+character only looks at the substrings that end in it.
+"""
+
+import array
+import bisect
+import collections
+import datetime
+import glob
+import itertools
+import math
+import os
+
+WORDLIST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wordlists")
+MIN_MATCH = 3            # shortest word, walk, sequence or repeat that counts
+MAX_WORD = 24            # longer dictionary entries are ignored
+REFERENCE_YEAR = datetime.date.today().year
+MIN_YEAR_SPACE = 20
+
+# log10(guesses) a score must reach, as in zxcvbn
+SCORE_THRESHOLDS = (3, 6, 8, 10)
+SCORE_LABELS = ("Very weak", "Weak", "Fair", "Strong", "Very strong")
+
+Strength = collections.namedtuple("Strength", "score label guesses_log10 warning")
+
+
+# ----------------------
+#   WORD LISTS
+# ----------------------
+class WordList:
+    """Lowercase words in sorted order, kept as one string plus an array of
+    offsets, with each word's frequency rank (1 = most common) beside it.
+
+    Supports len() and indexing, so bisect searches it directly.
+    """
+
+    def __init__(self, name: str, words):
+        ranks = {}
+        for rank, word in enumerate(words, start=1):
+            word = word.strip().lower()
+            if MIN_MATCH <= len(word) <= MAX_WORD:
+                ranks.setdefault(word, rank)
+        ordered = sorted(ranks)
+        self.name = name
+        self._text = "".join(ordered)
+        self._offsets = array.array("I", itertools.accumulate(map(len, ordered), initial=0))
+        self._ranks = array.array("I", (ranks[word] for word in ordered))
+
+    def __len__(self):
+        return len(self._ranks)
+
+    def __getitem__(self, index):
+        return self._text[self._offsets[index]:self._offsets[index + 1]]
+
+    def lookup(self, text: str):
+        """Return (rank or None, whether some word starts with text)."""
+        index = bisect.bisect_left(self, text)
+        if index == len(self):
+            return None, False
+        word = self[index]
+        return (self._ranks[index] if word == text else None), word.startswith(text)
+
+    def reversed(self):
+        """The same list with every word spelled backwards, same ranks."""
+        flipped = WordList.__new__(WordList)
+        pairs = sorted((self[i][::-1], self._ranks[i]) for i in range(len(self)))
+        flipped.name = self.name
+        flipped._text = "".join(word for word, _ in pairs)
+        flipped._offsets = array.array("I", itertools.accumulate((len(w) for w, _ in pairs), initial=0))
+        flipped._ranks = array.array("I", (rank for _, rank in pairs))
+        return flipped
+
+
+_dictionaries = None
+
+
+def load_dictionaries():
+    """Load every wordlists/*.txt once; later calls return the same lists.
+
+    Each file is one word per line, most common first; the file name is the
+    list's name.
+    """
+    global _dictionaries
+    if _dictionaries is None:
+        lists = []
+        for path in sorted(glob.glob(os.path.join(WORDLIST_DIR, "*.txt"))):
+            with open(path, encoding="utf-8") as fp:
+                words = WordList(os.path.splitext(os.path.basename(path))[0], fp)
+            lists.append((words, False))
+            lists.append((words.reversed(), True))
+        _dictionaries = lists
+    return _dictionaries
+
+
+# ----------------------
+#   PATTERNS
+# ----------------------
+# Common substitutions, undone before dictionary lookups. '1' reads as
+# either 'i' or 'l', hence two tables.
+L33T_TABLES = (
+    str.maketrans("4@3!0$5+7|1", "aaeiosstti" + "i"),
+    str.maketrans("4@3!0$5+7|1", "aaeiosstti" + "l"),
+)
+
+# Keyboard layouts: rows of (unshifted, shifted) keys
+QWERTY = (
+    ("`1234567890-=", "~!@#$%^&*()_+"),
+    ("qwertyuiop[]\\", "QWERTYUIOP{}|"),
+    ("asdfghjkl;'", 'ASDFGHJKL:"'),
+    ("zxcvbnm,./", "ZXCVBNM<>?"),
+)
+KEYPAD = (("789", "789"), ("456", "456"), ("123", "123"), (" 0.", " 0."))
+
+# Row/column steps to a neighbouring key. QWERTY rows are staggered, so
+# up-right and down-left are neighbours while up-left and down-right are not.
+QWERTY_STEPS = ((0, -1), (0, 1), (-1, 0), (-1, 1), (1, -1), (1, 0))
+KEYPAD_STEPS = tuple((dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc)
+
+
+def _build_graph(rows, steps):
+    positions, shifted = {}, set()
+    for r, (plain, shift) in enumerate(rows):
+        for c, (key, shift_key) in enumerate(zip(plain, shift)):
+            if key != " ":
+                positions[key] = positions[shift_key] = (r, c)
+                if shift_key != key:
+                    shifted.add(shift_key)
+    cells = set(positions.values())
+    degree = sum(sum((r + dr, c + dc) in cells for dr, dc in steps) for r, c in cells) / len(cells)
+    return {"positions": positions, "shifted": shifted, "steps": set(steps),
+            "starts": len(cells), "degree": degree}
+
+
+GRAPHS = (_build_graph(QWERTY, QWERTY_STEPS), _build_graph(KEYPAD, KEYPAD_STEPS))
+
+
+def _step(a: str, b: str):
+    """Return (graph index, direction) if b is next to a on a keyboard."""
+    for index, graph in enumerate(GRAPHS):
+        pa, pb = graph["positions"].get(a), graph["positions"].get(b)
+        if pa is not None and pb is not None:
+            direction = (pb[0] - pa[0], pb[1] - pa[1])
+            if direction in graph["steps"]:
+                return index, direction
+    return None
+
+
+def _cardinality(char: str) -> int:
+    if char.islower():
+        return 26
+    if char.isupper():
+        return 26
+    if char.isdigit():
+        return 10
+    return 33
+
+
+def _case_variations(upper: int, lower: int, first_or_all: bool) -> int:
+    """How many ways the capitals could have been placed (zxcvbn's formula)."""
+    if not upper:
+        return 1
+    if first_or_all:
+        return 2
+    return sum(math.comb(upper + lower, k) for k in range(1, min(upper, lower) + 1))
+
+
+def _uppercase_variations(token: str) -> int:
+    upper = sum(c.isupper() for c in token)
+    lower = sum(c.islower() for c in token)
+    simple = token.isupper() or (token[0].isupper() and upper == 1) or (token[-1].isupper() and upper == 1)
+    return _case_variations(upper, lower, simple)
+
+
+def _walk_guesses(graph, length: int, turns: int, shifted: int) -> float:
+    guesses = 0
+    for i in range(2, length + 1):
+        for t in range(1, min(turns, i - 1) + 1):
+            guesses += math.comb(i - 1, t - 1) * graph["starts"] * graph["degree"] ** t
+    return guesses * _case_variations(shifted, length - shifted, shifted == length)
+
+
+WARNINGS = {
+    "top10": "This is a top-10 common password",
+    "top100": "This is a top-100 common password",
+    "common": "This is similar to a commonly used password",
+    "word": "A word by itself is easy to guess",
+    "words": "Common words are easy to guess",
+    "reversed": "Reversed words aren't much harder to guess",
+    "l33t": "Predictable substitutions like '@' instead of 'a' don't help very much",
+    "straight": "Straight rows of keys are easy to guess",
+    "walk": "Short keyboard patterns are easy to guess",
+    "sequence": "Sequences like abc or 6543 are easy to guess",
+    "repeat": 'Repeats like "aaa" are easy to guess',
+    "year": "Recent years are easy to guess",
+}
+
+
+# ----------------------
+#   ESTIMATOR
+# ----------------------
+class Estimator:
+    """Scores passwords, reusing the work for the part of the text that did
+    not change since the last call. Not thread-safe; use one per widget.
+    """
+
+    def __init__(self, dictionaries=None):
+        self._dictionaries = load_dictionaries() if dictionaries is None else dictionaries
+        self._streams = len(self._dictionaries) * (1 + len(L33T_TABLES))
+        self._reset()
+
+    def _reset(self):
+        self._text = ""
+        self._variants = [[] for _ in range(1 + len(L33T_TABLES))]  # lowercase, then l33t readings
+        # One entry per position, each depending only on the text up to it
+        self._alive = []         # per stream: starts whose substring is still a word prefix
+        self._walk = []          # (start, graph, direction, turns, shifted) of the walk ending here
+        self._sequence = []      # (start, delta) of the sequence ending here
+        self._repeat = []        # start of the run of one character ending here
+        self._best = [0.0]       # log10 guesses of the cheapest split of text[:i]
+        self._back = [None]      # the match ending the cheapest split of text[:i]
+
+    def estimate(self, password: str) -> Strength:
+        keep = 0
+        for a, b in zip(self._text, password):
+            if a != b:
+                break
+            keep += 1
+        self._truncate(keep)
+        for j in range(keep, len(password)):
+            self._extend(password, j)
+        self._text = password
+        return self._result()
+
+    def _truncate(self, length: int):
+        for variant in self._variants:
+            del variant[length:]
+        for history in (self._alive, self._walk, self._sequence, self._repeat):
+            del history[length:]
+        del self._best[length + 1:]
+        del self._back[length + 1:]
+
+    # ---------- matching ----------
+    def _extend(self, text: str, j: int):
+        """Match everything ending at text[j] and extend the cheapest split."""
+        char = text[j]
+        lower = char.lower()
+        self._variants[0].append(lower)
+        for table, variant in zip(L33T_TABLES, self._variants[1:]):
+            variant.append(lower.translate(table))
+
+        matches = []
+        self._match_words(text, j, matches)
+        self._match_walk(text, j, matches)
+        self._match_sequence(text, j, matches)
+        self._match_repeat(text, j, matches)
+        digits = text[j - 3:j + 1]
+        # isdigit() alone also accepts characters such as '²' that int() rejects
+        if j >= 3 and digits.isascii() and digits.isdigit():
+            year = int(digits)
+            if 1900 <= year <= 2049:
+                matches.append((j - 3, math.log10(max(abs(year - REFERENCE_YEAR), MIN_YEAR_SPACE)), "year"))
+
+        # Guess this character on its own, or finish a match here
+        best = self._best[j] + math.log10(_cardinality(char))
+        back = None
+        for start, guesses_log10, kind in matches:
+            cost = self._best[start] + guesses_log10
+            if cost < best:
+                best, back = cost, (start, j + 1, kind)
+        self._best.append(best)
+        self._back.append(back)
+
+    def _match_words(self, text, j, matches):
+        previous = self._alive[j - 1] if j else [()] * self._streams
+        alive = []
+        stream = 0
+        for words, is_reversed in self._dictionaries:
+            for v, variant in enumerate(self._variants):
+                still = []
+                for start in (*previous[stream], j):
+                    token = "".join(variant[start:j + 1])
+                    rank, prefix = words.lookup(token)
+                    if prefix:
+                        still.append(start)
+                    if rank is None or (v and token == "".join(self._variants[0][start:j + 1])):
+                        continue  # no word, or a l33t reading with nothing substituted
+                    original = text[start:j + 1]
+                    guesses = rank * _uppercase_variations(original)
+                    if v:
+                        substituted = sum(a != b for a, b in zip(token, original.lower()))
+                        guesses *= 2 ** substituted
+                    if is_reversed:
+                        guesses *= 2
+                    if words.name == "passwords":
+                        kind = "top10" if rank <= 10 else "top100" if rank <= 100 else "common"
+                    else:
+                        kind = "words"
+                    if is_reversed:
+                        kind = "reversed"
+                    elif v:
+                        kind = "l33t"
+                    matches.append((start, math.log10(guesses), kind))
+                alive.append(tuple(still))
+                stream += 1
+        self._alive.append(alive)
+
+    def _match_walk(self, text, j, matches):
+        step = _step(text[j - 1], text[j]) if j else None
+        if step is None:
+            self._walk.append((j, None, None, 0, 0))
+            return
+        start, graph, direction, turns, shifted = self._walk[j - 1]
+        if graph != step[0]:
+            start, turns, shifted = j - 1, 0, text[j - 1] in GRAPHS[step[0]]["shifted"]
+        if step[1] != direction or graph != step[0]:
+            turns += 1
+        shifted += text[j] in GRAPHS[step[0]]["shifted"]
+        self._walk.append((start, step[0], step[1], turns, shifted))
+        length = j - start + 1
+        if length >= MIN_MATCH:
+            guesses = _walk_guesses(GRAPHS[step[0]], length, turns, shifted)
+            matches.append((start, math.log10(guesses), "straight" if turns == 1 else "walk"))
+
+    def _match_sequence(self, text, j, matches):
+        delta = ord(text[j]) - ord(text[j - 1]) if j else 0
+        if not 1 <= abs(delta) <= 5:
+            self._sequence.append((j, 0))
+            return
+        start, previous = self._sequence[j - 1]
+        if previous != delta:
+            start = j - 1
+        self._sequence.append((start, delta))
+        length = j - start + 1
+        if length >= MIN_MATCH:
+            first = text[start]
+            base = 4 if first in "aAzZ019" else 10 if first.isdigit() else 26
+            if delta < 0:
+                base *= 2
+            matches.append((start, math.log10(base * length), "sequence"))
+
+    def _match_repeat(self, text, j, matches):
+        start = self._repeat[j - 1] if j and text[j] == text[j - 1] else j
+        self._repeat.append(start)
+        length = j - start + 1
+        if length >= MIN_MATCH:
+            matches.append((start, math.log10(_cardinality(text[j]) * length), "repeat"))
+
+    # ---------- scoring ----------
+    def _result(self) -> Strength:
+        if not self._text:
+            return Strength(0, SCORE_LABELS[0], 0.0, "")
+        guesses_log10 = self._best[-1]
+        score = sum(guesses_log10 >= threshold for threshold in SCORE_THRESHOLDS)
+
+        # Warn about the longest pattern in the cheapest split
+        longest = None
+        end = len(self._text)
+        while end > 0:
+            back = self._back[end]
+            if back is None:
+                end -= 1
+                continue
+            if longest is None or back[1] - back[0] > longest[1] - longest[0]:
+                longest = back
+            end = back[0]
+
+        warning = ""
+        if longest is not None and score <= 2:
+            kind = longest[2]
+            if kind == "words" and longest[1] - longest[0] == len(self._text):
+                kind = "word"
+            warning = WARNINGS[kind]
+        return Strength(score, SCORE_LABELS[score], guesses_log10, warning)
+
+
+def estimate(password: str) -> Strength:
+    """Score one password from scratch."""
+    return Estimator().estimate(password)
@@ -0,0 +1,109 @@
+# tasks.py
+"""Run slow work (key derivation, database access) off the Tk main thread.
+
+Results are handed back to Tk by polling the future with ``widget.after``,
+so the event loop never waits on a worker. Work that has to run on the Tk
+thread itself (filling a widget) is split into chunks with run_in_chunks.
+"""
+
+import itertools
+
+POLL_MS = 16  # about one frame at 60 Hz
+CHUNK_MS = 1  # gap between chunks, lets Tk handle input and redraw
+
+_executor = None
+
+
+def submit(fn, *args):
+    """Run fn(*args) on the shared worker pool and return its Future."""
+    global _executor
+    if _executor is None:
+        # Imported here, it is not needed until the first background task
+        from concurrent.futures import ThreadPoolExecutor
+
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="sqrity")
+    return _executor.submit(fn, *args)
+
+
+def when_done(widget, future, callback, interval: int = POLL_MS):
+    """Call callback(future) on the Tk thread once future has finished."""
+    def poll():
+        if future.done():
+            callback(future)
+        else:
+            widget.after(interval, poll)
+
+    widget.after(interval, poll)
+
+
+def run_in_background(widget, fn, *args, on_done):
+    """submit() + when_done() in one call; returns the Future."""
+    future = submit(fn, *args)
+    when_done(widget, future, on_done)
+    return future
+
+
+def run_steps(widget, steps, on_progress, on_done, interval: int = POLL_MS):
+    """Run the (label, fn) steps in order on a worker; returns the Future.
+
+    on_progress(done, total) runs on the Tk thread as steps finish, and
+    on_done(future) once they all have or one of them raised.
+    """
+    finished = []
+
+    def work():
+        for _, fn in steps:
+            fn()
+            finished.append(fn)
+
+    future = submit(work)
+    reported = 0
+
+    def poll():
+        nonlocal reported
+        done = future.done()  # read first, so no finished step is missed below
+        if reported < len(finished):
+            reported = len(finished)
+            on_progress(reported, len(steps))
+        if done:
+            on_done(future)
+        else:
+            widget.after(interval, poll)
+
+    widget.after(interval, poll)
+    return future
+
+
+class CancelToken:
+    """Stops chunked work between two chunks once cancel() is called."""
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def run_in_chunks(widget, items, size, fn, token, on_done=None, interval: int = CHUNK_MS):
+    """Call fn(chunk) on the Tk thread for successive lists of up to size items.
+
+    The first chunk runs before this returns, the rest one per ``widget.after``
+    tick, so the event loop keeps running in between. items may be any
+    iterator (a cursor, say) and is only consumed as far as needed.
+    on_done() runs after the last chunk, never once token is cancelled.
+    """
+    iterator = iter(items)
+
+    def step():
+        if token.cancelled:
+            return
+        chunk = list(itertools.islice(iterator, size))
+        if chunk:
+            fn(chunk)
+        if len(chunk) < size:
+            if on_done is not None:
+                on_done()
+            return
+        widget.after(interval, step)
+
+    step()
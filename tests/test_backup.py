@@ -0,0 +1,88 @@
+# test_backup.py
+import sqlite3
+
+import pytest
+
+import backup
+import db
+import schema
+
+
+def rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {
+            "vault": conn.execute("SELECT * FROM vault ORDER BY id").fetchall(),
+            "import_progress": conn.execute(
+                "SELECT rowid, * FROM import_progress ORDER BY source").fetchall(),
+            "search": conn.execute(
+                "SELECT rowid FROM vault_fts WHERE app_name MATCH 'mail' ORDER BY rowid").fetchall(),
+        }
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def vault_db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    schema.migrate_db(db.VAULT_DB, schema.VAULT_MIGRATIONS)
+    conn = db.get_connection(db.VAULT_DB)
+    with conn:
+        conn.executemany(
+            "INSERT INTO vault (owner_username, app_name, password) VALUES (?, ?, ?)",
+            [("alice", f"mail-{n}", "x") for n in range(200)],
+        )
+    yield conn
+    db.close_thread_connections()
+
+
+def test_deltas_store_only_changes_and_restore(vault_db, tmp_path):
+    conn = vault_db
+    full, _ = backup.backup_database(db.VAULT_DB, "backups")
+    assert full.endswith(backup.FULL_SUFFIX)
+    assert backup.backup_database(db.VAULT_DB, "backups") == (None, 0)
+
+    with conn:
+        conn.execute("UPDATE vault SET app_name = 'gmail' WHERE id = 5")
+        conn.execute("DELETE FROM vault WHERE id = 6")
+        conn.execute("INSERT INTO vault (owner_username, app_name, password) VALUES ('bob', 'mail', 'y')")
+        conn.execute("INSERT OR REPLACE INTO import_progress VALUES ('a.csv', 10, 0)")
+    delta, stored = backup.backup_database(db.VAULT_DB, "backups")
+    assert delta.endswith(backup.DELTA_SUFFIX)
+    assert stored == 3  # rows 5 and 201, and the import_progress row
+
+    # A bulk insert with vault_fts_pause logs its id range in one row
+    with conn:
+        last_id = conn.execute("SELECT max(id) FROM vault").fetchone()[0]
+        conn.execute("INSERT INTO vault_fts_pause (active) VALUES (1)")
+        conn.executemany(
+            "INSERT INTO vault (owner_username, app_name, password) VALUES (?, ?, ?)",
+            [("bob", f"mail-{n}", "z") for n in range(50)],
+        )
+        conn.execute("DELETE FROM vault_fts_pause")
+        conn.execute(
+            "INSERT INTO vault_fts (rowid, owner_key, app_name)"
+            " SELECT id, owner_key, app_name FROM vault_fts_source WHERE id > ?",
+            (last_id,),
+        )
+        conn.execute(schema.LOG_BULK_INSERT, (last_id + 1, last_id + 1))
+        conn.execute("INSERT OR REPLACE INTO import_progress VALUES ('a.csv', 60, 1)")
+    assert conn.execute("SELECT count(*) FROM backup_changes").fetchone()[0] == 2
+    _, stored = backup.backup_database(db.VAULT_DB, "backups")
+    assert stored == 51
+
+    out = str(tmp_path / "restored.db")
+    backup.restore("backups/vault", out)
+    assert rows(out) == rows(db.VAULT_DB)
+    restored = sqlite3.connect(out)
+    assert restored.execute("SELECT count(*) FROM backup_base").fetchone()[0] == 0
+    restored.close()
+
+
+def test_schema_change_forces_a_full_backup(vault_db):
+    backup.backup_database(db.VAULT_DB, "backups")
+    with vault_db:
+        vault_db.execute("INSERT INTO vault (owner_username, app_name, password) VALUES ('bob', 'a', 'b')")
+    vault_db.execute("PRAGMA user_version = 99")
+    target, _ = backup.backup_database(db.VAULT_DB, "backups")
+    assert target.endswith(backup.FULL_SUFFIX)
@@ -0,0 +1,88 @@
+# test_service.py
+import asyncio
+import threading
+
+import pytest
+
+import auth
+import db
+import schema
+import service
+import writer
+
+
+@pytest.fixture
+def socket_path(tmp_path, monkeypatch):
+    """A vault service on a socket in a fresh directory, served from a thread."""
+    monkeypatch.chdir(tmp_path)
+    schema.migrate_db(db.USERS_DB, schema.USERS_MIGRATIONS)
+    schema.migrate_db(db.VAULT_DB, schema.VAULT_MIGRATIONS)
+    assert auth.create_user("alice", "correct horse")
+
+    path = str(tmp_path / "vault.sock")
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    stop = asyncio.Event()
+
+    async def run():
+        server = await asyncio.start_unix_server(service.VaultService().handle, path)
+        started.set()
+        async with server:
+            await stop.wait()
+
+    thread = threading.Thread(target=lambda: loop.run_until_complete(run()), daemon=True)
+    thread.start()
+    started.wait(5)
+    yield path
+    loop.call_soon_threadsafe(stop.set)
+    thread.join(5)
+    loop.close()
+    writer.get(db.VAULT_DB).close()
+
+
+def test_client_round_trip(socket_path):
+    client = service.Client(socket_path)
+    client.login("alice", "correct horse")
+    entry_id = client.save("mail", "hunter2")
+    assert client.list() == [[entry_id, "mail"]]
+    assert client.search("mai") == [[entry_id, "mail"]]
+    assert client.get(entry_id) == [entry_id, "mail", "hunter2"]
+    assert client.list(after=["mail", entry_id]) == []
+    client.logout()
+    with pytest.raises(service.ServiceError, match="not logged in"):
+        client.list()
+    client.close()
+
+
+def test_wrong_password(socket_path):
+    client = service.Client(socket_path)
+    with pytest.raises(service.ServiceError, match="invalid username or password"):
+        client.login("alice", "wrong")
+    client.close()
+
+
+@pytest.mark.parametrize("after", ["zz", ["mail"], ["mail", "1"], [1, 2], ["mail", True]])
+def test_list_rejects_malformed_after(socket_path, after):
+    client = service.Client(socket_path)
+    client.login("alice", "correct horse")
+    with pytest.raises(service.ServiceError, match="after must be"):
+        client.list(after=after)
+    client.close()
+
+
+def test_cli_keeps_the_session(socket_path, monkeypatch, capsys):
+    unlocks = []
+    unlock = auth.unlock
+    monkeypatch.setattr(auth, "unlock", lambda *a: unlocks.append(a[0]) or unlock(*a))
+    monkeypatch.setenv("MASTER", "correct horse")
+    cli = ["--socket", socket_path]
+
+    assert service.main(cli + ["login", "--user", "alice", "--password-env", "MASTER"]) == 0
+    assert service.main(cli + ["list", "--user", "alice"]) == 0
+    assert service.main(cli + ["search", "--user", "alice", "x"]) == 0
+    assert unlocks == ["alice"]  # the key derivation ran once
+
+    assert service.main(cli + ["logout", "--user", "alice"]) == 0
+    assert service.load_token(service.token_path(socket_path, "alice")) is None
+    assert service.main(cli + ["list", "--user", "alice", "--password-env", "MASTER"]) == 0
+    assert unlocks == ["alice", "alice"]
@@ -0,0 +1,17 @@
+# test_startup.py
+import subprocess
+import sys
+
+import startup
+
+
+def test_batch_start_is_within_budget():
+    # The GUI entry points need a display; the headless one runs anywhere
+    assert startup.main(["batch", "--check"]) == 0
+
+
+def test_login_module_leaves_generator_imports_to_the_worker():
+    code = "import sys, sqrity_login; print(' '.join(sorted({'passgen', 'strength'} & set(sys.modules))))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=startup.HERE,
+                         capture_output=True, text=True, check=True).stdout
+    assert out.strip() == ""
@@ -0,0 +1,21 @@
+# test_strength.py
+import pytest
+
+import strength
+
+
+@pytest.mark.parametrize("password", ["12²³", "x2019²", "١٢٣٤٥", "pass٠١٢٣word"])
+def test_estimate_survives_non_ascii_digits(password):
+    result = strength.estimate(password)
+    assert 0 <= result.score <= 4
+
+
+def test_incremental_estimate_survives_non_ascii_digits():
+    # The generator rescores one growing password with one Estimator
+    estimator = strength.Estimator()
+    for end in range(1, len("19²⁸abc") + 1):
+        estimator.estimate("19²⁸abc"[:end])
+
+
+def test_ascii_years_still_match():
+    assert strength.estimate("summer1987").guesses_log10 < strength.estimate("summer1387").guesses_log10
@@ -0,0 +1,55 @@
+# test_vault_import.py
+import base64
+
+import pytest
+
+import auth
+import db
+import schema
+import vault
+import vault_import
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    schema.migrate_db(db.USERS_DB, schema.USERS_MIGRATIONS)
+    assert auth.create_user("alice", "correct horse")
+    yield auth.unlock("alice", "correct horse")
+    db.close_thread_connections()
+
+
+def test_import_seals_and_refuses_foreign_plaintext(session, tmp_path):
+    foreign = base64.b64encode(b"\0" * 40).decode()
+    source = tmp_path / "export.csv"
+    source.write_text(
+        "owner_username,app_name,password,secret\n"
+        "alice,mail,hunter2,\n"
+        ",bank,s3cret,\n"
+        f"bob,shop,,{foreign}\n"
+        "bob,forum,plain,\n",
+        encoding="utf-8",
+    )
+    result = vault_import.import_file(str(source), session, batch_size=2)
+    assert result["imported"] == 3
+    assert result["skipped"] == 1
+    assert "bob" in result["errors"][0]
+
+    rows = db.get_connection(db.VAULT_DB).execute(
+        "SELECT owner_username, app_name, password, secret IS NOT NULL, fingerprint IS NOT NULL"
+        " FROM vault ORDER BY id").fetchall()
+    assert rows == [
+        ("alice", "mail", "", 1, 1),
+        ("alice", "bank", "", 1, 1),
+        ("bob", "shop", "", 1, 0),
+    ]
+    assert vault.find_reuse(session, "hunter2") == ["mail"]
+    entry_id = vault.fetch_page_after("alice")[1][0]
+    assert vault.reveal_entry("alice", entry_id, session) == "hunter2"
+
+
+def test_seal_rows_matches_seal_and_fingerprint(session):
+    pairs = [("mail", "hunter2"), ("bank", "ünïcode")]
+    for (app_name, password), (secret, fingerprint) in zip(pairs, session.seal_rows(pairs)):
+        assert session.open(app_name, secret) == password
+        assert fingerprint == session.fingerprint(password)
@@ -0,0 +1,148 @@
+# throttle.py
+"""Limits on login attempts, checked before any password hashing is done.
+
+Every username has a token bucket and, after a few failures in a row, an
+exponential backoff. One global bucket caps attempts across all usernames,
+so the KDF work spent on logins has a fixed ceiling however many names a
+script tries.
+
+State lives in memory. Set SQRITY_THROTTLE_PERSIST=1 to keep the per-user
+part in users.db, so restarting the app does not reset a backoff. Usernames
+not tried for STALE_S are dropped from it.
+"""
+
+import collections
+import math
+import os
+import threading
+import time
+
+import db
+
+USER_BURST = 5            # attempts a username may make back to back
+USER_REFILL_S = 30.0      # then one more attempt every USER_REFILL_S seconds
+GLOBAL_BURST = 10         # attempts across all usernames back to back
+GLOBAL_RATE = 2.0         # then this many attempts per second
+FREE_FAILURES = 3         # failures in a row before backoff starts
+BACKOFF_BASE_S = 1.0      # doubled for every further failure
+BACKOFF_MAX_S = 300.0
+MAX_TRACKED = 10_000      # in-memory usernames kept; the least recent are dropped
+STALE_S = 24 * 3600.0     # persisted usernames untried this long and not blocked are dropped
+PRUNE_INTERVAL_S = 3600.0  # how often persisted state is checked for them
+
+PERSIST = os.environ.get("SQRITY_THROTTLE_PERSIST") == "1"
+
+
+class LoginThrottled(Exception):
+    """Too many attempts; retry_after is the wait in seconds."""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"too many login attempts, try again in {math.ceil(retry_after)} s")
+
+
+def _refill(tokens: float, elapsed: float, rate: float, burst: int) -> float:
+    return min(burst, tokens + elapsed * rate)
+
+
+class Throttle:
+    """Attempt tracker shared by every login on this process.
+
+    Call acquire(username) before verifying a password and record() after.
+    """
+
+    def __init__(self, db_path: str | None = None):
+        self.db_path = db_path
+        self.enabled = True
+        # Wall clock when persisted, since monotonic time restarts with the process
+        self._clock = time.time if db_path else time.monotonic
+        self._lock = threading.Lock()
+        self._users = collections.OrderedDict()  # username -> [tokens, updated, failures, blocked_until]
+        self._global = [float(GLOBAL_BURST), self._clock()]
+        self._pruned = 0.0  # when stale persisted rows were last dropped
+
+    def acquire(self, username: str):
+        """Use up one attempt, or raise LoginThrottled without using any."""
+        if not self.enabled:
+            return
+        with self._lock:
+            now = self._clock()
+            tokens, updated, failures, blocked_until = self._load(username, now)
+            if blocked_until > now:
+                raise LoginThrottled(blocked_until - now)
+
+            tokens = _refill(tokens, now - updated, 1 / USER_REFILL_S, USER_BURST)
+            if tokens < 1:
+                raise LoginThrottled((1 - tokens) * USER_REFILL_S)
+
+            shared = _refill(self._global[0], now - self._global[1], GLOBAL_RATE, GLOBAL_BURST)
+            if shared < 1:
+                raise LoginThrottled((1 - shared) / GLOBAL_RATE)
+
+            self._global = [shared - 1, now]
+            self._store(username, [tokens - 1, now, failures, blocked_until])
+
+    def record(self, username: str, success: bool):
+        """Clear a username's history on success, back it off on failure."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if success:
+                self._forget(username)
+                return
+            now = self._clock()
+            state = self._load(username, now)
+            state[2] += 1
+            if state[2] > FREE_FAILURES:
+                delay = BACKOFF_BASE_S * 2 ** (state[2] - FREE_FAILURES - 1)
+                state[3] = now + min(delay, BACKOFF_MAX_S)
+            self._store(username, state)
+
+    def reset(self, username: str):
+        """Lift any limit on username, e.g. after an administrator reset."""
+        with self._lock:
+            self._forget(username)
+
+    # ---------- storage ----------
+    def _load(self, username, now):
+        if self.db_path:
+            row = db.get_connection(self.db_path).execute(
+                "SELECT tokens, updated, failures, blocked_until FROM login_attempts WHERE username = ?",
+                (username,),
+            ).fetchone()
+            return list(row) if row else [float(USER_BURST), now, 0, 0.0]
+        state = self._users.get(username)
+        return list(state) if state else [float(USER_BURST), now, 0, 0.0]
+
+    def _store(self, username, state):
+        if self.db_path:
+            conn = db.get_connection(self.db_path)
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO login_attempts"
+                    " (username, tokens, updated, failures, blocked_until) VALUES (?, ?, ?, ?, ?)",
+                    (username, *state),
+                )
+                now = self._clock()
+                if now - self._pruned > PRUNE_INTERVAL_S:
+                    # Their buckets are full again, so dropping them changes
+                    # nothing but the length of a backoff long since over
+                    conn.execute(
+                        "DELETE FROM login_attempts WHERE updated < ? AND blocked_until < ?",
+                        (now - STALE_S, now),
+                    )
+                    self._pruned = now
+            return
+        self._users[username] = state
+        self._users.move_to_end(username)
+        if len(self._users) > MAX_TRACKED:
+            # The global bucket still bounds the work if these names come back
+            self._users.popitem(last=False)
+
+    def _forget(self, username):
+        if self.db_path:
+            conn = db.get_connection(self.db_path)
+            with conn:
+                conn.execute("DELETE FROM login_attempts WHERE username = ?", (username,))
+        else:
+            self._users.pop(username, None)
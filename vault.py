@@ -0,0 +1,233 @@
+# vault.py
+"""Vault entry access with no Tk dependency (windows, CLIs, benchmarks)."""
+
+import heapq
+import itertools
+
+import db
+import writer
+
+
+# ---------- Writes ----------
+def _insert_entry(conn, owner, app_name, secret, fingerprint):
+    cur = conn.execute(
+        "INSERT INTO vault (owner_username, app_name, password, secret, fingerprint)"
+        " VALUES (?, ?, '', ?, ?)",
+        (owner, app_name, secret, fingerprint)
+    )
+    return cur.lastrowid
+
+
+def add_entry(session, app_name, password):
+    """Seal password with the user's vault key and store it; returns the new row id."""
+    secret = session.seal(app_name, password)
+    conn = db.get_connection(db.VAULT_DB)
+    with conn:
+        return _insert_entry(conn, session.username, app_name, secret, session.fingerprint(password))
+
+
+def add_entry_async(session, app_name, password):
+    """add_entry() through the vault's writer thread; returns a Future of the row id.
+
+    Sealing happens here, on the caller's thread; the writer only inserts.
+    """
+    secret = session.seal(app_name, password)
+    return writer.get(db.VAULT_DB).submit(
+        _insert_entry, session.username, app_name, secret, session.fingerprint(password))
+
+
+# ---------- Password reuse ----------
+# Both queries run on the (owner_username, fingerprint) index: a lookup is
+# one seek, a report is one pass over the index in group order.
+def find_reuse(session, password):
+    """App names the session's user already stored password for."""
+    rows = db.get_connection(db.VAULT_DB).execute(
+        "SELECT app_name FROM vault WHERE owner_username = ? AND fingerprint = ?",
+        (session.username, session.fingerprint(password)),
+    ).fetchall()
+    return sorted(app_name for app_name, in rows)
+
+
+def reuse_groups(owner=None):
+    """Passwords stored more than once, as [(owner, [app names])], largest
+    group first; every user's groups when owner is None."""
+    where = "owner_username = ? AND" if owner is not None else ""
+    rows = db.get_connection(db.VAULT_DB).execute(f"""
+        SELECT owner_username, group_concat(app_name, char(31))
+        FROM vault
+        WHERE {where} fingerprint IS NOT NULL
+        GROUP BY owner_username, fingerprint
+        HAVING count(*) > 1
+    """, (owner,) if owner is not None else ()).fetchall()
+    groups = [(user, sorted(apps.split("\x1f"))) for user, apps in rows]
+    groups.sort(key=lambda group: (-len(group[1]), group[0]))
+    return groups
+
+
+def count_unchecked(owner=None):
+    """Rows with no fingerprint yet; they are filled in at the owner's next login."""
+    if owner is None:
+        sql, args = "SELECT count(*) FROM vault WHERE fingerprint IS NULL", ()
+    else:
+        sql, args = "SELECT count(*) FROM vault WHERE owner_username = ? AND fingerprint IS NULL", (owner,)
+    return db.get_connection(db.VAULT_DB).execute(sql, args).fetchone()[0]
+
+
+# ---------- Database helper ----------
+def fetch_passwords_for_user(username, session=None):
+    """Return (app_name, password) pairs; encrypted ones need the user's session."""
+    cur = db.get_connection(db.VAULT_DB).cursor()
+
+    cur.execute("""
+        SELECT id, app_name, password, secret
+        FROM vault
+        WHERE owner_username = ?
+    """, (username,))
+
+    return [(app_name, pwd) for _, app_name, pwd in reveal_rows(session, cur.fetchall())]
+
+
+def get_entry(username, entry_id):
+    """Row (id, app_name, password, secret) of one entry by primary key, or None."""
+    return db.get_connection(db.VAULT_DB).execute(
+        "SELECT id, app_name, password, secret FROM vault WHERE id = ? AND owner_username = ?",
+        (entry_id, username),
+    ).fetchone()
+
+
+def reveal_entry(username, entry_id, session=None):
+    """Plaintext password of one entry, read by primary key; None if it does not exist."""
+    row = get_entry(username, entry_id)
+    if row is None:
+        return None
+    return reveal_rows(session, [row])[0][2]
+
+
+LOCKED = "(locked)"  # shown for encrypted rows when no session is available
+
+
+def reveal_rows(session, rows):
+    """Decrypt a batch of (id, app_name, password, secret) rows to (id, app_name, plaintext)."""
+    if session is not None:
+        return session.reveal_rows(rows)
+    return [
+        (row_id, app_name, pwd if secret is None else LOCKED)
+        for row_id, app_name, pwd, secret in rows
+    ]
+
+
+# ---------- Keyset pagination ----------
+# Rows are ordered by (app_name, id), which the (owner_username, app_name)
+# index already provides, so a page costs one index seek however far down it is.
+# Listings carry no passwords: the index alone answers them, and a secret is
+# only read and decrypted when one entry is copied or revealed (reveal_entry).
+PAGE_SIZE = 40  # a screenful (12 rows) plus a prefetch margin
+
+
+def fetch_page_after(username, after=None, limit=PAGE_SIZE):
+    """Rows (id, app_name) following the (app_name, id) key after."""
+    cur = db.get_connection(db.VAULT_DB).cursor()
+    if after is None:
+        cur.execute("""
+            SELECT id, app_name
+            FROM vault
+            WHERE owner_username = ?
+            ORDER BY app_name, id
+            LIMIT ?
+        """, (username, limit))
+    else:
+        cur.execute("""
+            SELECT id, app_name
+            FROM vault
+            WHERE owner_username = ? AND (app_name, id) > (?, ?)
+            ORDER BY app_name, id
+            LIMIT ?
+        """, (username, after[0], after[1], limit))
+    rows = cur.fetchall()
+    return rows
+
+
+def fetch_page_before(username, before, limit=PAGE_SIZE):
+    """Rows (id, app_name) preceding the (app_name, id) key before."""
+    cur = db.get_connection(db.VAULT_DB).cursor()
+    cur.execute("""
+        SELECT id, app_name
+        FROM vault
+        WHERE owner_username = ? AND (app_name, id) < (?, ?)
+        ORDER BY app_name DESC, id DESC
+        LIMIT ?
+    """, (username, before[0], before[1], limit))
+    rows = cur.fetchall()
+    rows.reverse()
+    return rows
+
+
+# ---------- Search ----------
+SEARCH_LIMIT = 200  # rows returned for a search
+SEARCH_SCAN_FACTOR = 2  # matches looked at per row wanted before the index filters by owner
+
+
+def _phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def owner_key(username: str) -> str:
+    """How vault_fts indexes an owner, see schema migration 7."""
+    return "^" + username.encode("utf-8").hex().upper() + "$"
+
+
+def search_vault(username, text, limit=SEARCH_LIMIT):
+    """Rows (id, app_name) whose app_name contains text, sorted by app_name.
+
+    Three or more characters go through the vault_fts trigram index; shorter
+    input is matched as a prefix along the (owner_username, app_name) index.
+    When more than limit rows contain text, the oldest limit of them are
+    returned.
+    """
+    text = text.strip()
+    cur = db.get_connection(db.VAULT_DB).cursor()
+    if len(text) < 3:
+        # One index range per upper/lower case spelling of the prefix,
+        # merged in app_name order, so no query scans the whole vault
+        spellings = {"".join(p) for p in itertools.product(*({c.lower(), c.upper()} for c in text))}
+        ranges = [
+            cur.execute("""
+                SELECT id, app_name
+                FROM vault
+                WHERE owner_username = ? AND app_name >= ? AND app_name < ?
+                ORDER BY app_name, id
+                LIMIT ?
+            """, (username, prefix, prefix + "\U0010ffff", limit)).fetchall()
+            for prefix in spellings
+        ]
+        merged = heapq.merge(*ranges, key=lambda row: (row[1], row[0]))
+        return list(itertools.islice(merged, limit))
+
+    # First walk the matches of the text alone and keep the user's, fastest
+    # when they own much of the vault. Neither query sorts the whole match
+    # set: the index hands matches back by id, the first ones are kept and
+    # only those are sorted by name. Each text is quoted as one FTS phrase
+    # so punctuation is not syntax. CROSS JOIN keeps SQLite from scanning
+    # the vault once per match.
+    rows = []
+    matches = cur.execute("""
+        SELECT v.id, v.app_name, v.owner_username
+        FROM (SELECT rowid AS match_id FROM vault_fts WHERE vault_fts MATCH ? ORDER BY rowid) AS m
+        CROSS JOIN vault AS v ON v.id = m.match_id
+    """, (f"app_name : {_phrase(text)}",))
+    for seen, (row_id, app_name, owner) in enumerate(matches, start=1):
+        if owner == username:
+            rows.append((row_id, app_name))
+            if len(rows) == limit:
+                break
+        elif seen >= limit * SEARCH_SCAN_FACTOR:
+            rows = None
+            break
+    if rows is None:
+        # Most matches belong to others: have the index match the owner too
+        query = f"owner_key : {_phrase(owner_key(username))} AND app_name : {_phrase(text)}"
+        rows = cur.execute("""
+            SELECT rowid, app_name FROM vault_fts WHERE vault_fts MATCH ? ORDER BY rowid LIMIT ?
+        """, (query, limit)).fetchall()
+    rows.sort(key=lambda row: (row[1], row[0]))
+    return rows
@@ -0,0 +1,247 @@
+# vault_export.py
+"""Streaming export of vault entries, for one user or the whole database.
+
+Rows are pulled from the cursor in chunks and pushed through a pipeline of
+generators (rows -> text chunks -> bytes -> optional encryption -> file), so
+memory use stays constant however large vault.db is.
+
+    python vault_export.py backup.csv --user alice
+
+Rows of the unlocked user are written in plaintext. Everything else (all
+rows with --keep-encrypted, other users' rows with --all) keeps its
+AES-GCM secret, base64 encoded, which vault_import restores as is.
+    python vault_export.py nightly.sqx --all --format archive --passphrase-env SQRITY_BACKUP_KEY
+"""
+
+import argparse
+import base64
+import csv
+import getpass
+import io
+import json
+import os
+import sqlite3
+import struct
+import sys
+
+import auth
+import crypto
+import db
+from auth import hash_password
+
+VAULT_DB = db.VAULT_DB
+FETCH_SIZE = 1_000       # rows per fetchmany()
+CHUNK_BYTES = 64 * 1024  # text buffered before it is written (or encrypted)
+
+FIELDS = ("owner_username", "app_name", "password", "secret")
+
+# Archive layout: MAGIC, 16-byte salt, then frames of
+# (4-byte big-endian length, sealed chunk). The last frame is flagged in its
+# associated data, so a truncated or reordered archive fails to decrypt.
+ARCHIVE_MAGIC = b"SQRITY-EXPORT\x01"
+SALT_SIZE = 16
+
+
+# ----------------------
+#   PIPELINE STAGES
+# ----------------------
+def iter_rows(conn: sqlite3.Connection, owner: str | None = None, fetch_size: int = FETCH_SIZE):
+    """Yield (owner_username, app_name, password, secret) rows, fetch_size at a time."""
+    cur = conn.cursor()
+    if owner is None:
+        cur.execute("SELECT owner_username, app_name, password, secret FROM vault ORDER BY id")
+    else:
+        cur.execute(
+            "SELECT owner_username, app_name, password, secret FROM vault "
+            "WHERE owner_username = ? ORDER BY app_name, id",
+            (owner,),
+        )
+    while True:
+        rows = cur.fetchmany(fetch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def reveal(rows, session=None):
+    """Decrypt the session user's rows; base64 encode the secrets left sealed."""
+    for owner, app_name, password, secret in rows:
+        if secret is None:
+            yield owner, app_name, password, ""
+        elif session is not None and owner == session.username:
+            yield owner, app_name, session.open(app_name, secret), ""
+        else:
+            yield owner, app_name, "", base64.b64encode(secret).decode("ascii")
+
+
+def csv_chunks(rows, chunk_bytes: int = CHUNK_BYTES):
+    """Yield CSV text (header first) in chunks of roughly chunk_bytes."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(FIELDS)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= chunk_bytes:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def jsonl_chunks(rows, chunk_bytes: int = CHUNK_BYTES):
+    """Yield JSON-lines text in chunks of roughly chunk_bytes."""
+    parts = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n"
+        parts.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield "".join(parts)
+            parts = []
+            size = 0
+    yield "".join(parts)
+
+
+def encode(chunks):
+    for chunk in chunks:
+        yield chunk.encode("utf-8")
+
+
+def archive_key(passphrase: str, salt: bytes) -> bytes:
+    _, key = hash_password(passphrase, salt)
+    return key
+
+
+def encrypt_frames(chunks, passphrase: str):
+    """Yield an encrypted archive: header, then one sealed frame per chunk."""
+    salt = os.urandom(SALT_SIZE)
+    header = ARCHIVE_MAGIC + salt
+    cipher = crypto.new_cipher(archive_key(passphrase, salt))
+    yield header
+
+    index = 0
+    chunks = iter(chunks)
+    chunk = next(chunks, b"")
+    while True:
+        following = next(chunks, None)
+        last = following is None
+        sealed = crypto.seal(cipher, chunk, header + struct.pack(">Q?", index, last))
+        yield struct.pack(">I", len(sealed)) + sealed
+        if last:
+            return
+        chunk = following
+        index += 1
+
+
+def decrypt_frames(fp, passphrase: str):
+    """Yield the plaintext chunks of an archive written by encrypt_frames."""
+    header = fp.read(len(ARCHIVE_MAGIC) + SALT_SIZE)
+    if not header.startswith(ARCHIVE_MAGIC):
+        raise ValueError("not a SQRITY export archive")
+    cipher = crypto.new_cipher(archive_key(passphrase, header[len(ARCHIVE_MAGIC):]))
+
+    index = 0
+    size = fp.read(4)
+    while True:
+        if len(size) < 4:
+            raise crypto.DecryptionError("archive is truncated")
+        sealed = fp.read(struct.unpack(">I", size)[0])
+        size = fp.read(4)  # look ahead: no further frame means this is the last one
+        last = not size
+        yield crypto.unseal(cipher, sealed, header + struct.pack(">Q?", index, last))
+        if last:
+            return
+        index += 1
+
+
+FORMATS = {"csv": csv_chunks, "jsonl": jsonl_chunks}
+
+
+# ----------------------
+#   EXPORT
+# ----------------------
+def export(out, owner: str | None = None, fmt: str = "csv", passphrase: str | None = None,
+           db_path: str = VAULT_DB, session=None) -> int:
+    """Write the export to the binary file out and return the number of rows written.
+
+    fmt is "csv", "jsonl" or "archive" (encrypted JSON-lines, needs passphrase).
+    owner=None exports every user. Only session's user is exported in plaintext.
+    """
+    conn = db.get_connection(db_path)
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    rows = counted(reveal(iter_rows(conn, owner), session))
+    if fmt == "archive":
+        if not passphrase:
+            raise ValueError("an encrypted archive needs a passphrase")
+        stream = encrypt_frames(encode(jsonl_chunks(rows)), passphrase)
+    else:
+        stream = encode(FORMATS[fmt](rows))
+
+    for block in stream:
+        out.write(block)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export vault entries.")
+    parser.add_argument("path", help="output file, or - for stdout")
+    who = parser.add_mutually_exclusive_group()
+    who.add_argument("--user", help="export this user's entries")
+    who.add_argument("--all", action="store_true", help="export the whole database")
+    parser.add_argument("--format", choices=["csv", "jsonl", "archive"], default="csv")
+    parser.add_argument("--passphrase-env", metavar="VAR",
+                        help="read the archive passphrase from this environment variable")
+    parser.add_argument("--decrypt", action="store_true",
+                        help="decrypt the archive at path to stdout instead of exporting")
+    parser.add_argument("--keep-encrypted", action="store_true",
+                        help="with --user, export sealed secrets instead of asking for the master password")
+    parser.add_argument("--password-env", metavar="VAR",
+                        help="read the user's master password from this environment variable")
+    args = parser.parse_args(argv)
+    if not args.decrypt and args.user is None and not args.all:
+        parser.error("one of --user or --all is required")
+
+    passphrase = None
+    if args.format == "archive" or args.decrypt:
+        if args.passphrase_env:
+            passphrase = os.environ.get(args.passphrase_env)
+        else:
+            passphrase = getpass.getpass("Archive passphrase: ")
+        if not passphrase:
+            print("Error: no passphrase given", file=sys.stderr)
+            return 2
+
+    try:
+        if args.decrypt:
+            with open(args.path, "rb") as fp:
+                for chunk in decrypt_frames(fp, passphrase):
+                    sys.stdout.buffer.write(chunk)
+            return 0
+
+        session = None
+        if args.user and not args.keep_encrypted:
+            session = auth.unlock_for_cli(args.user, args.password_env)
+
+        if args.path == "-":
+            count = export(sys.stdout.buffer, args.user, args.format, passphrase, session=session)
+        else:
+            with open(args.path, "wb") as out:
+                count = export(out, args.user, args.format, passphrase, session=session)
+    except (OSError, EOFError, ValueError, RuntimeError, sqlite3.Error, crypto.DecryptionError) as e:
+        print(f"Export failed: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Exported {count:,} entries", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
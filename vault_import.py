@@ -0,0 +1,263 @@
+# vault_import.py
+"""Bulk import of vault entries from a CSV or JSON export.
+
+The source is streamed and validated row by row, and valid rows are written
+with executemany in large transactions. Each transaction also records how far
+into the file it got, so an interrupted import resumes where it stopped.
+
+Every password is sealed under the owner's session before it is written,
+so the owner's master password is needed; an entry of another user is only
+accepted with the ciphertext vault_export wrote for it.
+
+A 200k-row CSV imports at about 26k rows/s on a single-core test machine,
+short of the 50k rows/s target. Sealing, fingerprinting and parsing take
+about 2s of the 7.5s; SQLite takes the rest to write the rows, their two
+indexes and the search index, which alone stays under 40k rows/s.
+
+    python vault_import.py export.csv --owner alice
+"""
+
+import argparse
+import base64
+import binascii
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import auth
+import db
+import schema
+
+VAULT_DB = db.VAULT_DB
+BATCH_SIZE = 20_000  # rows per transaction
+HASH_BLOCK = 1 << 20  # bytes read at a time when fingerprinting a source file
+
+# Column names used by common password manager exports, in order of preference
+APP_FIELDS = ("app_name", "name", "title", "url")
+PASSWORD_FIELDS = ("password",)
+OWNER_FIELDS = ("owner_username",)
+SECRET_FIELDS = ("secret",)  # base64 ciphertext written by vault_export
+
+INSERT_SQL = ("INSERT INTO vault (owner_username, app_name, password, secret, fingerprint)"
+              " VALUES (?, ?, ?, ?, ?)")
+
+
+# ----------------------
+#   READERS
+# ----------------------
+def iter_csv(fp):
+    """Yield one dict per CSV row, keyed by the header line."""
+    yield from csv.DictReader(fp)
+
+
+def iter_json(fp, chunk_size: int = 1 << 16):
+    """Yield the objects of a JSON array or a JSON-lines file without loading it whole."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    while True:
+        # Skip whitespace and the array punctuation between objects
+        while pos < len(buf) and buf[pos] in " \t\r\n,[]":
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                return
+            buf, pos = fp.read(chunk_size), 0
+            eof = not buf
+            continue
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = fp.read(chunk_size)
+            eof = not more
+            buf, pos = buf[pos:] + more, 0
+            continue
+        yield obj
+        pos = end
+
+
+READERS = {"csv": iter_csv, "json": iter_json, "jsonl": iter_json}
+
+
+# ----------------------
+#   VALIDATION
+# ----------------------
+def _first(record: dict, fields):
+    for field in fields:
+        value = record.get(field)
+        if value:
+            return value
+    return None
+
+
+def to_row(record, owner: str):
+    """Check one source record and return (owner, app_name, password, secret),
+    or raise ValueError.
+
+    secret is the base64-decoded ciphertext of a vault_export file, stored
+    as is, whoever owns the row. A password is sealed under owner's session
+    before it is stored, so a plaintext password of any other owner is
+    refused rather than stored as plaintext.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("entry is not an object")
+
+    row_owner = _first(record, OWNER_FIELDS) or owner
+    app_name = _first(record, APP_FIELDS)
+    if not isinstance(app_name, str) or not app_name.strip():
+        raise ValueError("missing application name")
+    app_name = app_name.strip()
+
+    secret = _first(record, SECRET_FIELDS)
+    if secret:
+        try:
+            return row_owner, app_name, "", base64.b64decode(secret, validate=True)
+        except (binascii.Error, TypeError) as e:
+            raise ValueError("secret is not valid base64") from e
+    if row_owner != owner:
+        raise ValueError(f"unencrypted entry of {row_owner}; import it with --owner {row_owner}")
+    password = _first(record, PASSWORD_FIELDS)
+    if not isinstance(password, str):
+        raise ValueError("missing password")
+    return row_owner, app_name, password, None
+
+
+# ----------------------
+#   IMPORT
+# ----------------------
+def source_key(path: str, owner: str | None = None) -> str:
+    """Identify an import for resuming: the same file, unchanged, for the same owner."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        while block := fp.read(HASH_BLOCK):
+            digest.update(block)
+    return f"{owner or ''}:{os.path.abspath(path)}:{digest.hexdigest()}"
+
+
+def import_file(path: str, session, fmt: str | None = None,
+                batch_size: int = BATCH_SIZE, progress=None, restart: bool = False,
+                db_path: str = VAULT_DB) -> dict:
+    """Import path into the vault of session's user and return counts of
+    what happened. Passwords are sealed and fingerprinted a batch at a time.
+
+    progress(rows_read, rows_imported) is called after every committed batch.
+    Unless restart is set, rows already committed by an earlier run of the
+    same file are skipped.
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in READERS:
+        raise ValueError(f"unknown import format: {fmt!r}")
+
+    schema.migrate_db(db_path, schema.VAULT_MIGRATIONS)
+    owner = session.username
+    key = source_key(path, owner)
+    result = {"read": 0, "imported": 0, "skipped": 0, "resumed_from": 0, "errors": []}
+
+    conn = db.get_connection(db_path)
+    try:
+        done = None if restart else conn.execute(
+            "SELECT rows_done, finished FROM import_progress WHERE source = ?", (key,)
+        ).fetchone()
+        if done and done[1]:
+            result["resumed_from"] = result["read"] = done[0]
+            return result
+        skip = done[0] if done else 0
+        result["resumed_from"] = skip
+
+        def commit(batch, finished=False):
+            # Seal the whole batch in one call, secrets from an export as they are
+            sealed = iter(session.seal_rows(
+                [(app_name, password) for _, app_name, password, secret in batch if secret is None]))
+            rows = [(row_owner, app_name, "") + (next(sealed) if secret is None else (secret, None))
+                    for row_owner, app_name, _, secret in batch]
+            # IMMEDIATE takes the write lock before max(id) is read, so no other
+            # writer can slip in between and turn the commit into SQLITE_BUSY
+            conn.execute("BEGIN IMMEDIATE")
+            # Index the whole batch for search at once, see schema migration 5
+            last_id = conn.execute("SELECT coalesce(max(id), 0) FROM vault").fetchone()[0]
+            conn.execute("INSERT INTO vault_fts_pause (active) VALUES (1)")
+            conn.executemany(INSERT_SQL, rows)
+            conn.execute("DELETE FROM vault_fts_pause")
+            conn.execute(
+                "INSERT INTO vault_fts (rowid, owner_key, app_name)"
+                    " SELECT id, owner_key, app_name FROM vault_fts_source WHERE id > ?",
+                (last_id,),
+            )
+            conn.execute(schema.LOG_BULK_INSERT, (last_id + 1, last_id + 1))
+            conn.execute(
+                "INSERT OR REPLACE INTO import_progress (source, rows_done, finished) VALUES (?, ?, ?)",
+                (key, result["read"], int(finished)),
+            )
+            conn.commit()
+            result["imported"] += len(rows)
+            if progress is not None:
+                progress(result["read"], result["imported"])
+
+        with open(path, newline="", encoding="utf-8-sig") as fp:
+            batch = []
+            for number, record in enumerate(READERS[fmt](fp), start=1):
+                if number <= skip:
+                    continue
+                result["read"] = number
+                try:
+                    batch.append(to_row(record, owner))
+                except ValueError as e:
+                    result["skipped"] += 1
+                    if len(result["errors"]) < 100:
+                        result["errors"].append(f"entry {number}: {e}")
+                if len(batch) >= batch_size:
+                    commit(batch)
+                    batch = []
+            result["read"] = max(result["read"], skip)
+            commit(batch, finished=True)
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import vault entries from a CSV or JSON export.")
+    parser.add_argument("path")
+    parser.add_argument("--owner", required=True,
+                        help="user whose passwords are imported; other owners' entries need their secret")
+    parser.add_argument("--format", choices=sorted(READERS), help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true", help="ignore the saved resume point")
+    parser.add_argument("--password-env", metavar="VAR",
+                        help="read the owner's master password from this environment variable")
+    args = parser.parse_args(argv)
+
+    def report(read, imported):
+        print(f"\r{read:,} read, {imported:,} imported", end="", file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    try:
+        # Unlock the owner's vault once so their rows go in encrypted
+        session = auth.unlock_for_cli(args.owner, args.password_env)
+        result = import_file(args.path, session, args.format, args.batch_size,
+                             report, args.restart)
+    except (OSError, EOFError, ValueError, RuntimeError, sqlite3.Error) as e:
+        print(f"\nImport failed: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+
+    print(file=sys.stderr)
+    for error in result["errors"]:
+        print(error, file=sys.stderr)
+    rate = result["imported"] / elapsed if elapsed else 0
+    print(f"Imported {result['imported']:,} entries ({result['skipped']:,} skipped, "
+          f"resumed after {result['resumed_from']:,}) in {elapsed:.2f}s, {rate:,.0f} rows/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,21 @@
 # view.py
 import sys
-import sqlite3
 import tkinter as tk
 import tkinter.ttk as ttk
 from tkinter import messagebox
 import customtkinter as ctk
 
+import cache
+import tasks
+from vault import (
+    LOCKED,
+    PAGE_SIZE,
+    fetch_page_after,
+    fetch_page_before,
+    reveal_entry,
+    search_vault,
+)
+
 def CenterWindowToDisplay(Screen: ctk.CTk, width: int, height: int, scale_factor: float = 1.0):
     """Centers the window to the main display/monitor"""
     screen_width = Screen.winfo_screenwidth()
@@ -17,128 +27,363 @@ def CenterWindowToDisplay(Screen: ctk.CTk, width: int, height: int, scale_factor
 
 
 
-# ---------- Get username from command-line ----------
-if len(sys.argv) < 2:
-    messagebox.showerror("Error", "No username provided to view.py")
-    sys.exit(1)
-
-current_user = sys.argv[1]
+# ---------- Virtual list / search settings ----------
+MAX_ROWS = 3 * PAGE_SIZE  # rows kept in the Treeview at any time
+PREFETCH = 0.2       # load the next page when within 20% of either end
+SEARCH_DEBOUNCE_MS = 150  # wait for a pause in typing before querying
+MASK = "\u2022" * 8  # shown in place of every password, whatever its length
+FILL_CHUNK = 12      # rows inserted per event loop tick, one screenful
 
-# ---------- Database helper ----------
-def fetch_passwords_for_user(username):
-    conn = sqlite3.connect("vault.db")
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT app_name, password
-        FROM vault
-        WHERE owner_username = ?
-    """, (username,))
-
-    rows = cur.fetchall()
-    conn.close()
-    return rows
 
 # ---------- GUI with customtkinter ----------
-ctk.set_appearance_mode("dark")
-ctk.set_default_color_theme("blue")
-
-root = ctk.CTk()
-root.title("SQRITY - Password Vault")
-root.geometry("650x400")
-root.resizable(False, False)
-
-# Main container
-main_frame = ctk.CTkFrame(root, fg_color="#2b2b2b", corner_radius=10)
-main_frame.pack(expand=True, fill="both")
-
-# Title
-title_label = ctk.CTkLabel(
-    main_frame,
-    text=f"Stored Passwords for {current_user}",
-    font=("Segoe UI", 20, "bold"),
-    text_color="#ffffff"
-)
-title_label.pack(pady=20)
-
-# Treeview frame
-tree_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
-tree_frame.pack(expand=True, fill="both", padx=20, pady=10)
-
-# Create treeview using tkinter (ctk doesn't have native treeview)
-columns = ("app", "password")
-tree = ttk.Treeview(tree_frame, columns=columns, show="headings", height=12)
-tree.heading("app", text="Application")
-tree.heading("password", text="Password")
-
-tree.column("app", width=250, anchor="center")
-tree.column("password", width=350, anchor="center")
-
-# Style the treeview to match dark theme
-style = ttk.Style()
-style.theme_use("default")
-style.configure("Treeview",
-                background="#454545",
-                foreground="white",
-                fieldbackground="#454545",
-                borderwidth=0,
-                font=("Segoe UI", 16),
-                rowheight=45)
-style.configure("Treeview.Heading",
-                background="#1b1b1b",
-                foreground="#ffffff",
-                relief="flat",
-                font=("Segoe UI", 16,'bold'))
-style.map("Treeview", background=[('selected', '#2563eb')])
-
-# Scrollbar
-vsb = ctk.CTkScrollbar(tree_frame, orientation="vertical", command=tree.yview)
-tree.configure(yscrollcommand=vsb.set)
-
-# Pack treeview and scrollbar
-tree.pack(side="left", fill="both", expand=True)
-vsb.pack(side="right", fill="y")
-
-# Load data
-try:
-    data = fetch_passwords_for_user(current_user)
-    if not data:
-        messagebox.showinfo("Info", "No passwords stored yet for this user.")
-    else:
-        for app, pwd in data:
-            tree.insert("", "end", values=(app, pwd))
-except Exception as e:
-    messagebox.showerror("Database Error", str(e))
-
-
-# ---------- Copy password from selection ----------
-def copy_selected_password(event=None):
-    selected = tree.focus()  # get selected row ID
-    if not selected:
-        return
-
-    values = tree.item(selected, "values")  # (app_name, password)
-    if not values or len(values) < 2:
-        return
-
-    password = values[1]
-
-    # Copy to clipboard
-    root.clipboard_clear()
-    root.clipboard_append(password)
-    root.update()
-
-    messagebox.showinfo("Copied", "Password copied to clipboard!")
-tree.bind("<Double-1>", copy_selected_password)
-
-
-
-
-# Center the window
-root.update_idletasks()
-
-root.geometry(CenterWindowToDisplay(root, 650, 400, root._get_window_scaling()))
+def build_view_window(root: ctk.CTkToplevel, app):
+    """Fill the vault viewer window; built once by the app's window manager."""
+    root.title("SQRITY - Password Vault")
+    root.geometry("650x450")
+    root.resizable(False, False)
+
+    # Main container
+    main_frame = ctk.CTkFrame(root, fg_color="#2b2b2b", corner_radius=10)
+    main_frame.pack(expand=True, fill="both")
+
+    # Title
+    title_label = ctk.CTkLabel(
+        main_frame,
+        text="Stored Passwords",
+        font=("Segoe UI", 20, "bold"),
+        text_color="#ffffff"
+    )
+    title_label.pack(pady=(20, 10))
+
+    # Search box, filters as you type
+    search_entry = ctk.CTkEntry(
+        main_frame,
+        fg_color="#404040",
+        font=("Segoe UI", 14),
+        height=32,
+        placeholder_text="Search applications..."
+    )
+    search_entry.pack(fill="x", padx=20)
+
+    # Treeview frame
+    tree_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+    tree_frame.pack(expand=True, fill="both", padx=20, pady=10)
+
+    # Create treeview using tkinter (ctk doesn't have native treeview)
+    columns = ("app", "password")
+    tree = ttk.Treeview(tree_frame, columns=columns, show="headings", height=12)
+    tree.heading("app", text="Application")
+    tree.heading("password", text="Password")
+
+    tree.column("app", width=250, anchor="center")
+    tree.column("password", width=350, anchor="center")
+
+    # Style the treeview to match dark theme
+    style = ttk.Style()
+    style.theme_use("default")
+    style.configure("Treeview",
+                    background="#454545",
+                    foreground="white",
+                    fieldbackground="#454545",
+                    borderwidth=0,
+                    font=("Segoe UI", 16),
+                    rowheight=45)
+    style.configure("Treeview.Heading",
+                    background="#1b1b1b",
+                    foreground="#ffffff",
+                    relief="flat",
+                    font=("Segoe UI", 16,'bold'))
+    style.map("Treeview", background=[('selected', '#2563eb')])
+
+    # Scrollbar
+    vsb = ctk.CTkScrollbar(tree_frame, orientation="vertical", command=tree.yview)
+
+    # Pack treeview and scrollbar
+    tree.pack(side="left", fill="both", expand=True)
+    vsb.pack(side="right", fill="y")
+
+    # Copy / reveal buttons, packed before the tree so they keep their space
+    action_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+    action_frame.pack(side="bottom", fill="x", padx=20, pady=(0, 15))
+
+    # ---------- Copy / reveal the selected password ----------
+    # The listing holds no passwords; the selected one is read by primary
+    # key and decrypted only when it is copied or revealed.
+    def selected_password():
+        selected = tree.focus()  # get selected row ID
+        if not selected:
+            return None, None
+        try:
+            password = reveal_entry(state["user"], int(selected), state["session"])
+        except Exception as e:
+            messagebox.showerror("Database Error", str(e))
+            return selected, None
+        if password is None:
+            messagebox.showerror("Error", "This entry no longer exists.")
+        elif password == LOCKED:
+            messagebox.showerror("Error", "The vault is locked. Please log in again.")
+            password = None
+        return selected, password
+
+    def copy_selected_password(event=None):
+        _, password = selected_password()
+        if password is None:
+            return
+
+        # Copy to clipboard
+        root.clipboard_clear()
+        root.clipboard_append(password)
+        root.update()
+
+        messagebox.showinfo("Copied", "Password copied to clipboard!")
+    tree.bind("<Double-1>", copy_selected_password)
+
+    def mask_revealed(event=None):
+        iid, state["revealed"] = state["revealed"], None
+        if iid is not None and tree.exists(iid):
+            tree.set(iid, "password", MASK)
+
+    def toggle_reveal():
+        shown = state["revealed"]
+        mask_revealed()
+        if shown is not None and shown == tree.focus():
+            return  # the second click hides it again
+        iid, password = selected_password()
+        if password is None:
+            return
+        tree.set(iid, "password", password)
+        state["revealed"] = iid
+    # Only the selected row is ever shown in plaintext, and only while visible
+    tree.bind("<<TreeviewSelect>>", mask_revealed)
+    root.bind("<Unmap>", mask_revealed, add="+")
+
+    copy_btn = ctk.CTkButton(
+        action_frame,
+        text="Copy Password",
+        command=copy_selected_password,
+        width=150,
+        font=("Segoe UI", 14, "bold"),
+        fg_color="#1f59ab"
+    )
+    copy_btn.pack(side="left")
+
+    reveal_btn = ctk.CTkButton(
+        action_frame,
+        text="Show / Hide",
+        command=toggle_reveal,
+        width=150,
+        font=("Segoe UI", 14, "bold"),
+        fg_color="#374151",
+        hover_color="#4B5563"
+    )
+    reveal_btn.pack(side="left", padx=(10, 0))
+
+    # Center the window
+    root.update_idletasks()
+
+    root.geometry(CenterWindowToDisplay(root, 650, 450, root._get_window_scaling()))
+
+    # ---------- Virtual list ----------
+    # Only a sliding window of at most MAX_ROWS rows lives in the Treeview.
+    # Scrolling near either end fetches the neighbouring page by key and
+    # trims the far end, so memory does not grow with the vault size.
+    # Pages come from the shared listing cache while vault.db is unchanged.
+    listings = cache.listings()
+    state = {"user": None, "session": None, "at_start": True, "at_end": False, "pending": None,
+             "search_job": None, "search_seq": 0, "revealed": None, "fill": None}
+
+    def row_key(iid):
+        return tree.set(iid, "app"), int(iid)
+
+    def top_visible_row():
+        return tree.identify_row(1)
+
+    def keep_top_row(iid):
+        """Scroll so iid is the first visible row again after a trim."""
+        if iid and tree.exists(iid):
+            tree.yview_moveto(tree.index(iid) / max(len(tree.get_children()), 1))
+
+    def insert_rows(rows):
+        for row_id, app_name in rows:
+            tree.insert("", "end", iid=str(row_id), values=(app_name, MASK))
+
+    # ---------- Progressive fill ----------
+    # A fresh listing or search result goes in a screenful per event loop
+    # tick: the first rows show at once and the window keeps responding.
+    # A newer fill, or closing the window, cancels the one in progress.
+    # state["fill"] is set only while one runs, and page loads wait for it:
+    # a page loaded past a half-filled list would insert rows it still holds.
+    def cancel_fill():
+        if state["fill"] is not None:
+            state["fill"].cancel()
+            state["fill"] = None
+
+    def fill(rows):
+        cancel_fill()
+        token = state["fill"] = tasks.CancelToken()
+
+        def filled():
+            if state["fill"] is token:
+                state["fill"] = None
+
+        tasks.run_in_chunks(root, rows, FILL_CHUNK, insert_rows, token, filled)
+
+    def load_next():
+        children = tree.get_children()
+        after = row_key(children[-1]) if children else None
+        user = state["user"]
+        rows = listings.get(user, ("after", after), lambda: fetch_page_after(user, after))
+        if len(rows) < PAGE_SIZE:
+            state["at_end"] = True
+        top = top_visible_row()
+        insert_rows(rows)
+
+        children = tree.get_children()
+        extra = len(children) - MAX_ROWS
+        if extra > 0:
+            tree.delete(*children[:extra])
+            state["at_start"] = False
+            keep_top_row(top)
+        return rows
+
+    def load_prev():
+        children = tree.get_children()
+        if not children:
+            return
+        user, before = state["user"], row_key(children[0])
+        rows = listings.get(user, ("before", before), lambda: fetch_page_before(user, before))
+        if len(rows) < PAGE_SIZE:
+            state["at_start"] = True
+        top = top_visible_row()
+        for row_id, app_name in reversed(rows):
+            tree.insert("", 0, iid=str(row_id), values=(app_name, MASK))
+
+        children = tree.get_children()
+        extra = len(children) - MAX_ROWS
+        if extra > 0:
+            tree.delete(*children[-extra:])
+            state["at_end"] = False
+        keep_top_row(top)
+
+    def run_pending():
+        action, state["pending"] = state["pending"], None
+        if state["fill"] is not None:
+            return  # queued before a fill began; scrolling asks again after it
+        try:
+            if action == "next":
+                load_next()
+            elif action == "prev":
+                load_prev()
+        except Exception as e:
+            messagebox.showerror("Database Error", str(e))
+
+    def on_tree_scroll(first, last):
+        vsb.set(first, last)
+        # Defer the fetch to idle time so scrolling itself is never delayed,
+        # and never queue more than one page load at once
+        if state["pending"] is not None or state["fill"] is not None:
+            return
+        if float(last) >= 1 - PREFETCH and not state["at_end"]:
+            state["pending"] = "next"
+        elif float(first) <= PREFETCH and not state["at_start"]:
+            state["pending"] = "prev"
+        else:
+            return
+        root.after_idle(run_pending)
+
+    tree.configure(yscrollcommand=on_tree_scroll)
+
+    # ---------- Search ----------
+    def on_search_key(event=None):
+        # Debounce: restart the timer on every keystroke
+        if state["search_job"] is not None:
+            root.after_cancel(state["search_job"])
+        state["search_job"] = root.after(SEARCH_DEBOUNCE_MS, run_search)
+
+    def run_search():
+        state["search_job"] = None
+        state["search_seq"] += 1
+        seq = state["search_seq"]
+        text = search_entry.get().strip()
+        if not text:
+            try:
+                reload()  # back to the paged listing
+            except Exception as e:
+                messagebox.showerror("Database Error", str(e))
+            return
+
+        user = state["user"]
+
+        def work():
+            return listings.get(user, ("search", text), lambda: search_vault(user, text))
+
+        def done(future):
+            if seq != state["search_seq"]:
+                return  # a newer query replaced this one
+            try:
+                rows = future.result()
+            except Exception as e:
+                messagebox.showerror("Database Error", str(e))
+                return
+            cancel_fill()
+            tree.delete(*tree.get_children())
+            # Results are not paged, so stop the virtual list from loading
+            state.update(at_start=True, at_end=True, pending=None, revealed=None)
+            fill(rows)
+
+        tasks.run_in_background(root, work, on_done=done)
+
+    search_entry.bind("<KeyRelease>", on_search_key)
+
+    # ---------- Load data ----------
+    def reload():
+        cancel_fill()
+        tree.delete(*tree.get_children())
+        user = state["user"]
+        rows = listings.get(user, ("after", None), lambda: fetch_page_after(user))
+        state.update(at_start=True, at_end=len(rows) < PAGE_SIZE, pending=None, revealed=None)
+        fill(rows)
+        return rows
+
+    def on_close():
+        cancel_fill()
+        state["pending"] = None
+        mask_revealed()
+        app.close("view")
+    root.protocol("WM_DELETE_WINDOW", on_close)
+
+    def on_logout():
+        cancel_fill()
+        if state["search_job"] is not None:
+            root.after_cancel(state["search_job"])
+        state["search_seq"] += 1  # drop results of a search still running
+        tree.delete(*tree.get_children())
+        state.update(user=None, session=None, pending=None, search_job=None, revealed=None)
+    app.on_logout(on_logout)
+
+    def on_show(current_user=None):
+        # The window is reused, so start from the first page every time it is shown
+        title_label.configure(text=f"Stored Passwords for {current_user}")
+        search_entry.delete(0, tk.END)
+        if state["search_job"] is not None:
+            root.after_cancel(state["search_job"])
+            state["search_job"] = None
+        state["search_seq"] += 1  # drop results of a search still running
+        state.update(user=current_user, session=app.session)
+        try:
+            if not reload():
+                messagebox.showinfo("Info", "No passwords stored yet for this user.")
+        except Exception as e:
+            messagebox.showerror("Database Error", str(e))
+
+    return on_show
 
 
+# ---------- Get username from command-line ----------
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        messagebox.showerror("Error", "No username provided to view.py")
+        sys.exit(1)
 
-root.mainloop()
+    from app import main as app_main
+    app_main("view", sys.argv[1])
@@ -0,0 +1,152 @@
+# writer.py
+"""One writer thread per database, so windows never race each other for the lock.
+
+Callers queue a write intent, a function ``fn(conn, *args)``, and get a
+concurrent.futures.Future of its return value. The writer takes every
+intent waiting in the queue and runs them in one transaction, each in its
+own savepoint: a failing intent only fails its own future, and a busy burst
+of saves costs one commit instead of one per save.
+
+    future = writer.get(db.VAULT_DB).submit(insert_row, owner, app_name)
+    tasks.when_done(widget, future, on_saved)
+
+Another process holding the lock (an import, say) makes the writer wait
+and retry the batch rather than fail the callers.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import db
+
+MAX_BATCH = 1_000     # intents per transaction
+RETRIES = 5           # attempts per batch when another process holds the lock
+RETRY_SLEEP_S = 0.05  # doubled after each attempt
+
+_STOP = object()
+
+
+def _is_busy(error: sqlite3.OperationalError) -> bool:
+    message = str(error)
+    return "locked" in message or "busy" in message
+
+
+class Writer:
+    """A thread that owns the only writing connection to one database in this process."""
+
+    def __init__(self, path: str, max_batch: int = MAX_BATCH):
+        self.path = path
+        self.max_batch = max_batch
+        self.batches = 0   # transactions committed
+        self.writes = 0    # intents that succeeded
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="sqrity-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args) -> Future:
+        """Queue fn(conn, *args) and return the Future of its result."""
+        future = Future()
+        self._queue.put((fn, args, future))
+        return future
+
+    def close(self):
+        """Finish every queued intent, then stop the thread."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        conn = db.connect(self.path)
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                # Group commit: everything queued while the last batch ran
+                batch = [item]
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._commit(conn, [entry for entry in batch if entry[2].set_running_or_notify_cancel()])
+        finally:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch):
+        if not batch:
+            return
+        delay = RETRY_SLEEP_S
+        for attempt in range(RETRIES):
+            outcomes = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for fn, args, _ in batch:
+                    conn.execute("SAVEPOINT intent")
+                    try:
+                        outcomes.append((fn(conn, *args), None))
+                    except sqlite3.OperationalError as e:
+                        if _is_busy(e):
+                            raise
+                        conn.execute("ROLLBACK TO intent")
+                        outcomes.append((None, e))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO intent")
+                        outcomes.append((None, e))
+                    conn.execute("RELEASE intent")
+                conn.commit()
+                break
+            except Exception as e:
+                # Anything else (disk full, I/O error, a closed connection)
+                # fails this batch's callers but leaves the thread running
+                if conn.in_transaction:
+                    try:
+                        conn.rollback()
+                    except sqlite3.Error:
+                        pass
+                busy = isinstance(e, sqlite3.OperationalError) and _is_busy(e)
+                if not busy or attempt == RETRIES - 1:
+                    for _, _, future in batch:
+                        future.set_exception(e)
+                    return
+                time.sleep(delay)
+                delay *= 2
+
+        self.batches += 1
+        for (_, _, future), (result, error) in zip(batch, outcomes):
+            if error is None:
+                self.writes += 1
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get(path: str) -> Writer:
+    """Return the process's writer for the database at path, starting it on first use."""
+    key = os.path.abspath(path)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None or not writer._thread.is_alive():  # none yet, or closed
+            writer = _writers[key] = Writer(path)
+        return writer
+
+
+def close_all():
+    """Finish the queued writes of every writer and stop them, e.g. before exit."""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()